@@ -312,6 +312,7 @@ DEFAULT_PROCESSES = [
 STAGES_TITLES = {
     'METADATA_READ': 'Read Datajson (metadata only)',
     'COMPLETE_READ': 'Read Datajson (complete)',
+    'SHARDED_READ': 'Read Datajson (complete, sharded)',
 }
 
 DATAJSONAR_STAGES = {
@@ -325,6 +326,11 @@ DATAJSONAR_STAGES = {
         'queue': 'indexing',
         'task': 'django_datajsonar.models.ReadDataJsonTask',
     },
+    STAGES_TITLES['SHARDED_READ']: {
+        'callable_str': 'django_datajsonar.tasks.schedule_sharded_read_task',
+        'queue': 'indexing',
+        'task': 'django_datajsonar.models.ReadDataJsonTask',
+    },
 }
 
 SYNCHRO_DEFAULT_CONF = [
@@ -0,0 +1 @@
+default_app_config = 'django_datajsonar.apps.DjangoDatajsonarConfig'
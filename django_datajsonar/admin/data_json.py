@@ -2,9 +2,11 @@
 from __future__ import unicode_literals
 
 from django import forms
+from django.conf import settings
 from django.conf.urls import url
 from django.contrib import admin
 from django.contrib.contenttypes.admin import GenericTabularInline
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.html import format_html
 
@@ -38,10 +40,34 @@ class EnhancedMetaAdmin(GenericTabularInline):
         return False
 
 
+class IdentifierSearchMixin:
+    """Búsqueda resuelta en SQL: devuelve las entidades en las que alguno de
+    los 'search_fields' es exactamente el término buscado. Con el setting
+    DATAJSON_AR_ADMIN_TEXT_SEARCH también busca el término dentro de los
+    'text_search_fields' (títulos y descripciones)
+    """
+    text_search_fields = ()
+
+    def get_search_results(self, _, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = Q()
+        for field in self.search_fields:
+            query |= Q(**{field: search_term})
+        if getattr(settings, 'DATAJSON_AR_ADMIN_TEXT_SEARCH', False):
+            for field in self.text_search_fields:
+                query |= Q(**{field + '__icontains': search_term})
+        # Sólo se siguen foreign keys, no hay filas duplicadas
+        return queryset.filter(query), False
+
+
 @admin.register(Catalog)
-class CatalogAdmin(admin.ModelAdmin):
+class CatalogAdmin(IdentifierSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'identifier', 'present', 'updated')
-    search_fields = ('identifier', 'present', 'updated')
+    search_fields = ('identifier',)
+    text_search_fields = ('title',)
     readonly_fields = ('identifier',)
     list_filter = ('present', 'updated')
     list_select_related = True
@@ -50,30 +76,19 @@ class CatalogAdmin(admin.ModelAdmin):
         EnhancedMetaAdmin,
     )
 
-    def get_search_results(self, request, queryset, search_term):
-        queryset, distinct = \
-            super(CatalogAdmin, self).get_search_results(request, queryset, search_term)
-        if not search_term:
-            return queryset, distinct
-
-        ids_to_remove = []
-        for obj in queryset:
-            if search_term not in (obj.identifier,):
-                ids_to_remove.append(obj.id)
-
-        return queryset.exclude(id__in=ids_to_remove), distinct
-
 
 @admin.register(Dataset)
-class DatasetAdmin(admin.ModelAdmin):
+class DatasetAdmin(IdentifierSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'identifier', 'catalogo', 'landing', 'starred', 'present', 'updated', 'indexable', 'reviewed', 'last_reviewed')
-    search_fields = ['identifier', 'catalog__identifier', 'present', 'updated', 'indexable']
+    search_fields = ('identifier', 'catalog__identifier')
+    text_search_fields = ('title', 'description')
     readonly_fields = ('identifier', 'catalog', 'reviewed', 'last_reviewed', 'time_created')
     actions = ['make_indexable', 'make_unindexable', 'generate_config_file',
                'mark_as_reviewed', 'mark_on_revision', 'mark_as_not_reviewed',
                'make_starred', 'make_not_starred']
 
-    list_filter = ('catalog__identifier', 'starred', 'present', 'indexable', 'reviewed')
+    list_filter = ('catalog__identifier', 'starred', 'present', 'indexable', 'reviewed',
+                   'license')
     list_select_related = True
 
     class Media:
@@ -132,25 +147,13 @@ class DatasetAdmin(admin.ModelAdmin):
         extra_urls = [url(r'^federacion-config\.csv/$', config_csv, name='config_csv'), ]
         return extra_urls + urls
 
-    def get_search_results(self, request, queryset, search_term):
-        queryset, distinct = \
-            super(DatasetAdmin, self).get_search_results(request, queryset, search_term)
-        if not search_term:
-            return queryset, distinct
-
-        ids_to_remove = []
-        for obj in queryset:
-            if search_term not in (obj.identifier,):
-                ids_to_remove.append(obj.id)
-
-        return queryset.exclude(id__in=ids_to_remove), distinct
-
 
 @admin.register(Distribution)
-class DistributionAdmin(admin.ModelAdmin):
+class DistributionAdmin(IdentifierSearchMixin, admin.ModelAdmin):
     list_display = ('identifier', 'title', 'get_dataset_title', 'get_catalog_id', 'last_updated', 'present', 'updated')
     search_fields = ('identifier', 'dataset__identifier', 'dataset__catalog__identifier')
-    list_filter = ('dataset__catalog__identifier', )
+    text_search_fields = ('title', 'description')
+    list_filter = ('dataset__catalog__identifier', 'format')
 
     inlines = (
         EnhancedMetaAdmin,
@@ -169,28 +172,15 @@ class DistributionAdmin(admin.ModelAdmin):
     get_catalog_id.short_description = 'Catalog'
     get_catalog_id.admin_order_field = 'dataset__catalog__identifier'
 
-    def get_search_results(self, request, queryset, search_term):
-        queryset, distinct = \
-            super(DistributionAdmin, self).get_search_results(request, queryset, search_term)
-        if not search_term:
-            return queryset, distinct
-
-        ids_to_remove = []
-        for obj in queryset:
-            if search_term not in (obj.identifier, obj.dataset.identifier):
-                ids_to_remove.append(obj.id)
-
-        return queryset.exclude(id__in=ids_to_remove), distinct
-
 
 @admin.register(Field)
-class FieldAdmin(admin.ModelAdmin):
+class FieldAdmin(IdentifierSearchMixin, admin.ModelAdmin):
     list_display = ('get_title', 'identifier', 'get_distribution_title', 'get_dataset_title', 'get_catalog_id')
     search_fields = (
         'distribution__identifier',
         'distribution__dataset__identifier',
-        'distribution__dataset__catalog__identifier'
     )
+    text_search_fields = ('title',)
     list_filter = (
         'distribution__dataset__catalog__identifier',
     )
@@ -220,17 +210,3 @@ class FieldAdmin(admin.ModelAdmin):
     def get_title(self, obj):
         return obj.title or 'No title'
     get_title.short_description = 'Title'
-
-    def get_search_results(self, request, queryset, search_term):
-        queryset, distinct = \
-            super(FieldAdmin, self).get_search_results(request, queryset, search_term)
-        if not search_term:
-            return queryset, distinct
-
-        ids_to_remove = []
-        for obj in queryset:
-            if search_term not in (obj.distribution.identifier,
-                                   obj.distribution.dataset.identifier):
-                ids_to_remove.append(obj.id)
-
-        return queryset.exclude(id__in=ids_to_remove), distinct
@@ -25,6 +25,7 @@ class ManualSynchronizerView(View):
         node_id = request.POST.get('node')
         node = Node.objects.get(id=node_id) if node_id else None
         synchro.node = node
+        synchro.interactive = True
 
         synchro.begin_stage()
         messages.success(request, "Corriendo tarea!")
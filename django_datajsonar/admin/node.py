@@ -52,7 +52,8 @@ class InlineNodeMetadata(admin.StackedInline):
 @admin.register(Node)
 class NodeAdmin(admin.ModelAdmin):
     list_display = ('catalog_id', 'indexable', 'timezone')
-    exclude = ('catalog',)
+    exclude = ('catalog_snapshot',)
+    readonly_fields = ('catalog_hash', 'catalog_etag', 'catalog_last_modified')
     inlines = (InlineNodeMetadata,)
     actions = ('make_indexable', 'make_unindexable')
 
@@ -23,7 +23,7 @@ from django_datajsonar.utils.utils import generate_stages
 
 @admin.register(Synchronizer)
 class SynchronizerAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'frequency', 'scheduled_time', 'weekdays', "run_manually")
+    list_display = ('__str__', 'frequency', 'scheduled_time', 'weekdays', 'next_run_at', "run_manually")
     actions = ('duplicate',)
     StageFormset = formset_factory(StageForm, extra=0)
     change_list_template = 'synchronizer_change_list.html'
@@ -9,17 +9,20 @@ from django.contrib import messages, admin
 from django.contrib.admin import helpers
 from django.forms import formset_factory
 from django.shortcuts import render, redirect
+from django.template.defaultfilters import linebreaksbr
 
 from django_datajsonar.admin.synchronizer import SynchronizerAdmin
 from django_datajsonar.forms.schedule_job_form import ScheduleJobForm
 from django_datajsonar.forms.stage_form import StageForm
 from django_datajsonar.forms.synchro_form import SynchroForm
-from django_datajsonar.models import ReadDataJsonTask, Synchronizer
-from django_datajsonar.tasks import read_datajson
+from django_datajsonar.models import ReadDataJsonTask, Synchronizer, IndexingError, \
+    IndexingMetric
+from django_datajsonar.tasks import read_datajson, start_read_task
 
 
 class AbstractTaskAdmin(admin.ModelAdmin):
-    readonly_fields = ('status', 'created', 'finished', 'logs',)
+    readonly_fields = ('status', 'created', 'finished', 'task_logs',)
+    exclude = ('logs',)
     list_display = ('__unicode__', 'status')
 
     change_list_template = 'task_change_list.html'
@@ -36,8 +39,15 @@ class AbstractTaskAdmin(admin.ModelAdmin):
     # se programa una tarea periódica.
     callable_str = None
 
+    def task_logs(self, obj):
+        return linebreaksbr(obj.get_logs()) if obj.pk else ''
+    task_logs.short_description = 'logs'
+
     def save_model(self, request, obj, form, change):
         super(AbstractTaskAdmin, self).save_model(request, obj, form, change)
+        self.start_task(obj)
+
+    def start_task(self, obj):
         self.task.delay(obj)  # Ejecuta callable
 
     def add_view(self, request, form_url='', extra_context=None):
@@ -98,18 +108,63 @@ class AbstractTaskAdmin(admin.ModelAdmin):
         return render(request, 'scheduler.html', context)
 
 
+class IndexingMetricInline(admin.TabularInline):
+    model = IndexingMetric
+    fields = ('node', 'section', 'calls', 'duration', 'queries', 'bytes')
+    readonly_fields = fields
+    ordering = ('node', 'id')
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super(IndexingMetricInline, self).get_queryset(request).select_related('node')
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(ReadDataJsonTask)
 class DataJsonAdmin(AbstractTaskAdmin):
     model = ReadDataJsonTask
     task = read_datajson
     callable_str = 'django_datajsonar.tasks.schedule_metadata_read_task'
+    inlines = (IndexingMetricInline,)
 
     def get_readonly_fields(self, request, obj=None):
         if obj:
-            return self.readonly_fields + ('indexing_mode',)
+            return self.readonly_fields + ('indexing_mode', 'sharded', 'priority')
 
         return self.readonly_fields
 
+    def get_exclude(self, request, obj=None):
+        if obj is None:
+            # Las tareas creadas a mano son interactivas
+            return self.exclude + ('priority',)
+        return self.exclude
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.priority = ReadDataJsonTask.INTERACTIVE
+        super(DataJsonAdmin, self).save_model(request, obj, form, change)
+
+    def start_task(self, obj):
+        start_read_task(obj)
+
+
+@admin.register(IndexingError)
+class IndexingErrorAdmin(admin.ModelAdmin):
+    list_display = ('created', 'task', 'entity_type', 'catalog_identifier',
+                    'entity_identifier', 'exception_class', 'message')
+    list_filter = ('entity_type', 'exception_class', 'catalog_identifier')
+    search_fields = ('=catalog_identifier', '=entity_identifier', 'message')
+    readonly_fields = list_display
+    list_select_related = ('task',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('task',)
+
+    def has_add_permission(self, request):
+        return False
+
 
 def get_stage_name_from_callable_string(callable_str):
     for name, stage in settings.DATAJSONAR_STAGES.items():
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DjangoDatajsonarConfig(AppConfig):
     name = 'django_datajsonar'
+
+    def ready(self):
+        from django_datajsonar.signals import connect_signals
+        connect_signals()
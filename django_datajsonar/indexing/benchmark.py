@@ -0,0 +1,202 @@
+#! coding: utf-8
+"""Herramientas para medir la performance de la carga de catálogos, sobre
+catálogos sintéticos de tamaño configurable cuyas distribuciones se sirven
+desde un servidor HTTP local
+"""
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from pydatajson import DataJson
+
+from django_datajsonar.models import Catalog, Distribution, ReadDataJsonTask
+from django_datajsonar.utils.query_counter import QueryCounter
+from .database_loader import DatabaseLoader
+
+
+BenchmarkResult = namedtuple('BenchmarkResult', ['mode', 'run', 'entities', 'queries',
+                                                 'wall_time', 'peak_memory'])
+
+
+def queries_per_entity(result):
+    return result.queries / result.entities if result.entities else 0
+
+
+def entities_per_second(result):
+    return result.entities / result.wall_time if result.wall_time else 0
+
+
+def generate_catalog(datasets, distributions, fields, base_url):
+    """Genera un data.json con 'datasets' datasets, cada uno con
+    'distributions' distribuciones de 'fields' fields (más el índice de
+    tiempo). Los downloadURL apuntan a 'base_url'
+    """
+    theme = {'id': 'benchmark', 'label': 'Benchmark', 'description': 'Tema de benchmark'}
+    publisher = {'name': 'Benchmark', 'mbox': 'benchmark@example.com'}
+    return {
+        'title': 'Catálogo de benchmark',
+        'description': 'Catálogo sintético generado para medir la carga',
+        'publisher': publisher,
+        'superThemes': ['TECH'],
+        'issued': '2018-01-01',
+        'themeTaxonomy': [theme],
+        'dataset': [{
+            'identifier': str(i),
+            'title': 'Dataset {}'.format(i),
+            'description': 'Dataset sintético {}'.format(i),
+            'publisher': publisher,
+            'superTheme': ['TECH'],
+            'theme': [theme['id']],
+            'accrualPeriodicity': 'R/P1D',
+            'issued': '2018-01-01',
+            'distribution': [{
+                'identifier': '{}.{}'.format(i, j),
+                'title': 'Distribución {}.{}'.format(i, j),
+                'description': 'Distribución sintética {}.{}'.format(i, j),
+                'format': 'CSV',
+                'issued': '2018-01-01',
+                'downloadURL': '{}/{}.{}.csv'.format(base_url, i, j),
+                'field': [{
+                    'title': 'indice_tiempo',
+                    'type': 'date',
+                    'specialType': 'time_index',
+                    'specialTypeDetail': 'R/P1D',
+                }] + [{
+                    'id': '{}.{}_{}'.format(i, j, k),
+                    'title': 'serie_{}'.format(k),
+                    'type': 'number',
+                    'description': 'Serie sintética {}.{}_{}'.format(i, j, k),
+                } for k in range(fields)],
+            } for j in range(distributions)],
+        } for i in range(datasets)],
+    }
+
+
+def _ignore_log(*_):
+    """Reemplazo de BaseHTTPRequestHandler.log_message: sin logs por request"""
+
+
+class SyntheticFileServer:
+    """Servidor HTTP local que responde cualquier GET con un CSV de series
+    de tiempo de 'rows' filas y 'columns' columnas. Se usa como context
+    manager; la URL base queda en 'url'
+    """
+
+    def __init__(self, rows=100, columns=5):
+        self.content = self._csv(rows, columns)
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    @staticmethod
+    def _csv(rows, columns):
+        header = ['indice_tiempo'] + ['serie_{}'.format(k) for k in range(columns)]
+        lines = [','.join(header)]
+        for row in range(rows):
+            date = '{}-{:02d}-01'.format(1900 + row // 12, row % 12 + 1)
+            lines.append(','.join([date] + [str(row * (k + 1)) for k in range(columns)]))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def __enter__(self):
+        content = self.content
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            log_message = _ignore_log
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class IndexingBenchmark:
+    """Corre DatabaseLoader (o la clase de loader pasada) sobre un catálogo
+    sintético y mide, por corrida, la cantidad de queries, el tiempo total y
+    el pico de memoria reservada por Python durante la corrida (con
+    tracemalloc, que hace más lenta la carga; con trace_memory=False no se
+    mide y queda en None)
+    """
+
+    METADATA = 'metadata'
+    COMPLETE = 'complete'
+
+    def __init__(self, datasets=10, distributions=2, fields=5, rows=100,
+                 loader_class=DatabaseLoader, catalog_id='benchmark', trace_memory=True):
+        self.datasets = datasets
+        self.distributions = distributions
+        self.fields = fields
+        self.rows = rows
+        self.loader_class = loader_class
+        self.catalog_id = catalog_id
+        self.trace_memory = trace_memory
+
+    @property
+    def entities(self):
+        distributions = self.datasets * self.distributions
+        # Cada distribución tiene además el field del índice de tiempo
+        return self.datasets + distributions + distributions * (self.fields + 1)
+
+    def run(self, modes=(METADATA, COMPLETE), runs=2):
+        """Corre 'runs' veces cada modo, en orden. La primera corrida del
+        primer modo crea las entidades; las siguientes las actualizan.
+        Devuelve la lista de BenchmarkResult
+        """
+        results = []
+        with SyntheticFileServer(rows=self.rows, columns=self.fields) as server:
+            catalog = generate_catalog(self.datasets, self.distributions, self.fields, server.url)
+            for mode in modes:
+                for run in range(runs):
+                    results.append(self._run_once(catalog, mode, run + 1))
+        return results
+
+    def _run_once(self, catalog, mode, run):
+        task = ReadDataJsonTask.objects.create(
+            indexing_mode=ReadDataJsonTask.COMPLETE_RUN if mode == self.COMPLETE
+            else ReadDataJsonTask.METADATA_ONLY)
+        loader = self.loader_class(task, default_whitelist=True)
+        datajson = DataJson(catalog)
+        peak_memory = None
+        if self.trace_memory:
+            tracemalloc.start()  # Arranca con el pico en cero
+        try:
+            with QueryCounter() as counter:
+                start = time.time()
+                loader.run(datajson, self.catalog_id)
+                wall_time = time.time() - start
+            if self.trace_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]  # en bytes
+        finally:
+            if self.trace_memory:
+                tracemalloc.stop()
+            task.delete()
+
+        return BenchmarkResult(mode, run, self.entities, counter.count, wall_time, peak_memory)
+
+    def clean(self):
+        """Borra las entidades y archivos creados por el benchmark"""
+        distributions = Distribution.objects\
+            .filter(dataset__catalog__identifier=self.catalog_id)\
+            .exclude(data_file='')
+        for distribution in distributions:
+            distribution.data_file.delete(save=False)
+        Catalog.objects.filter(identifier=self.catalog_id).delete()
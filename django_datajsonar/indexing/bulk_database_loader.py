@@ -0,0 +1,220 @@
+#! coding: utf-8
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from django_datajsonar.models import ReadDataJsonTask
+from django_datajsonar.models import Dataset, Distribution, Field
+from .database_loader import DatabaseLoader, CATALOG_LOOKUPS, UNSEEN_ENTITY_FIELDS
+from .utils import bulk_update, bulk_upsert
+
+
+ENTITY_FIELDS = ['metadata', 'metadata_hash', 'present', 'updated', 'new', 'issued', 'error', 'error_msg',
+                 'run_generation']
+
+DATASET_FIELDS = ['title', 'landing_page', 'themes', 'indexable', 'reviewed'] + ENTITY_FIELDS + \
+    list(Dataset.HOT_METADATA_FIELDS)
+
+DISTRIBUTION_FIELDS = ['title', 'download_url', 'data_hash', 'last_updated',
+                       'data_file', 'data_etag', 'data_last_modified'] + ENTITY_FIELDS + \
+    list(Distribution.HOT_METADATA_FIELDS)
+
+FIELD_FIELDS = ENTITY_FIELDS
+
+
+class BulkDatabaseLoader(DatabaseLoader):
+    """Variante de DatabaseLoader que lee en memoria todos los datasets,
+    distribuciones y fields existentes del catálogo, aplica los cambios del
+    data.json sobre esos modelos y los escribe al final con bulk_upsert /
+    bulk_update en una única transacción, en lugar de hacer un
+    update_or_create y un save() por entidad. Las entidades sin cambios sólo
+    actualizan su número de lectura.
+    """
+
+    def __init__(self, task, read_local=False, default_whitelist=False, verify_ssl=False,
+                 metrics=None, batch_size=None):
+        super(BulkDatabaseLoader, self).__init__(task, read_local=read_local,
+                                                 default_whitelist=default_whitelist,
+                                                 verify_ssl=verify_ssl, metrics=metrics)
+        self.batch_size = batch_size or getattr(settings, 'DATAJSON_AR_BULK_BATCH_SIZE', 500)
+        self.catalog_model = None
+        self.entities = {}
+        self.touched = {}
+        self.distribution_fields = {}
+
+    def _load_catalog_entities(self, catalog_model):
+        """Trae en tres queries todos los modelos del catálogo, indexados por
+        sus identificadores (y los de sus padres)
+        """
+        self.catalog_model = catalog_model
+        self.entities = {Dataset: {}, Distribution: {}, Field: {}}
+        self.touched = {Dataset: OrderedDict(), Distribution: OrderedDict(), Field: OrderedDict()}
+        self.distribution_fields = defaultdict(list)
+
+        datasets = {}
+        for dataset in Dataset.objects.filter(catalog=catalog_model):
+            dataset.catalog = catalog_model
+            datasets[dataset.pk] = dataset
+            self.entities[Dataset][self._key(Dataset, dataset)] = dataset
+
+        distributions = {}
+        queryset = Distribution.objects.filter(**{CATALOG_LOOKUPS[Distribution]: catalog_model})
+        for distribution in queryset:
+            distribution.dataset = datasets[distribution.dataset_id]
+            distributions[distribution.pk] = distribution
+            self.entities[Distribution][self._key(Distribution, distribution)] = distribution
+
+        queryset = Field.objects.filter(**{CATALOG_LOOKUPS[Field]: catalog_model})
+        for field in queryset:
+            field.distribution = distributions[field.distribution_id]
+            self._add_field(field)
+
+    def _flush_entities(self):
+        with transaction.atomic():
+            self._write(Dataset, DATASET_FIELDS, 'catalog')
+            self._write(Distribution, DISTRIBUTION_FIELDS, 'dataset')
+            self._write(Field, FIELD_FIELDS, 'distribution')
+            self._stamp_unchanged_entities()
+
+    def _write(self, model, fields, parent):
+        instances = list(self.touched[model].values())
+        for instance in instances:
+            # Los padres pueden haber sido creados recién, en el bulk anterior
+            setattr(instance, parent, getattr(instance, parent))
+
+        changed = [instance for instance in instances if instance.has_changes()]
+        bulk_update(model, changed, fields, batch_size=self.batch_size)
+        self.unchanged_entities[model].extend(
+            instance.pk for instance in instances if not instance.has_changes())
+
+        new_instances = [instance for instance in instances if instance.pk is None]
+        bulk_upsert(model, new_instances, [parent] + self._natural_key_fields(model), fields,
+                    batch_size=self.batch_size)
+        self._fetch_created_ids(model, new_instances, parent)
+
+    def _fetch_created_ids(self, model, new_instances, parent):
+        """bulk_upsert no devuelve los ids en todas las bases de datos
+        (i.e. SQLite anterior a 3.35), se buscan por clave natural entre los
+        no conocidos
+        """
+        missing = [instance for instance in new_instances if instance.pk is None]
+        if not missing:
+            return
+
+        parent_attname = model._meta.get_field(parent).attname
+        key_attnames = [parent_attname] + self._natural_key_fields(model)
+        known_ids = {instance.pk for instance in self.entities[model].values()}
+        rows = model.objects\
+            .filter(**{CATALOG_LOOKUPS[model]: self.catalog_model})\
+            .values_list('pk', *key_attnames)
+        ids = {tuple(row[1:]): row[0] for row in rows if row[0] not in known_ids}
+        for instance in missing:
+            instance.pk = ids.get(tuple(getattr(instance, attname) for attname in key_attnames))
+
+    @staticmethod
+    def _natural_key_fields(model):
+        if model is Field:
+            return ['title', 'identifier']
+        return ['identifier']
+
+    @staticmethod
+    def _key(model, instance):
+        if model is Dataset:
+            return (instance.identifier,)
+        if model is Distribution:
+            return instance.dataset.identifier, instance.identifier
+        return (instance.distribution.dataset.identifier, instance.distribution.identifier,
+                instance.title, instance.identifier)
+
+    def _get_instance(self, model, lookup):
+        instance = model(**lookup)
+        key = self._key(model, instance)
+        existing = self.entities[model].get(key)
+        if existing is not None:
+            # Comparto los modelos padre en memoria
+            for attr, value in lookup.items():
+                setattr(existing, attr, value)
+            instance = existing
+        elif model is Field:
+            self._add_field(instance)
+        else:
+            self.entities[model][key] = instance
+        self.touched[model][key] = instance
+        return instance, existing is None
+
+    def _update_or_create(self, model, defaults, **lookup):
+        instance, _ = self._get_instance(model, lookup)
+        for attr, value in defaults.items():
+            setattr(instance, attr, value)
+        return instance
+
+    def _get_or_create(self, model, defaults, **lookup):
+        instance, created = self._get_instance(model, lookup)
+        if created:
+            for attr, value in defaults.items():
+                setattr(instance, attr, value)
+        return instance
+
+    def _update_model(self, trimmed_dict, model, updated_children=False, data_change=False):
+        self._mark_as_seen(model)
+        model.update_metadata(trimmed_dict, updated_children, data_change)
+        # DatabaseLoader actualiza la metadata de entidades ya guardadas, por
+        # lo que nunca quedan marcadas como nuevas: se conserva ese valor
+        model.new = False
+
+    def _save_model(self, model):
+        """Los modelos se escriben todos juntos en _flush_entities"""
+        self.touched[type(model)][self._key(type(model), model)] = model
+
+    def _unchanged_distributions(self, catalog_model):
+        return [distribution for distribution in self.entities[Distribution].values()
+                if distribution.run_generation == self.run_generation and
+                distribution.dataset.indexable]
+
+    def _add_field(self, field):
+        self.entities[Field][self._key(Field, field)] = field
+        self.distribution_fields[self._key(Distribution, field.distribution)].append(field)
+
+    def _log_exception(self, msg, model, field_kw, exception=None):
+        ReadDataJsonTask.info(self.task, msg)
+        self.indexing_errors.append((msg, model, field_kw, exception))
+        if model is Field:
+            distribution_key = self._key(Distribution, field_kw['distribution'])
+            candidates = [field for field in self.distribution_fields[distribution_key]
+                          if field.identifier == field_kw['identifier']]
+            instance = candidates[0] if candidates else None
+        else:
+            instance = self.entities[model].get(self._key(model, model(**field_kw)))
+
+        if instance is None:
+            return None
+        if instance.run_generation != self.run_generation:
+            # No llegó a cargarse en esta lectura: queda como no presente
+            for attr, value in UNSEEN_ENTITY_FIELDS.items():
+                setattr(instance, attr, value)
+            instance.run_generation = self.run_generation
+        instance.error = True
+        instance.error_msg = msg
+        self.touched[model][self._key(model, instance)] = instance
+        return instance
+
+    @staticmethod
+    def _mark_errored_entities(errors):
+        """Las entidades se marcan en memoria en _log_exception y se
+        escriben en _flush_entities
+        """
+
+    def _mark_fields_updated(self, distribution_model):
+        for field in self.distribution_fields[self._key(Distribution, distribution_model)]:
+            field.updated = True
+            self.touched[Field][self._key(Field, field)] = field
+
+    def _read_file(self, distribution_model, data_file):
+        changed = super(BulkDatabaseLoader, self)._read_file(distribution_model, data_file)
+        # Se sube el archivo ahora para no mantener abiertos los temporales
+        # de todas las distribuciones hasta el final de la carga
+        data_file = distribution_model.data_file
+        if data_file and not data_file._committed:
+            data_file.save(data_file.name, data_file.file, save=False)
+        return changed
@@ -0,0 +1,87 @@
+#! coding: utf-8
+import json
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlparse
+
+import requests
+from pydatajson import DataJson
+from pydatajson.custom_exceptions import NonParseableCatalog
+
+from django_datajsonar.models import Node
+from . import constants
+
+
+class CatalogFetcher:
+    """Lee el catálogo de un nodo. Para catálogos remotos en formato JSON o
+    XLSX hace un request condicional con los validadores HTTP (ETag y
+    Last-Modified) de la última lectura: si el servidor responde 304 Not
+    Modified, se usa la copia del catálogo guardada con Node.save_catalog.
+    El contenido crudo descargado queda en 'content', para no tener que
+    volver a descargarlo al generar los archivos del catálogo
+    """
+
+    def __init__(self, node, verify_ssl=False):
+        self.node = node
+        self.verify_ssl = verify_ssl
+        self.content = None
+
+    def fetch(self):
+        """Devuelve una tupla (DataJson, modificado). Si se leyó del servidor,
+        actualiza (sin guardar) los validadores HTTP del nodo
+        """
+        url = self.node.catalog_url
+        catalog_format = self._catalog_format()
+        if urlparse(url).scheme not in ('http', 'https') or \
+                catalog_format not in (Node.JSON, Node.XLSX):
+            catalog = DataJson(url, catalog_format=self.node.catalog_format,
+                               verify_ssl=self.verify_ssl)
+            return catalog, True
+
+        try:
+            response = self._get(url, self._conditional_headers())
+            if response.status_code == requests.codes.not_modified:
+                stored_catalog = self.node.load_catalog()
+                if stored_catalog is not None:
+                    return DataJson(stored_catalog, verify_ssl=self.verify_ssl), False
+                # La copia guardada ya no existe: se vuelve a pedir completo
+                response = self._get(url)
+            response.raise_for_status()
+            catalog = self._parse(response.content, catalog_format)
+        except NonParseableCatalog:
+            raise
+        except (ValueError, TypeError, IOError) as e:
+            raise NonParseableCatalog(url, str(e))
+
+        self.content = response.content
+        self.node.catalog_etag = response.headers.get('ETag', '')
+        self.node.catalog_last_modified = response.headers.get('Last-Modified', '')
+        return catalog, True
+
+    def _get(self, url, headers=None):
+        return requests.get(url, headers=headers, verify=self.verify_ssl,
+                            timeout=constants.REQUEST_TIMEOUT)
+
+    def _catalog_format(self):
+        suffix = self.node.catalog_url.split(".")[-1].strip("/")
+        if suffix in (Node.JSON, Node.XLSX):
+            return self.node.catalog_format or suffix
+        return self.node.catalog_format
+
+    def _conditional_headers(self):
+        headers = {}
+        if not self.node.catalog_snapshot:  # Sin copia guardada a la cual volver
+            return headers
+        if self.node.catalog_etag:
+            headers['If-None-Match'] = self.node.catalog_etag
+        if self.node.catalog_last_modified:
+            headers['If-Modified-Since'] = self.node.catalog_last_modified
+        return headers
+
+    def _parse(self, content, catalog_format):
+        if catalog_format == Node.JSON:
+            return DataJson(json.loads(content), verify_ssl=self.verify_ssl)
+
+        with NamedTemporaryFile(suffix='.xlsx') as xlsx_file:
+            xlsx_file.write(content)
+            xlsx_file.flush()
+            return DataJson(xlsx_file.name, catalog_format=Node.XLSX, verify_ssl=self.verify_ssl)
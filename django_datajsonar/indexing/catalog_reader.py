@@ -1,20 +1,24 @@
 #! coding: utf-8
 from __future__ import division
 
-import json
 from django.conf import settings
-from django_rq import job
-from pydatajson import DataJson
+from django_rq import job, get_queue
 from pydatajson.custom_exceptions import NonParseableCatalog
 
-from django_datajsonar.models import Dataset, Catalog, Distribution, Field
+from django_datajsonar.models import Catalog
 from django_datajsonar.models import ReadDataJsonTask
 from django_datajsonar.models.config import IndexingConfig
 from django_datajsonar.utils.catalog_file_generator import CatalogFileGenerator
+from .bulk_database_loader import BulkDatabaseLoader
+from .catalog_fetcher import CatalogFetcher
 from .database_loader import DatabaseLoader
+from .metrics import MetricsCollector
+from .node_scheduler import NodeIndexingScheduler
 from .strings import READ_ERROR
 from .utils import log_exception
 
+INDEX_CATALOG_TIMEOUT = getattr(settings, 'INDEX_CATALOG_TIMEOUT', 1800)
+
 
 class CatalogReader:
 
@@ -26,48 +30,54 @@ class CatalogReader:
         self.indexing_config = indexing_config
 
     def index(self, node, task):
+        metrics = MetricsCollector()
+        try:
+            with metrics.measure('index'):
+                self._index(node, task, metrics)
+        finally:
+            metrics.save(task, node)
+
+    def _index(self, node, task, metrics):
         self._reset_catalog_if_exists(node)
 
         try:
-            catalog = DataJson(node.catalog_url,
-                               catalog_format=node.catalog_format,
-                               verify_ssl=self.indexing_config.verify_ssl)
-            catalog.generate_distribution_ids()
-            node.catalog = json.dumps(catalog)
-            node.save()
+            fetcher = CatalogFetcher(node, verify_ssl=self.indexing_config.verify_ssl)
+            with metrics.measure('fetch'):
+                catalog, modified = fetcher.fetch()
+                catalog.generate_distribution_ids()
+            metrics.add_bytes('fetch', len(fetcher.content or b''))
+            if modified:
+                node.save_catalog(catalog)
+                node.save(update_fields=['catalog_snapshot', 'catalog_hash',
+                                         'catalog_etag', 'catalog_last_modified'])
         except NonParseableCatalog as e:
             self._set_catalog_as_errored(node)
             ReadDataJsonTask.info(task, READ_ERROR.format(node.catalog_id, e))
             return
 
-        self.reset_fields(node)
-
-        self._index_catalog(catalog, node, task)
+        self._index_catalog(catalog, node, task, metrics)
 
-        file_generator = CatalogFileGenerator(node)
-        file_generator.generate_files()
+        # Si el catálogo no cambió, los archivos generados siguen vigentes
+        if modified or not (node.json_catalog_file and node.xlsx_catalog_file):
+            file_generator = CatalogFileGenerator(node, catalog=catalog,
+                                                  content=fetcher.content)
+            with metrics.measure('generate_files'):
+                file_generator.generate_files()
 
-    def _index_catalog(self, catalog, node, task):
+    def _index_catalog(self, catalog, node, task, metrics=None):
         verify_ssl = self.indexing_config.verify_ssl or node.verify_ssl
+        loader_class = BulkDatabaseLoader \
+            if getattr(settings, 'DATAJSON_AR_BULK_LOADING', False) else DatabaseLoader
         try:
-            loader = DatabaseLoader(task, read_local=self.read_local,
-                                    default_whitelist=self.whitelist,
-                                    verify_ssl=verify_ssl)
+            loader = loader_class(task, read_local=self.read_local,
+                                  default_whitelist=self.whitelist,
+                                  verify_ssl=verify_ssl,
+                                  metrics=metrics)
             ReadDataJsonTask.info(task, u"Corriendo loader para catalogo {}".format(node.catalog_id))
             loader.run(catalog, node.catalog_id)
         except Exception as e:
             msg = u"Excepcion en catalogo {}: {}".format(node.catalog_id, e)
-            log_exception(task, msg, Catalog, {'identifier': node.catalog_id})
-
-    def reset_fields(self, node):
-        fields = {'present': False,
-                  'updated': False,
-                  'error': False,
-                  'error_msg': '',
-                  'new': False}
-        Dataset.objects.filter(catalog__identifier=node.catalog_id).update(**fields)
-        Distribution.objects.filter(dataset__catalog__identifier=node.catalog_id).update(**fields)
-        Field.objects.filter(distribution__dataset__catalog__identifier=node.catalog_id).update(**fields)
+            log_exception(task, msg, Catalog, {'identifier': node.catalog_id}, e)
 
     def _set_catalog_as_errored(self, node):
         Catalog.objects.filter(identifier=node.catalog_id).update(present=False, error=True)
@@ -82,7 +92,33 @@ class CatalogReader:
         return catalog_model
 
 
-@job('indexing', timeout=getattr(settings, 'INDEX_CATALOG_TIMEOUT', 1800))
+@job('indexing', timeout=INDEX_CATALOG_TIMEOUT)
 def index_catalog(node, task, read_local=False, whitelist=False):
-    whitelist = whitelist or node.new_datasets_auto_indexable
-    CatalogReader(read_local, whitelist).index(node, task)
+    try:
+        with type(task).buffered_logs(task):
+            CatalogReader(read_local, whitelist or node.new_datasets_auto_indexable).index(node, task)
+    finally:
+        finish_node(task, read_local, whitelist, node)
+
+
+def enqueue_index_catalog(queue_name, node, task, read_local=False, whitelist=False):
+    """Encola la lectura del nodo en la cola de su shard o de la prioridad
+    de la tarea, en lugar de la cola 'indexing' de index_catalog
+    """
+    return get_queue(queue_name).enqueue(index_catalog, node, task, read_local, whitelist,
+                                         job_timeout=INDEX_CATALOG_TIMEOUT)
+
+
+def finish_node(task, read_local=False, whitelist=False, node=None):
+    """Registra el fin de la lectura de un nodo de la tarea y encola el
+    siguiente nodo pendiente (de la misma cola), si lo hay
+    """
+    scheduler = NodeIndexingScheduler(task)
+    queue_name = scheduler.queue_for(node) if node is not None else None
+    next_node = scheduler.node_finished(queue_name)
+    if next_node is None:
+        return
+    if queue_name is None:
+        index_catalog.delay(next_node, task, read_local, whitelist)
+    else:
+        enqueue_index_catalog(queue_name, next_node, task, read_local, whitelist)
@@ -21,6 +21,12 @@ FORCE_MERGE_SEGMENTS = 5
 
 REQUEST_TIMEOUT = 30  # en segundos
 
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_MAX_PER_HOST = 2
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # en bytes
+
+SCHEDULER_KEYS_TTL = 7 * 24 * 60 * 60  # en segundos
+
 DEACTIVATE_REFRESH_BODY = {
     'index': {
         'refresh_interval': -1
@@ -34,3 +40,4 @@ REACTIVATE_REFRESH_BODY = {
 }
 
 CATALOG_ROOT = 'catalog'
+EXPORTS_ROOT = 'exports'
@@ -1,31 +1,58 @@
 #! coding: utf-8
-import hashlib
 import json
+from collections import defaultdict
+from contextlib import closing
 
-from tempfile import NamedTemporaryFile
-
-import requests
 from django.conf import settings
-from django.core.files import File
+from django.db.models import F
 from django.utils import timezone
 from pydatajson import DataJson
 from pydatajson.time_series import distribution_has_time_index
 
-from django_datajsonar.models import ReadDataJsonTask
+from django_datajsonar.models import ReadDataJsonTask, IndexingError
 from django_datajsonar.models import Dataset, Catalog, Distribution, Field
+from django_datajsonar.models.data_json_entity_mixin import metadata_hash
 from . import constants
-from .utils import log_exception, update_model
+from .distribution_downloader import DistributionDownloader
+from .metrics import MetricsCollector, measured
+from .strings import CATALOG_UNCHANGED
+from .utils import update_model
+
+
+CATALOG_LOOKUPS = {
+    Dataset: 'catalog',
+    Distribution: 'dataset__catalog',
+    Field: 'distribution__dataset__catalog',
+}
+
+UNSEEN_ENTITY_FIELDS = {'present': False,
+                        'updated': False,
+                        'error': False,
+                        'error_msg': '',
+                        'new': False}
+
+UNCHANGED_ENTITY_FIELDS = {'updated': False,
+                           'new': False}
+
+UNCHANGED_BATCH_SIZE = 500
 
 
 class DatabaseLoader:
     """Carga la base de datos. No hace validaciones"""
 
-    def __init__(self, task, read_local=False, default_whitelist=False, verify_ssl=False):
+    def __init__(self, task, read_local=False, default_whitelist=False, verify_ssl=False,
+                 metrics=None):
         self.task = task
-        self.read_local = read_local
+        self.download_options = {'read_local': read_local, 'verify_ssl': verify_ssl}
         self.default_whitelist = default_whitelist
-        self.verify_ssl = verify_ssl
         self.theme_taxonomy = {}
+        self.pending_downloads = []
+        self.indexing_errors = []
+        self.run_generation = None
+        # {modelo: [pks]} de las entidades vistas en esta lectura que no
+        # cambiaron y por lo tanto no se guardaron
+        self.unchanged_entities = defaultdict(list)
+        self.metrics = metrics or MetricsCollector()
 
     def run(self, catalog, catalog_id):
         """Guarda la metadata del catalogo pasado por parametro
@@ -40,6 +67,7 @@ class DatabaseLoader:
         catalog_model = self._catalog_model(catalog, catalog_id)
         return catalog_model
 
+    @measured('catalog')
     def _catalog_model(self, catalog, catalog_id):
         """Crea o actualiza el catalog model con el título pedido a partir
         de el diccionario de metadatos de un catálogo
@@ -47,11 +75,86 @@ class DatabaseLoader:
         trimmed_catalog = self._trim_dict_fields(
             catalog, settings.CATALOG_BLACKLIST, constants.DATASET)
 
-        catalog_model, created = Catalog.objects.update_or_create(
+        catalog_model, _ = Catalog.objects.update_or_create(
             identifier=catalog_id,
             defaults={'title': trimmed_catalog.get('title', 'No Title')}
         )
+        data_json_hash = self._data_json_hash(catalog)
+        unchanged = catalog_model.data_json_hash == data_json_hash
+        self._start_run_generation(catalog_model)
+        if unchanged:
+            ReadDataJsonTask.info(self.task, CATALOG_UNCHANGED.format(catalog_id))
+            return self._unchanged_catalog_model(catalog_model, data_json_hash)
+
+        self._load_catalog_entities(catalog_model)
+        try:
+            updated_datasets = self._load_datasets(catalog, catalog_id, catalog_model,
+                                                   trimmed_catalog)
+        finally:
+            self._mark_unseen_entities(catalog_model)
+            errors = self._flush_indexing_errors()
+
+        catalog_model.data_json_hash = '' if errors else data_json_hash
+        update_model(trimmed_catalog, catalog_model, updated_children=updated_datasets)
+        return catalog_model
 
+    def _unchanged_catalog_model(self, catalog_model, data_json_hash):
+        """Lectura de un data.json igual al de la última lectura sin
+        errores: marca como vistas y no actualizadas a las entidades de esa
+        lectura con un UPDATE por modelo, sin recorrer el catálogo. En modo
+        completo igualmente descarga las distribuciones indexables
+        """
+        previous_generation = self.run_generation - 1
+        for model, lookup in CATALOG_LOOKUPS.items():
+            model.objects\
+                .filter(**{lookup: catalog_model, 'run_generation': previous_generation})\
+                .update(run_generation=self.run_generation, **UNCHANGED_ENTITY_FIELDS)
+
+        updated_datasets = False
+        try:
+            if self.task.indexing_mode:
+                self._load_catalog_entities(catalog_model)
+                self.pending_downloads = self._unchanged_distributions(catalog_model)
+                updated_datasets = self._download_files()
+                self._flush_entities()
+        finally:
+            errors = self._flush_indexing_errors()
+
+        catalog_model.data_json_hash = '' if errors else data_json_hash
+        catalog_model.updated = updated_datasets
+        catalog_model.new = False
+        catalog_model.present = True
+        self._mark_as_seen(catalog_model)
+        catalog_model.save()
+        return catalog_model
+
+    def _unchanged_distributions(self, catalog_model):
+        """Distribuciones a descargar en una lectura sin cambios en el
+        data.json: las vistas en esta lectura de datasets indexables
+        """
+        return list(Distribution.objects
+                    .filter(dataset__catalog=catalog_model, dataset__indexable=True,
+                            run_generation=self.run_generation)
+                    .select_related('dataset'))
+
+    def _data_json_hash(self, catalog):
+        """Hash del data.json completo junto con la configuración que
+        cambia el resultado de su carga
+        """
+        return metadata_hash({
+            'catalog': catalog,
+            'blacklists': [settings.CATALOG_BLACKLIST, settings.DATASET_BLACKLIST,
+                           settings.DISTRIBUTION_BLACKLIST, settings.FIELD_BLACKLIST],
+            'time_series_only': getattr(settings, 'DATAJSON_AR_TIME_SERIES_ONLY', False),
+            'default_whitelist': self.default_whitelist,
+            'hot_metadata_fields': {model.__name__: model.get_hot_metadata_fields()
+                                    for model in (Catalog, Dataset, Distribution, Field)},
+        })
+
+    def _load_datasets(self, catalog, catalog_id, catalog_model, trimmed_catalog):
+        """Carga los datasets del catálogo y descarga sus distribuciones.
+        Devuelve True si se actualizó alguno
+        """
         only_time_series = getattr(settings, 'DATAJSON_AR_TIME_SERIES_ONLY', False)
         datasets = catalog.get_datasets(only_time_series=only_time_series)
         updated_datasets = False
@@ -64,12 +167,15 @@ class DatabaseLoader:
             except Exception as e:
                 msg = u"Excepción en dataset {}: {}" \
                     .format(dataset.get('identifier'), e)
-                log_exception(self.task, msg, Dataset,
-                              {'identifier': dataset.get('identifier'),
-                               'catalog': catalog_model}
-                              )
+                self._log_exception(msg, Dataset,
+                                    {'identifier': dataset.get('identifier'),
+                                     'catalog': catalog_model}, e)
                 continue
 
+        if self._download_files():
+            updated_datasets = True
+        self._flush_entities()
+
         if not datasets and only_time_series:
             msg = u"No fueron encontrados series de tiempo en el catálogo {}".format(catalog_id)
             ReadDataJsonTask.info(self.task, msg)
@@ -77,9 +183,9 @@ class DatabaseLoader:
         if not trimmed_catalog.get('issued') and issued_dates:
             trimmed_catalog['issued'] = min(issued_dates)
 
-        update_model(trimmed_catalog, catalog_model, updated_children=updated_datasets)
-        return catalog_model
+        return updated_datasets
 
+    @measured('dataset')
     def _dataset_model(self, dataset, catalog_model):
         """Crea o actualiza el modelo del dataset a partir de un
         diccionario que lo representa
@@ -87,7 +193,8 @@ class DatabaseLoader:
         trimmed_dataset = self._trim_dict_fields(
             dataset, settings.DATASET_BLACKLIST, constants.DISTRIBUTION)
         identifier = trimmed_dataset[constants.IDENTIFIER]
-        dataset_model, created = Dataset.objects.update_or_create(
+        dataset_model = self._update_or_create(
+            Dataset,
             catalog=catalog_model,
             identifier=identifier,
             defaults={'title': trimmed_dataset.get('title', 'No Title'),
@@ -110,29 +217,31 @@ class DatabaseLoader:
             except Exception as e:
                 msg = u"Excepción en distribución {}: {}" \
                     .format(distribution.get('identifier'), e)
-                log_exception(self.task, msg, Distribution,
-                              {'identifier': distribution.get('identifier'),
-                               'dataset': dataset_model})
+                self._log_exception(msg, Distribution,
+                                    {'identifier': distribution.get('identifier'),
+                                     'dataset': dataset_model}, e)
                 continue
 
         if not trimmed_dataset.get('issued') and issued_dates:
             trimmed_dataset['issued'] = min(issued_dates)
 
-        update_model(trimmed_dataset, dataset_model, updated_children=updated_distributions)
+        self._update_model(trimmed_dataset, dataset_model, updated_children=updated_distributions)
         # Si se actualizó y está en revisión lo marco como no revisado
         if dataset_model.updated and dataset_model.reviewed == Dataset.ON_REVISION:
             dataset_model.reviewed = Dataset.NOT_REVIEWED
-            dataset_model.save()
+            self._save_model(dataset_model)
 
         return dataset_model
 
+    @measured('distribution')
     def _distribution_model(self, distribution, dataset_model):
         """Crea o actualiza el modelo de la distribución a partir de
         un diccionario que lo representa
         """
         trimmed_distribution = self._trim_dict_fields(
             distribution, settings.DISTRIBUTION_BLACKLIST, constants.FIELD)
-        distribution_model, created = Distribution.objects.update_or_create(
+        distribution_model = self._update_or_create(
+            Distribution,
             dataset=dataset_model,
             identifier=trimmed_distribution[constants.IDENTIFIER],
             defaults={
@@ -149,77 +258,212 @@ class DatabaseLoader:
             except Exception as e:
                 msg = u"Excepción en field {}: {}" \
                     .format(field.get('title'), e)
-                model_fields = {'identifier': field.get('identifier'),
+                model_fields = {'identifier': field.get('id') or '',
                                 'distribution': distribution_model}
-                log_exception(self.task, msg, Field, model_fields)
+                self._log_exception(msg, Field, model_fields, e)
                 continue
 
-        data_change = False
-        if self.task.indexing_mode and dataset_model.indexable:
-            data_change = self._read_file(distribution_model)
-
         # En caso de que no descargue el archivo.
         if not distribution_model.download_url:
             raise ValueError("DownloadURL no encontrado")
 
-        update_model(trimmed_distribution, distribution_model,
-                     updated_children=updated_fields, data_change=data_change)
+        self._update_model(trimmed_distribution, distribution_model,
+                           updated_children=updated_fields)
+        if self.task.indexing_mode and dataset_model.indexable:
+            self.pending_downloads.append(distribution_model)
         return distribution_model
 
+    @measured('field')
     def _field_model(self, field, distribution_model):
         trimmed_field = self._trim_dict_fields(
             field, settings.FIELD_BLACKLIST
         )
         field_meta = json.dumps(trimmed_field)
-        field_model, created = Field.objects.get_or_create(
+        field_model = self._get_or_create(
+            Field,
             distribution=distribution_model,
-            title=field.get('title'),
-            identifier=field.get('id'),
+            title=field.get('title') or '',
+            identifier=field.get('id') or '',
             defaults={'metadata': field_meta}
         )
-        update_model(trimmed_field, field_model)
+        self._update_model(trimmed_field, field_model)
         return field_model
 
-    def _read_file(self, distribution_model):
-        """Descarga y lee el archivo de la distribución. Por razones
+    @measured('download')
+    def _download_files(self):
+        """Etapa de descarga, corre luego de cargar la metadata de todo el
+        catálogo: baja concurrentemente los archivos de las distribuciones
+        pendientes y los procesa a medida que terminan. Devuelve True si
+        cambió el archivo de alguna distribución.
+        """
+        pending, self.pending_downloads = self.pending_downloads, []
+        downloader = DistributionDownloader(**self.download_options)
+        data_change = False
+        # closing: si falla la carga se cierran las descargas no consumidas
+        with closing(downloader.download(pending)) as downloads:
+            for distribution_model, data_file, error in downloads:
+                if error is None and data_file is None:
+                    continue  # 304 Not Modified: el archivo guardado sigue vigente
+                try:
+                    if error is not None:
+                        raise error
+                    if self._read_file(distribution_model, data_file):
+                        data_change = True
+                        self._set_data_change(distribution_model)
+                    self._save_model(distribution_model)
+                except Exception as e:
+                    msg = u"Excepción en distribución {}: {}" \
+                        .format(distribution_model.identifier, e)
+                    self._log_exception(msg, Distribution,
+                                        {'identifier': distribution_model.identifier,
+                                         'dataset': distribution_model.dataset}, e)
+                finally:
+                    if data_file is not None:
+                        data_file.close()
+
+        return data_change
+
+    def _set_data_change(self, distribution_model):
+        """Marca como actualizados la distribución y su dataset, como lo
+        haría update_metadata con data_change=True
+        """
+        distribution_model.updated = True
+        dataset_model = distribution_model.dataset
+        dataset_model.updated = True
+        # Si se actualizó y está en revisión lo marco como no revisado
+        if dataset_model.reviewed == Dataset.ON_REVISION:
+            dataset_model.reviewed = Dataset.NOT_REVIEWED
+        self._save_model(dataset_model)
+
+    @measured('read_file')
+    def _read_file(self, distribution_model, data_file):
+        """Lee el archivo descargado de la distribución. Por razones
         de performance, NO hace un save() a la base de datos.
         Marca el modelo de distribución como 'indexable' si el archivo tiene datos
-        distintos a los actuales. El chequeo de cambios se hace hasheando el archivo entero
+        distintos a los actuales. El chequeo de cambios se hace con el hash del
+        archivo entero, calculado durante la descarga
         Args:
             distribution_model (Distribution)
+            data_file (DownloadedFile): archivo devuelto por DistributionDownloader
         """
-        file_url = distribution_model.download_url
-        if not file_url:
-            return False
-        if self.read_local:  # Usado en debug y testing
-            with open(file_url, 'rb') as f:
-                data_hash = hashlib.sha512(f.read()).hexdigest()
-            distribution_model.data_file = File(open(file_url, 'rb'))
+        self.metrics.add_bytes('read_file', data_file.size)
+        data_hash = data_file.data_hash
+        distribution_model.data_etag = data_file.etag
+        distribution_model.data_last_modified = data_file.last_modified
 
-        else:
-            user_agent = getattr(settings, 'DATAJSON_AR_USER_AGENT', 'aUserAgent')
-            headers = {'User-Agent': user_agent}
-            request = requests.get(file_url, headers=headers, stream=True, verify=self.verify_ssl)
-            request.raise_for_status()  # Excepción si es inválido
-
-            lf = NamedTemporaryFile()
-
-            lf.write(request.content)
-
-            if distribution_model.data_file:
-                distribution_model.data_file.delete()
-
-            distribution_model.data_file = File(lf)
-            data_hash = hashlib.sha512(request.content).hexdigest()
+        if distribution_model.data_file:
+            distribution_model.data_file.delete(save=False)
+        distribution_model.data_file = data_file
 
         changed = distribution_model.data_hash != data_hash
         if changed:
             distribution_model.data_hash = data_hash
             distribution_model.last_updated = timezone.now()
-            distribution_model.field_set.update(updated=True)
+            self._mark_fields_updated(distribution_model)
 
         return changed
 
+    def _start_run_generation(self, catalog_model):
+        """Incrementa el número de lectura del catálogo. Las entidades
+        cargadas en esta lectura quedan marcadas con ese número. Borra el
+        hash del data.json guardado, que se vuelve a escribir sólo si la
+        lectura termina sin errores
+        """
+        Catalog.objects.filter(pk=catalog_model.pk)\
+            .update(run_generation=F('run_generation') + 1, data_json_hash='')
+        catalog_model.refresh_from_db(fields=['run_generation'])
+        self.run_generation = catalog_model.run_generation
+
+    def _mark_unseen_entities(self, catalog_model):
+        """Marca como no presentes, con un UPDATE por modelo, a las
+        entidades del catálogo que no fueron vistas en esta lectura. Antes
+        marca como vistas a las que no cambiaron, que no se guardaron. Las
+        que ya estaban marcadas de lecturas anteriores no se reescriben
+        """
+        self._stamp_unchanged_entities()
+        for model, lookup in CATALOG_LOOKUPS.items():
+            model.objects\
+                .filter(**{lookup: catalog_model, 'run_generation__lt': self.run_generation})\
+                .exclude(**UNSEEN_ENTITY_FIELDS)\
+                .update(**UNSEEN_ENTITY_FIELDS)
+
+    def _stamp_unchanged_entities(self):
+        unchanged, self.unchanged_entities = self.unchanged_entities, defaultdict(list)
+        for model, pks in unchanged.items():
+            for i in range(0, len(pks), UNCHANGED_BATCH_SIZE):
+                model.objects.filter(pk__in=pks[i:i + UNCHANGED_BATCH_SIZE])\
+                    .update(run_generation=self.run_generation)
+
+    def _mark_as_seen(self, model):
+        model.run_generation = self.run_generation
+        model.error = False
+        model.error_msg = ''
+
+    def _load_catalog_entities(self, catalog_model):
+        """Hook llamado antes de cargar los datasets del catálogo. Por
+        default no hace nada: cada entidad se busca al momento de cargarla
+        """
+
+    def _flush_entities(self):
+        """Hook llamado luego de cargar todos los datasets del catálogo. Por
+        default no hace nada: cada entidad se guarda al momento de cargarla
+        """
+
+    @staticmethod
+    def _update_or_create(model, defaults, **lookup):
+        """Como update_or_create, pero sin el UPDATE: los defaults se
+        asignan en memoria y se guardan en _update_model si algo cambió
+        """
+        instance, created = model.objects.get_or_create(defaults=defaults, **lookup)
+        if not created:
+            for attr, value in defaults.items():
+                setattr(instance, attr, value)
+        return instance
+
+    @staticmethod
+    def _get_or_create(model, defaults, **lookup):
+        return model.objects.get_or_create(defaults=defaults, **lookup)[0]
+
+    def _update_model(self, trimmed_dict, model, updated_children=False, data_change=False):
+        """Actualiza la metadata del modelo y lo guarda sólo si cambió
+        algo además del número de lectura, que se escribe en bloque para las
+        entidades sin cambios
+        """
+        self._mark_as_seen(model)
+        model.update_metadata(trimmed_dict, updated_children, data_change)
+        if model.has_changes():
+            model.save()
+        else:
+            self.unchanged_entities[type(model)].append(model.pk)
+
+    @staticmethod
+    def _save_model(model):
+        model.save()
+
+    def _log_exception(self, msg, model, field_kw, exception=None):
+        ReadDataJsonTask.info(self.task, msg)
+        self.indexing_errors.append((msg, model, field_kw, exception))
+
+    def _flush_indexing_errors(self):
+        """Escribe los errores acumulados durante la lectura del catálogo, y
+        marca como erróneas a las entidades que fallaron. Devuelve los errores
+        """
+        errors, self.indexing_errors = self.indexing_errors, []
+        self._mark_errored_entities(errors)
+        IndexingError.objects.bulk_create(
+            [IndexingError.from_entity(self.task, *error) for error in errors],
+            batch_size=500)
+        return errors
+
+    @staticmethod
+    def _mark_errored_entities(errors):
+        for msg, model, field_kw, _ in errors:
+            model.objects.filter(**field_kw).update(error=True, error_msg=msg)
+
+    @staticmethod
+    def _mark_fields_updated(distribution_model):
+        distribution_model.field_set.update(updated=True)
+
     @staticmethod
     def _remove_blacklisted_fields(metadata, blacklist):
         """Borra los campos listados en 'blacklist' de el diccionario
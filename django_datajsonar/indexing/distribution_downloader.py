@@ -0,0 +1,157 @@
+#! coding: utf-8
+import hashlib
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.files import File
+
+from . import constants
+
+
+class DownloadedFile(File):
+    """Archivo descargado de una distribución, junto con el hash SHA-512
+    de su contenido, calculado mientras se escribía, y los validadores HTTP
+    de la respuesta"""
+
+    def __init__(self, file, data_hash, etag='', last_modified=''):
+        super(DownloadedFile, self).__init__(file)
+        self.data_hash = data_hash
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class DistributionDownloader:
+    """Descarga los archivos de un conjunto de distribuciones con un pool
+    acotado de threads, limitando las descargas simultáneas a un mismo host.
+    Los threads solo hacen I/O de red y de disco: el procesamiento de los
+    archivos y la escritura a la base quedan en el thread que consume los
+    resultados.
+    """
+
+    def __init__(self, verify_ssl=False, read_local=False, workers=None,
+                 max_per_host=None, chunk_size=None):
+        self.verify_ssl = verify_ssl
+        self.read_local = read_local
+        self.workers = workers or \
+            getattr(settings, 'DATAJSON_AR_DOWNLOAD_WORKERS', constants.DOWNLOAD_WORKERS)
+        self.max_per_host = max_per_host or \
+            getattr(settings, 'DATAJSON_AR_DOWNLOAD_MAX_PER_HOST', constants.DOWNLOAD_MAX_PER_HOST)
+        self.chunk_size = chunk_size or \
+            getattr(settings, 'DATAJSON_AR_DOWNLOAD_CHUNK_SIZE', constants.DOWNLOAD_CHUNK_SIZE)
+
+    def download(self, distributions):
+        """Generador de tuplas (distribución, archivo, error) en el orden en
+        el que terminan las descargas. 'archivo' es un DownloadedFile abierto
+        y posicionado al comienzo, que debe cerrar quien lo consuma, o None si
+        el servidor respondió 304 Not Modified. Los workers esperan a que se
+        consuman los resultados, por lo que hay a lo sumo 'workers' archivos
+        descargados sin consumir. Si se cierra el generador antes de terminar,
+        se cierran los archivos descargados que no se consumieron.
+        """
+        hosts = OrderedDict()
+        for distribution in distributions:
+            host = urlparse(distribution.download_url).netloc
+            hosts.setdefault(host, deque()).append(distribution)
+        total = sum(len(pending) for pending in hosts.values())
+        if not total:
+            return
+
+        results = queue.Queue(maxsize=self.workers)
+        stopped = threading.Event()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Se reparten los workers entre hosts, hasta max_per_host cada uno
+            futures = [executor.submit(self._drain, pending, results, stopped)
+                       for i in range(self.max_per_host)
+                       for pending in hosts.values() if len(pending) > i]
+            try:
+                for _ in range(total):
+                    yield results.get()
+            finally:
+                stopped.set()
+                self._close_pending(results, futures)
+
+    @staticmethod
+    def _close_pending(results, futures):
+        """Cierra los archivos de los resultados no consumidos, hasta que
+        terminen los workers, que pueden estar esperando lugar en la cola
+        """
+        while not all(future.done() for future in futures) or not results.empty():
+            try:
+                _, data_file, _ = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if data_file is not None:
+                data_file.close()
+
+    def _drain(self, pending, results, stopped):
+        while not stopped.is_set():
+            try:
+                distribution = pending.popleft()
+            except IndexError:
+                return
+            try:
+                data_file = self.fetch(distribution.download_url,
+                                       **self._validators(distribution))
+                results.put((distribution, data_file, None))
+            except Exception as e:
+                results.put((distribution, None, e))
+
+    @staticmethod
+    def _validators(distribution):
+        # Sin archivo guardado no hay contra qué comparar
+        if not (distribution.data_file and distribution.data_hash):
+            return {}
+        return {'etag': distribution.data_etag,
+                'last_modified': distribution.data_last_modified}
+
+    def fetch(self, url, etag='', last_modified=''):
+        """Descarga el archivo de 'url' por partes, actualizando el hash con
+        cada una, por lo que el uso de memoria no depende del tamaño del archivo.
+        Si se pasan validadores, hace un request condicional y devuelve None
+        si el archivo no fue modificado
+        """
+        data_hash = hashlib.sha512()
+        if self.read_local:  # Usado en debug y testing
+            data_file = open(url, 'rb')
+            try:
+                for chunk in iter(lambda: data_file.read(self.chunk_size), b''):
+                    data_hash.update(chunk)
+                data_file.seek(0)
+            except Exception:
+                data_file.close()
+                raise
+            return DownloadedFile(data_file, data_hash.hexdigest())
+
+        user_agent = getattr(settings, 'DATAJSON_AR_USER_AGENT', 'aUserAgent')
+        headers = {'User-Agent': user_agent}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = requests.get(url, headers=headers, stream=True,
+                                verify=self.verify_ssl, timeout=constants.REQUEST_TIMEOUT)
+        try:
+            if response.status_code == requests.codes.not_modified:
+                return None
+            response.raise_for_status()  # Excepción si es inválido
+            data_file = NamedTemporaryFile()
+            try:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    data_file.write(chunk)
+                    data_hash.update(chunk)
+            except Exception:
+                data_file.close()
+                raise
+        finally:
+            response.close()
+
+        data_file.seek(0)
+        return DownloadedFile(data_file, data_hash.hexdigest(),
+                              etag=response.headers.get('ETag', ''),
+                              last_modified=response.headers.get('Last-Modified', ''))
@@ -0,0 +1,104 @@
+#! coding: utf-8
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from django_datajsonar.models import IndexingMetric
+from django_datajsonar.utils.query_counter import QueryCounter
+
+
+class MetricsCollector:
+    """Acumula en memoria, por sección, la cantidad de llamadas, la duración,
+    las queries SQL y los bytes descargados durante la lectura de un nodo.
+    Se guardan todas juntas con save()
+    """
+
+    def __init__(self):
+        self.sections = OrderedDict()
+        self.counter = None
+
+    def _section(self, section):
+        if section not in self.sections:
+            self.sections[section] = {'calls': 0, 'duration': 0.0, 'queries': 0, 'bytes': 0}
+        return self.sections[section]
+
+    @contextmanager
+    def measure(self, section):
+        """Mide el bloque en la sección 'section'. Las secciones anidadas
+        usan el QueryCounter de la más externa, por lo que cada query se
+        cuenta una sola vez
+        """
+        if self.counter is not None:
+            with self._measure(section):
+                yield
+            return
+
+        with QueryCounter() as self.counter:
+            try:
+                with self._measure(section):
+                    yield
+            finally:
+                self.counter = None
+
+    @contextmanager
+    def _measure(self, section):
+        start = time.time()
+        start_queries = self.counter.count
+        try:
+            yield
+        finally:
+            values = self._section(section)
+            values['calls'] += 1
+            values['duration'] += time.time() - start
+            values['queries'] += self.counter.count - start_queries
+
+    def add_bytes(self, section, size):
+        self._section(section)['bytes'] += size or 0
+
+    def save(self, task, node):
+        IndexingMetric.objects.filter(task=task, node=node).delete()
+        IndexingMetric.objects.bulk_create([
+            IndexingMetric(task=task, node=node, section=section, **values)
+            for section, values in self.sections.items()
+        ])
+
+
+def measured(section):
+    """Decorador de métodos: mide cada llamada en la sección 'section' del
+    MetricsCollector del objeto ('self.metrics')
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.measure(section):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def prometheus_metrics(metrics):
+    """Devuelve las IndexingMetric pasadas en el formato de texto de
+    Prometheus, una serie por nodo y sección en cada métrica
+    """
+    definitions = [
+        ('datajsonar_indexing_calls', 'calls', 'Llamadas (entidades) por seccion'),
+        ('datajsonar_indexing_duration_seconds', 'duration', 'Duracion total por seccion'),
+        ('datajsonar_indexing_queries', 'queries', 'Queries SQL por seccion'),
+        ('datajsonar_indexing_bytes', 'bytes', 'Bytes descargados por seccion'),
+    ]
+    metrics = list(metrics)
+    lines = []
+    for name, attr, description in definitions:
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} gauge'.format(name))
+        for metric in metrics:
+            labels = 'task="{}",node="{}",section="{}"'.format(
+                metric.task_id, _escape(metric.node.catalog_id if metric.node else ''),
+                _escape(metric.section))
+            lines.append('{}{{{}}} {}'.format(name, labels, getattr(metric, attr)))
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
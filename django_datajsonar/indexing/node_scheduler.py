@@ -0,0 +1,133 @@
+#! coding: utf-8
+from django.conf import settings
+from django.utils import timezone
+from django_rq import get_connection
+
+from django_datajsonar.models import Node
+from . import constants
+from .sharding import partition_nodes, node_indexing_times
+from .tasks import regenerate_export_files
+
+
+class NodeIndexingScheduler:
+    """Reparte entre los workers de la cola 'indexing' los nodos a leer en
+    una ReadDataJsonTask. Guarda en Redis la lista de nodos todavía no
+    encolados y un contador de nodos sin terminar: se encolan como máximo
+    DATAJSON_AR_MAX_CONCURRENT_NODES nodos a la vez, al terminar cada nodo se
+    encola el siguiente, y el último nodo en terminar cierra la tarea.
+    Los nodos se encolan de los más rápidos a los más lentos, según sus
+    lecturas anteriores. En las lecturas por shards, cada cola de shard tiene
+    su propia lista de nodos pendientes y su propio límite de nodos a la vez
+    """
+
+    KEY_PREFIX = 'django_datajsonar:read_task:{}'
+
+    def __init__(self, task, connection=None):
+        self.task = task
+        self.connection = connection or get_connection('indexing')
+        prefix = self.KEY_PREFIX.format(task.id)
+        self.pending_key = prefix + ':pending_nodes'
+        self.remaining_key = prefix + ':remaining_nodes'
+        self.node_queues_key = prefix + ':node_queues'
+
+    def start(self, nodes, shard_queues=None):
+        """Registra los nodos de la tarea, repartidos entre las colas
+        'shard_queues' si se pasan. Devuelve los nodos a encolar
+        inicialmente; si no hay ninguno, cierra la tarea
+        """
+        nodes = list(nodes)
+        if not nodes:
+            self._close_task()
+            return []
+
+        times = node_indexing_times(nodes)
+        default_time = sum(times.values()) / len(times) if times else 0
+        nodes.sort(key=lambda node: times.get(node.id, default_time))
+        shards = partition_nodes(nodes, len(shard_queues), times) if shard_queues else [nodes]
+        queues = shard_queues or [None]
+        ttl = getattr(settings, 'DATAJSON_AR_SCHEDULER_KEYS_TTL', constants.SCHEDULER_KEYS_TTL)
+        pipeline = self.connection.pipeline()
+        pipeline.delete(self.node_queues_key)
+        for queue_name, shard in zip(queues, shards):
+            pending_key = self._pending_key(queue_name)
+            pipeline.delete(pending_key)
+            if not shard:
+                continue
+            pipeline.rpush(pending_key, *[node.id for node in shard])
+            pipeline.expire(pending_key, ttl)
+            if queue_name is not None:
+                pipeline.hmset(self.node_queues_key, {node.id: queue_name for node in shard})
+        pipeline.expire(self.node_queues_key, ttl)
+        pipeline.set(self.remaining_key, len(nodes), ex=ttl)
+        pipeline.execute()
+
+        limit = getattr(settings, 'DATAJSON_AR_MAX_CONCURRENT_NODES', None)
+        started = []
+        for queue_name, shard in zip(queues, shards):
+            started.extend(filter(None, (self._pop_node(queue_name)
+                                         for _ in range(limit or len(shard)))))
+        return started
+
+    def queue_for(self, node):
+        """Cola del shard del nodo, o None si la tarea no se lee por shards"""
+        queue_name = self.connection.hget(self.node_queues_key, node.id)
+        return queue_name.decode('utf-8') if queue_name is not None else None
+
+    def node_finished(self, queue_name=None):
+        """Registra la finalización de un nodo (del shard de 'queue_name').
+        Devuelve el próximo nodo a encolar del mismo shard, o None si no
+        quedan nodos pendientes. Si era el último nodo de la tarea, la cierra
+        """
+        if not self.connection.exists(self.remaining_key):
+            # La tarea no fue iniciada por el scheduler (o ya expiró)
+            return None
+
+        if self._count_finished():
+            return None
+
+        return self._pop_node(queue_name)
+
+    def _pending_key(self, queue_name=None):
+        if queue_name is None:
+            return self.pending_key
+        return '{}:{}'.format(self.pending_key, queue_name)
+
+    def _pop_node(self, queue_name=None):
+        """Saca nodos de la lista de pendientes hasta encontrar uno que siga
+        existiendo. Los nodos borrados se cuentan como terminados
+        """
+        while True:
+            node_id = self.connection.lpop(self._pending_key(queue_name))
+            if node_id is None:
+                return None
+
+            node = Node.objects.filter(id=int(node_id)).first()
+            if node is not None:
+                return node
+
+            if self._count_finished():
+                return None
+
+    def _count_finished(self):
+        """Descuenta un nodo terminado. Devuelve True si era el último de la
+        tarea, y en ese caso la cierra
+        """
+        if self.connection.decr(self.remaining_key) > 0:
+            return False
+
+        shard_queues = set(self.connection.hvals(self.node_queues_key))
+        self.connection.delete(self.pending_key, self.remaining_key, self.node_queues_key,
+                               *[self._pending_key(queue_name.decode('utf-8'))
+                                 for queue_name in shard_queues])
+        self._close_task()
+        return True
+
+    def _close_task(self):
+        closed = type(self.task).objects\
+            .filter(id=self.task.id)\
+            .exclude(status=self.task.FINISHED)\
+            .update(status=self.task.FINISHED, finished=timezone.now())
+        if closed:
+            type(self.task).consolidate_logs([self.task.id])
+            # Las exportaciones de nodos y distribuciones reflejan la lectura terminada
+            regenerate_export_files.delay()
@@ -0,0 +1,55 @@
+#! coding: utf-8
+import heapq
+
+from django.conf import settings
+from django.db.models import Avg
+
+from django_datajsonar.models import IndexingMetric, ReadDataJsonTask
+
+SHARD_HISTORY_SIZE = 5
+
+
+def shard_queues():
+    """Colas de rq entre las que se reparten los nodos en las lecturas por
+    shards (setting DATAJSON_AR_INDEXING_SHARD_QUEUES)
+    """
+    return list(getattr(settings, 'DATAJSON_AR_INDEXING_SHARD_QUEUES', []))
+
+
+def node_indexing_times(nodes):
+    """Duración promedio de la lectura de cada nodo ({id: segundos}) en las
+    últimas DATAJSON_AR_SHARD_HISTORY_SIZE tareas que lo midieron
+    """
+    history_size = getattr(settings, 'DATAJSON_AR_SHARD_HISTORY_SIZE', SHARD_HISTORY_SIZE)
+    task_ids = list(ReadDataJsonTask.objects
+                    .filter(metrics__section='index')
+                    .order_by('-id')
+                    .values_list('id', flat=True)
+                    .distinct()[:history_size])
+    durations = IndexingMetric.objects\
+        .filter(section='index', task_id__in=task_ids, node__in=nodes)\
+        .values('node_id')\
+        .annotate(duration=Avg('duration'))
+    return {row['node_id']: row['duration'] for row in durations}
+
+
+def partition_nodes(nodes, shard_count, times=None):
+    """Reparte los nodos en shard_count listas de duración total parecida,
+    según los tiempos de lectura históricos: cada nodo, del más lento al más
+    rápido, va al shard con menos carga. Los nodos sin historia cuentan con el
+    promedio del resto. Cada lista conserva el orden de 'nodes'
+    """
+    nodes = list(nodes)
+    if times is None:
+        times = node_indexing_times(nodes)
+    default_time = sum(times.values()) / len(times) if times else 1.0
+
+    loads = [(0.0, shard) for shard in range(shard_count)]
+    assignment = {}
+    for node in sorted(nodes, key=lambda n: (-times.get(n.id, default_time), n.id)):
+        load, shard = heapq.heappop(loads)
+        assignment[node.id] = shard
+        heapq.heappush(loads, (load + times.get(node.id, default_time), shard))
+
+    return [[node for node in nodes if assignment[node.id] == shard]
+            for shard in range(shard_count)]
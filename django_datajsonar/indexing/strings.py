@@ -14,6 +14,7 @@ NO_SERIES_SCRAPPED = u"No fueron encontradas series de tiempo en este catálogo"
 # Database Loader
 DB_LOAD_START = u"Comienzo de la escritura a base de datos"
 DB_LOAD_END = u"Fin de la escritura a base de datos"
+CATALOG_UNCHANGED = u"Catálogo {} sin cambios desde la última lectura"
 DB_SERIES_ID_REPEATED = u"Serie ID {} en el catálogo {} ya existente. Desestimado"
 
 # Indexer
@@ -1,6 +1,11 @@
 #! coding: utf-8
-from django_rq import job
+from django.conf import settings
+from django_rq import job, get_connection
 from django_datajsonar.models import ReadDataJsonTask
+from django_datajsonar.utils.export_files import EXPORTS, generate_export_files
+
+# Marca en Redis de una exportación con una regeneración ya encolada
+EXPORT_PENDING_KEY = 'django_datajsonar:exports:{}:pending'
 
 
 @job('indexing')
@@ -9,3 +14,26 @@ def close_read_datajson_task():
     if task and task.status != task.FINISHED:
         task.status = task.FINISHED
         task.save()
+        regenerate_export_files.delay()
+
+
+def schedule_export_files(names):
+    """Encola la regeneración de las exportaciones 'names' que no la tengan
+    ya encolada, para que varios cambios o requests seguidos no generen cada
+    uno los mismos archivos. Devuelve los nombres encolados
+    """
+    connection = get_connection('indexing')
+    timeout = getattr(settings, 'DATAJSON_AR_EXPORT_PENDING_TIMEOUT', 60 * 60)
+    scheduled = [name for name in names
+                 if connection.set(EXPORT_PENDING_KEY.format(name), 1, nx=True, ex=timeout)]
+    if scheduled:
+        regenerate_export_files.delay(scheduled)
+    return scheduled
+
+
+@job('indexing')
+def regenerate_export_files(names=None):
+    names = list(names or EXPORTS)
+    # Los cambios posteriores al inicio de la regeneración la vuelven a encolar
+    get_connection('indexing').delete(*[EXPORT_PENDING_KEY.format(name) for name in names])
+    generate_export_files(names)
@@ -0,0 +1,52 @@
+#! coding: utf-8
+import requests
+from django.test import TestCase
+from pydatajson import DataJson
+
+from django_datajsonar.models import Catalog, Distribution, Field
+from django_datajsonar.indexing.benchmark import IndexingBenchmark, SyntheticFileServer, \
+    generate_catalog
+from django_datajsonar.indexing.bulk_database_loader import BulkDatabaseLoader
+
+
+class IndexingBenchmarkTests(TestCase):
+
+    def test_generated_catalog_has_requested_size(self):
+        catalog = DataJson(generate_catalog(3, 2, 4, 'http://localhost'))
+        self.assertEqual(len(catalog.get_datasets()), 3)
+        self.assertEqual(len(catalog.get_distributions()), 6)
+        self.assertEqual(len(catalog.get_fields()), 6 * 5)
+
+    def test_file_server_serves_csv(self):
+        with SyntheticFileServer(rows=10, columns=2) as server:
+            response = requests.get(server.url + '/1.1.csv')
+        lines = response.text.splitlines()
+        self.assertEqual(lines[0], 'indice_tiempo,serie_0,serie_1')
+        self.assertEqual(len(lines), 11)
+
+    def test_run_reports_every_mode_and_run(self):
+        benchmark = IndexingBenchmark(datasets=2, distributions=1, fields=1, rows=5)
+        results = benchmark.run(runs=2)
+        self.assertEqual([(result.mode, result.run) for result in results],
+                         [('metadata', 1), ('metadata', 2), ('complete', 1), ('complete', 2)])
+        for result in results:
+            self.assertEqual(result.entities, 2 + 2 + 2 * 2)
+            self.assertGreater(result.queries, 0)
+            self.assertGreater(result.peak_memory, 0)
+
+        self.assertEqual(Field.objects.filter(distribution__dataset__catalog__identifier='benchmark')
+                         .count(), 4)
+        self.assertFalse(Distribution.objects.filter(data_file='').exists())
+
+    def test_memory_is_not_traced_if_disabled(self):
+        benchmark = IndexingBenchmark(datasets=1, distributions=1, fields=1, rows=5,
+                                      trace_memory=False)
+        results = benchmark.run(modes=(IndexingBenchmark.METADATA,), runs=1)
+        self.assertIsNone(results[0].peak_memory)
+
+    def test_clean_removes_catalog(self):
+        benchmark = IndexingBenchmark(datasets=1, distributions=1, fields=1, rows=5,
+                                      loader_class=BulkDatabaseLoader)
+        benchmark.run(modes=(IndexingBenchmark.COMPLETE,), runs=1)
+        benchmark.clean()
+        self.assertFalse(Catalog.objects.filter(identifier='benchmark').exists())
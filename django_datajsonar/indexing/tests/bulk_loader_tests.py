@@ -0,0 +1,78 @@
+#! coding: utf-8
+import os
+
+from django.db import connection, IntegrityError
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+from pydatajson import DataJson
+
+from django_datajsonar.models import Catalog, Dataset, Distribution, Field
+from django_datajsonar.models import ReadDataJsonTask
+from django_datajsonar.indexing.bulk_database_loader import BulkDatabaseLoader
+from django_datajsonar.indexing.database_loader import DatabaseLoader
+from django_datajsonar.indexing.utils import bulk_upsert
+from .loader_tests import DatabaseLoaderTests
+from .reader_tests import SAMPLES_DIR
+
+
+class BulkDatabaseLoaderTests(DatabaseLoaderTests):
+    """Corre los mismos tests que el DatabaseLoader con la carga en bulk"""
+
+    loader_class = BulkDatabaseLoader
+
+    def test_second_run_does_not_duplicate_entities(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.task.indexing_mode = ReadDataJsonTask.METADATA_ONLY
+        self.loader.run(catalog, self.catalog_id)
+        counts = (Distribution.objects.count(), Field.objects.count())
+
+        self.loader.run(catalog, self.catalog_id)
+        self.assertEqual(counts, (Distribution.objects.count(), Field.objects.count()))
+        self.assertFalse(Distribution.objects.get(identifier='212.1').new)
+        self.assertFalse(any(Field.objects.values_list('updated', flat=True)))
+
+    def test_makes_fewer_queries_than_row_by_row_loader(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.task.indexing_mode = ReadDataJsonTask.METADATA_ONLY
+        self.loader.run(catalog, self.catalog_id)
+
+        with CaptureQueriesContext(connection) as bulk_queries:
+            self.loader.run(catalog, self.catalog_id)
+        with CaptureQueriesContext(connection) as queries:
+            DatabaseLoader(self.task, read_local=True).run(catalog, self.catalog_id)
+        self.assertLess(len(bulk_queries), len(queries))
+
+
+class BulkUpsertTests(TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog.objects.create(identifier='catalog', title='Catalog',
+                                              metadata='{}')
+
+    def test_new_rows_get_their_ids(self):
+        datasets = [Dataset(catalog=self.catalog, identifier=str(i), title='Dataset',
+                            metadata='{}') for i in range(3)]
+        bulk_upsert(Dataset, datasets, ['catalog', 'identifier'], ['title'])
+        for dataset in datasets:
+            self.assertEqual(Dataset.objects.get(identifier=dataset.identifier).pk, dataset.pk)
+
+    def test_existing_row_is_updated_instead_of_duplicated(self):
+        existing = Dataset.objects.create(catalog=self.catalog, identifier='1', title='Old',
+                                          metadata='{}')
+        dataset = Dataset(catalog=self.catalog, identifier='1', title='New', metadata='{}')
+        bulk_upsert(Dataset, [dataset], ['catalog', 'identifier'], ['title'])
+
+        self.assertEqual(dataset.pk, existing.pk)
+        self.assertEqual(Dataset.objects.get().title, 'New')
+
+    @patch('django_datajsonar.indexing.utils.supports_upsert', return_value=False)
+    def test_falls_back_to_bulk_create(self, _):
+        bulk_upsert(Dataset, [Dataset(catalog=self.catalog, identifier='1', title='Dataset',
+                                      metadata='{}')], ['catalog', 'identifier'], ['title'])
+        self.assertEqual(Dataset.objects.count(), 1)
+
+    def test_identifiers_are_unique_per_parent(self):
+        Dataset.objects.create(catalog=self.catalog, identifier='1', metadata='{}')
+        with self.assertRaises(IntegrityError):
+            Dataset.objects.create(catalog=self.catalog, identifier='1', metadata='{}')
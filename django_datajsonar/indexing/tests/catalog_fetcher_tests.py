@@ -0,0 +1,74 @@
+#! coding: utf-8
+import json
+import os
+
+import requests_mock
+from django.test import TestCase
+from pydatajson import DataJson
+from pydatajson.custom_exceptions import NonParseableCatalog
+
+from django_datajsonar.models import Node
+from django_datajsonar.indexing.catalog_fetcher import CatalogFetcher
+from .reader_tests import SAMPLES_DIR
+
+CATALOG_URL = 'https://fakeurl.com/data.json'
+
+
+class CatalogFetcherTests(TestCase):
+
+    def setUp(self):
+        with open(os.path.join(SAMPLES_DIR, 'full_ts_data.json'), 'rb') as sample:
+            self.content = sample.read()
+        self.node = Node.objects.create(catalog_id='test_catalog', catalog_url=CATALOG_URL,
+                                        catalog_format='json', indexable=True)
+
+    def test_stores_validators_of_response(self):
+        with requests_mock.Mocker() as m:
+            m.get(CATALOG_URL, content=self.content,
+                  headers={'ETag': '"abc"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+            catalog, modified = CatalogFetcher(self.node).fetch()
+
+        self.assertTrue(modified)
+        self.assertEqual(catalog['title'], json.loads(self.content.decode('utf-8'))['title'])
+        self.assertEqual(self.node.catalog_etag, '"abc"')
+        self.assertEqual(self.node.catalog_last_modified, 'Wed, 21 Oct 2015 07:28:00 GMT')
+
+    def test_not_modified_catalog_is_read_from_node(self):
+        self.node.save_catalog(DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json')))
+        self.node.catalog_etag = '"abc"'
+        with requests_mock.Mocker() as m:
+            m.get(CATALOG_URL, status_code=304)
+            catalog, modified = CatalogFetcher(self.node).fetch()
+            headers = m.request_history[0].headers
+
+        self.assertFalse(modified)
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(len(catalog.get_datasets()), 1)
+
+    def test_not_modified_catalog_without_snapshot_file_is_requested_again(self):
+        self.node.save_catalog(DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json')))
+        self.node.catalog_snapshot.storage.delete(self.node.catalog_snapshot.name)
+        self.node.catalog_etag = '"abc"'
+        with requests_mock.Mocker() as m:
+            m.get(CATALOG_URL, [{'status_code': 304}, {'content': self.content}])
+            catalog, modified = CatalogFetcher(self.node).fetch()
+            headers = m.request_history[1].headers
+
+        self.assertTrue(modified)
+        self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(len(catalog.get_datasets()), 1)
+
+    def test_no_validators_sent_without_stored_catalog(self):
+        self.node.catalog_etag = '"abc"'
+        with requests_mock.Mocker() as m:
+            m.get(CATALOG_URL, content=self.content)
+            CatalogFetcher(self.node).fetch()
+            headers = m.request_history[0].headers
+
+        self.assertNotIn('If-None-Match', headers)
+
+    def test_http_error_is_non_parseable_catalog(self):
+        with requests_mock.Mocker() as m:
+            m.get(CATALOG_URL, status_code=500)
+            with self.assertRaises(NonParseableCatalog):
+                CatalogFetcher(self.node).fetch()
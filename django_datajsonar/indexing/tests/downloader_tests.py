@@ -0,0 +1,159 @@
+#! coding: utf-8
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+
+import requests_mock
+from django.test import SimpleTestCase
+
+try:
+    from mock import MagicMock
+except ImportError:
+    from unittest.mock import MagicMock
+
+from django_datajsonar.models import Distribution
+from django_datajsonar.indexing.distribution_downloader import DistributionDownloader
+from .reader_tests import SAMPLES_DIR
+
+
+class ConcurrencyTrackingDownloader(DistributionDownloader):
+
+    def __init__(self, *args, **kwargs):
+        super(ConcurrencyTrackingDownloader, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.running = defaultdict(int)
+        self.max_running = defaultdict(int)
+
+    def fetch(self, url):
+        host = url.split('/')[2]
+        with self.lock:
+            self.running[host] += 1
+            self.max_running[host] = max(self.max_running[host], self.running[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.running[host] -= 1
+        return None
+
+
+class MockFileDownloader(DistributionDownloader):
+
+    def __init__(self, *args, **kwargs):
+        super(MockFileDownloader, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.files = []
+
+    def fetch(self, url):
+        data_file = MagicMock()
+        with self.lock:
+            self.files.append(data_file)
+        return data_file
+
+
+class DistributionDownloaderTests(SimpleTestCase):
+
+    def test_downloads_every_distribution(self):
+        distributions = [Distribution(identifier=str(i), download_url='http://host/{}.csv'.format(i))
+                         for i in range(5)]
+        with requests_mock.Mocker() as m:
+            for distribution in distributions:
+                m.get(distribution.download_url, content=distribution.identifier.encode())
+            results = list(DistributionDownloader(workers=3).download(distributions))
+
+        self.assertEqual(len(results), 5)
+        for distribution, data_file, error in results:
+            self.assertIsNone(error)
+            self.assertEqual(data_file.read(), distribution.identifier.encode())
+            data_file.close()
+
+    def test_failed_download_is_returned_as_error(self):
+        distribution = Distribution(identifier='1', download_url='http://host/missing.csv')
+        with requests_mock.Mocker() as m:
+            m.get(distribution.download_url, status_code=404)
+            results = list(DistributionDownloader().download([distribution]))
+
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0][1])
+        self.assertIsNotNone(results[0][2])
+
+    def test_concurrent_downloads_per_host_are_limited(self):
+        distributions = [Distribution(download_url='http://{}/{}.csv'.format(host, i))
+                         for host in ('a.gob.ar', 'b.gob.ar') for i in range(6)]
+        downloader = ConcurrencyTrackingDownloader(workers=8, max_per_host=2)
+        results = list(downloader.download(distributions))
+
+        self.assertEqual(len(results), 12)
+        self.assertLessEqual(downloader.max_running['a.gob.ar'], 2)
+        self.assertLessEqual(downloader.max_running['b.gob.ar'], 2)
+
+    def test_downloads_wait_for_results_to_be_consumed(self):
+        distributions = [Distribution(download_url='http://host/{}.csv'.format(i)) for i in range(20)]
+        downloader = MockFileDownloader(workers=2, max_per_host=2)
+        results = downloader.download(distributions)
+        next(results)
+        time.sleep(0.1)
+        # El consumido, uno por worker esperando y 'workers' en la cola
+        self.assertLessEqual(len(downloader.files), 5)
+        results.close()
+
+    def test_unconsumed_files_are_closed_when_generator_is_closed(self):
+        distributions = [Distribution(download_url='http://host/{}.csv'.format(i)) for i in range(20)]
+        downloader = MockFileDownloader(workers=2, max_per_host=2)
+        results = downloader.download(distributions)
+        _, consumed, _ = next(results)
+        results.close()
+
+        self.assertLess(len(downloader.files), 20)
+        for data_file in downloader.files:
+            if data_file is not consumed:
+                data_file.close.assert_called_once_with()
+        consumed.close.assert_not_called()
+
+    def test_hash_is_computed_while_streaming(self):
+        content = b'indice_tiempo,serie\n' * 1000
+        distribution = Distribution(identifier='1', download_url='http://host/data.csv')
+        with requests_mock.Mocker() as m:
+            m.get(distribution.download_url, content=content)
+            _, data_file, _ = next(DistributionDownloader(chunk_size=100).download([distribution]))
+
+        self.assertEqual(data_file.data_hash, hashlib.sha512(content).hexdigest())
+        self.assertEqual(data_file.read(), content)
+        data_file.close()
+
+    def test_hash_of_local_file(self):
+        path = os.path.join(SAMPLES_DIR, 'one_distribution_data.csv')
+        with open(path, 'rb') as sample:
+            content = sample.read()
+        data_file = DistributionDownloader(read_local=True, chunk_size=100).fetch(path)
+
+        self.assertEqual(data_file.data_hash, hashlib.sha512(content).hexdigest())
+        self.assertEqual(data_file.read(), content)
+        data_file.close()
+
+    def test_sends_validators_of_previous_download(self):
+        distribution = Distribution(identifier='1', download_url='http://host/data.csv',
+                                    data_hash='hash', data_etag='"abc"',
+                                    data_last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        distribution.data_file.name = 'distribution_raw/data.csv'
+        with requests_mock.Mocker() as m:
+            m.get(distribution.download_url, status_code=304)
+            _, data_file, error = next(DistributionDownloader().download([distribution]))
+            headers = m.request_history[0].headers
+
+        self.assertIsNone(data_file)
+        self.assertIsNone(error)
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'], 'Wed, 21 Oct 2015 07:28:00 GMT')
+
+    def test_does_not_send_validators_without_previous_file(self):
+        distribution = Distribution(identifier='1', download_url='http://host/data.csv',
+                                    data_etag='"abc"')
+        with requests_mock.Mocker() as m:
+            m.get(distribution.download_url, content=b'data', headers={'ETag': '"def"'})
+            _, data_file, _ = next(DistributionDownloader().download([distribution]))
+            headers = m.request_history[0].headers
+
+        self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(data_file.etag, '"def"')
+        data_file.close()
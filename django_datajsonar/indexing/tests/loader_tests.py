@@ -4,7 +4,11 @@ import os
 import shutil
 
 from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from freezegun import freeze_time
 from pydatajson import DataJson
 
 try:
@@ -14,8 +18,8 @@ except ImportError:
 
 
 from django_datajsonar.models import Catalog, Dataset, Distribution, Field
-from django_datajsonar.models import ReadDataJsonTask, Node
-from django_datajsonar.indexing.database_loader import DatabaseLoader
+from django_datajsonar.models import ReadDataJsonTask, Node, IndexingError
+from django_datajsonar.indexing.database_loader import DatabaseLoader, UNSEEN_ENTITY_FIELDS
 from .reader_tests import SAMPLES_DIR, CATALOG_ID
 
 dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'samples')
@@ -24,6 +28,7 @@ dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'samples')
 class DatabaseLoaderTests(TestCase):
 
     catalog_id = 'test_catalog'
+    loader_class = DatabaseLoader
 
     def setUp(self):
         self.task = ReadDataJsonTask()
@@ -31,16 +36,16 @@ class DatabaseLoaderTests(TestCase):
         self.node = Node(catalog_id=self.catalog_id,
                          catalog_url=os.path.join(dir_path, 'full_ts_data.json'),
                          indexable=True)
-        self.node.catalog = json.dumps(DataJson(self.node.catalog_url))
+        self.node.save_catalog(DataJson(self.node.catalog_url))
         self.node.save()
 
         self.init_datasets(self.node)
-        self.loader = DatabaseLoader(self.task, read_local=True, default_whitelist=True)
+        self.loader = self.loader_class(self.task, read_local=True, default_whitelist=True)
 
     @staticmethod
     def init_datasets(node, whitelist=True):
         catalog_model, created = Catalog.objects.get_or_create(identifier=node.catalog_id)
-        catalog = DataJson(json.loads(node.catalog))
+        catalog = DataJson(node.load_catalog())
         if created:
             catalog_model.title = catalog['title'],
             catalog_model.metadata = '{}'
@@ -58,6 +63,17 @@ class DatabaseLoaderTests(TestCase):
     def tearDown(self):
         Catalog.objects.filter(identifier=self.catalog_id).delete()
 
+    def test_loaded_entities_are_not_flagged_as_new(self):
+        # Los dos loaders guardan las entidades antes de marcarlas: 'new'
+        # queda en False también para las creadas en la lectura
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.task.indexing_mode = ReadDataJsonTask.METADATA_ONLY
+        self.loader.run(catalog, self.catalog_id)
+
+        self.assertFalse(Distribution.objects.get(identifier='212.1').new)
+        self.assertFalse(any(Field.objects.values_list('new', flat=True)))
+        self.assertFalse(Dataset.objects.get().new)
+
     def test_blacklisted_catalog_meta(self):
         catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
 
@@ -99,9 +115,9 @@ class DatabaseLoaderTests(TestCase):
         Catalog.objects.all().delete()  # Fuerza a recrear los modelos
 
         catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
-        self.node.catalog = json.dumps(catalog)
+        self.node.save_catalog(catalog)
         self.init_datasets(self.node, whitelist=False)
-        loader = DatabaseLoader(self.task, read_local=True, default_whitelist=False)
+        loader = self.loader_class(self.task, read_local=True, default_whitelist=False)
         loader.run(catalog, self.catalog_id)
         dataset = Catalog.objects.get(identifier=CATALOG_ID).dataset_set
 
@@ -116,7 +132,7 @@ class DatabaseLoaderTests(TestCase):
         models = [Catalog, Dataset, Distribution, Field]
         for model in models:
             model.objects.all().update(present=False, updated=False)
-        loader = DatabaseLoader(self.task, read_local=True, default_whitelist=True)
+        loader = self.loader_class(self.task, read_local=True, default_whitelist=True)
         loader.run(catalog, self.catalog_id)
 
         # Al cambiar identificadores, se duplican los modelos, pero solo uno queda presente
@@ -161,12 +177,12 @@ class DatabaseLoaderTests(TestCase):
         # Pero igualmente crea los fields
         self.assertEqual(4, Field.objects.filter(distribution=invalid_distribution).count())
 
-    @patch('django_datajsonar.indexing.database_loader.requests', autospec=True)
+    @patch('django_datajsonar.indexing.distribution_downloader.requests', autospec=True)
     def test_loader_downloads_resource_if_full_run(self, request_mock):
         request_mock.get.return_value = {'content': 'aFile'}
         catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
         self.task.indexing_mode = ReadDataJsonTask.COMPLETE_RUN
-        self.loader.read_local = False
+        self.loader.download_options['read_local'] = False
         self.loader.run(catalog, self.catalog_id)
         request_mock.get.assert_called()
 
@@ -271,6 +287,190 @@ class DatabaseLoaderTests(TestCase):
 
         self.assertTrue(Dataset.objects.first().error_msg)
 
+    def test_distribution_error_is_recorded(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'distribution_missing_downloadurl.json'))
+        self.loader.run(catalog, self.catalog_id)
+
+        error = IndexingError.objects.get(task=self.task)
+        self.assertEqual(error.entity_type, IndexingError.DISTRIBUTION)
+        self.assertEqual(error.entity_identifier, '212.1')
+        self.assertEqual(error.catalog_identifier, self.catalog_id)
+        self.assertEqual(error.exception_class, 'ValueError')
+        self.assertEqual(error.message, 'DownloadURL no encontrado')
+
+    def test_dataset_error_is_recorded(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        catalog.datasets[0]['distribution'] = 'garbage'
+        self.loader.run(catalog, self.catalog_id)
+
+        error = IndexingError.objects.get(task=self.task)
+        self.assertEqual(error.entity_type, IndexingError.DATASET)
+        self.assertEqual(error.entity_identifier, catalog.datasets[0]['identifier'])
+        self.assertEqual(error.catalog_identifier, self.catalog_id)
+
+    def test_no_errors_recorded_on_valid_catalog(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        self.assertFalse(IndexingError.objects.exists())
+
+    def test_removed_dataset_is_marked_as_not_present(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'two_datasets.json'))
+        self.loader.run(catalog, self.catalog_id)
+        removed = catalog.datasets.pop(0)
+        self.loader.run(catalog, self.catalog_id)
+
+        removed_model = Dataset.objects.get(catalog__identifier=self.catalog_id,
+                                            identifier=removed['identifier'])
+        self.assertFalse(removed_model.present)
+        self.assertFalse(removed_model.updated)
+        self.assertFalse(Distribution.objects.filter(dataset=removed_model, present=True).exists())
+        self.assertFalse(Field.objects.filter(distribution__dataset=removed_model,
+                                              present=True).exists())
+        for dataset in catalog.datasets:
+            self.assertTrue(Dataset.objects.get(catalog__identifier=self.catalog_id,
+                                                identifier=dataset['identifier']).present)
+
+    def test_removed_entities_are_not_rewritten_on_later_runs(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'two_datasets.json'))
+        self.loader.run(catalog, self.catalog_id)
+        catalog.datasets.pop(0)
+        self.loader.run(catalog, self.catalog_id)
+
+        unseen_updates = []
+        original_update = QuerySet.update
+
+        def update(queryset, **kwargs):
+            rows = original_update(queryset, **kwargs)
+            if kwargs == UNSEEN_ENTITY_FIELDS:
+                unseen_updates.append(rows)
+            return rows
+
+        catalog['description'] = 'Nueva descripción'
+        with patch.object(QuerySet, 'update', update):
+            self.loader.run(catalog, self.catalog_id)
+        self.assertEqual(sum(unseen_updates), 0)
+
+    def test_error_is_cleared_on_next_successful_run(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        distributions = catalog.datasets[0]['distribution']
+        catalog.datasets[0]['distribution'] = 'garbage'
+        self.loader.run(catalog, self.catalog_id)
+        dataset = Dataset.objects.get(catalog__identifier=self.catalog_id,
+                                      identifier=catalog.datasets[0]['identifier'])
+        self.assertTrue(dataset.error)
+        self.assertFalse(dataset.present)
+
+        catalog.datasets[0]['distribution'] = distributions
+        self.loader.run(catalog, self.catalog_id)
+        dataset.refresh_from_db()
+        self.assertFalse(dataset.error)
+        self.assertEqual(dataset.error_msg, '')
+        self.assertTrue(dataset.present)
+
+    def test_run_generation_increases_on_each_run(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        first = self.loader.run(catalog, self.catalog_id).run_generation
+        second = self.loader.run(catalog, self.catalog_id).run_generation
+        self.assertEqual(second, first + 1)
+        self.assertFalse(Distribution.objects
+                         .filter(dataset__catalog__identifier=self.catalog_id)
+                         .exclude(run_generation=second).exists())
+
+    def test_unchanged_entities_are_not_rewritten(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        fields = Field.objects.filter(distribution__dataset__catalog__identifier=self.catalog_id)
+        with freeze_time('2019-01-01'):
+            self.loader.run(catalog, self.catalog_id)
+        first = list(fields.order_by('pk').values_list('issued', 'updated'))
+        with freeze_time('2019-01-02'):
+            second_run = self.loader.run(catalog, self.catalog_id).run_generation
+
+        self.assertEqual(list(fields.order_by('pk').values_list('issued', flat=True)),
+                         [issued for issued, _ in first])
+        self.assertFalse(fields.filter(updated=True).exists())
+        self.assertFalse(fields.exclude(run_generation=second_run).exists())
+
+    def test_unchanged_fields_are_updated_in_bulk(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        self.loader.run(catalog, self.catalog_id)
+        catalog['description'] = 'Otra descripción'
+        with CaptureQueriesContext(connection) as queries:
+            self.loader.run(catalog, self.catalog_id)
+
+        field_updates = [query for query in queries.captured_queries
+                         if query['sql'].startswith('UPDATE "django_datajsonar_field"')]
+        # Número de lectura de los fields sin cambios y fields no vistos
+        self.assertEqual(len(field_updates), 2)
+
+    def test_unchanged_catalog_is_not_loaded_again(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        with patch.object(self.loader, '_load_datasets') as load_datasets:
+            catalog_model = self.loader.run(catalog, self.catalog_id)
+
+        load_datasets.assert_not_called()
+        fields = Field.objects.filter(distribution__dataset__catalog=catalog_model)
+        self.assertTrue(fields.exists())
+        self.assertFalse(fields.exclude(run_generation=catalog_model.run_generation).exists())
+        self.assertFalse(fields.filter(updated=True).exists())
+        self.assertFalse(catalog_model.updated)
+
+    def test_hot_metadata_config_change_reloads_unchanged_catalog(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        distributions = Distribution.objects.filter(dataset__catalog__identifier=self.catalog_id)
+        self.assertTrue(distributions.filter(format='CSV').exists())
+
+        with self.settings(DATAJSON_AR_HOT_METADATA_FIELDS={'Distribution': {'format': 'title'}}):
+            self.loader.run(catalog, self.catalog_id)
+        distribution = distributions.get()
+        self.assertTrue(distribution.title.startswith(distribution.format))
+        self.assertIsNone(distribution.description)
+        self.assertFalse(distribution.updated)
+
+    def test_unchanged_catalog_keeps_removed_entities_as_not_present(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'two_datasets.json'))
+        self.loader.run(catalog, self.catalog_id)
+        removed = catalog.datasets.pop(0)
+        self.loader.run(catalog, self.catalog_id)
+        self.loader.run(catalog, self.catalog_id)
+
+        datasets = Dataset.objects.filter(catalog__identifier=self.catalog_id)
+        self.assertFalse(datasets.get(identifier=removed['identifier']).present)
+        self.assertTrue(datasets.exclude(identifier=removed['identifier']).filter(present=True)
+                        .exists())
+
+    def test_catalog_with_errors_is_loaded_again(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        del catalog['dataset'][0]['distribution'][0]['downloadURL']
+        self.loader.run(catalog, self.catalog_id)
+        with patch.object(self.loader, '_load_datasets', return_value=False) as load_datasets:
+            self.loader.run(catalog, self.catalog_id)
+        load_datasets.assert_called_once()
+
+    def test_blacklist_change_loads_catalog_again(self):
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        with self.settings(DATASET_BLACKLIST=['title']), \
+                patch.object(self.loader, '_load_datasets', return_value=False) as load_datasets:
+            self.loader.run(catalog, self.catalog_id)
+        load_datasets.assert_called_once()
+
+    @patch('django_datajsonar.indexing.database_loader.DistributionDownloader')
+    def test_unchanged_catalog_downloads_distributions_if_full_run(self, downloader_mock):
+        download = downloader_mock.return_value.download
+        download.return_value = (result for result in ())
+        catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
+        self.loader.run(catalog, self.catalog_id)
+        self.task.indexing_mode = ReadDataJsonTask.COMPLETE_RUN
+        self.loader.run(catalog, self.catalog_id)
+
+        distributions = download.call_args[0][0]
+        self.assertEqual([distribution.identifier for distribution in distributions],
+                         [distribution['identifier'] for distribution in
+                          catalog.get_distributions()])
+
     def test_dataset_landing_page(self):
         catalog = DataJson(os.path.join(SAMPLES_DIR, 'full_ts_data.json'))
         self.loader.run(catalog, self.catalog_id)
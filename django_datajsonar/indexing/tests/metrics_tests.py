@@ -0,0 +1,115 @@
+#! coding: utf-8
+import os
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from django_datajsonar.models import ReadDataJsonTask, Node, IndexingMetric
+from django_datajsonar.indexing.catalog_reader import index_catalog
+from django_datajsonar.indexing.metrics import MetricsCollector, prometheus_metrics
+from .reader_tests import SAMPLES_DIR
+
+
+class MetricsCollectorTests(TestCase):
+
+    def setUp(self):
+        self.task = ReadDataJsonTask.objects.create()
+        self.node = Node.objects.create(catalog_id='catalog_id', catalog_url='http://test.com',
+                                        indexable=True)
+
+    def test_measure_accumulates_calls_and_queries(self):
+        collector = MetricsCollector()
+        for _ in range(2):
+            with collector.measure('section'):
+                Node.objects.count()
+        collector.add_bytes('section', 10)
+
+        self.assertEqual(collector.sections['section'],
+                         {'calls': 2, 'duration': collector.sections['section']['duration'],
+                          'queries': 2, 'bytes': 10})
+
+    def test_nested_sections_share_counter(self):
+        collector = MetricsCollector()
+        with collector.measure('outer'):
+            Node.objects.count()
+            with collector.measure('inner'):
+                Node.objects.count()
+        self.assertEqual(collector.sections['outer']['queries'], 2)
+        self.assertEqual(collector.sections['inner']['queries'], 1)
+        self.assertIsNone(collector.counter)
+
+    def test_measure_records_failed_calls(self):
+        collector = MetricsCollector()
+        with self.assertRaises(ValueError):
+            with collector.measure('section'):
+                raise ValueError
+        self.assertEqual(collector.sections['section']['calls'], 1)
+
+    def test_save_replaces_previous_metrics_of_node(self):
+        collector = MetricsCollector()
+        with collector.measure('section'):
+            pass
+        collector.save(self.task, self.node)
+        collector.save(self.task, self.node)
+        self.assertEqual(IndexingMetric.objects.filter(task=self.task, node=self.node).count(), 1)
+
+    def test_prometheus_format(self):
+        IndexingMetric.objects.create(task=self.task, node=self.node, section='dataset',
+                                      calls=3, duration=1.5, queries=7, bytes=0)
+        text = prometheus_metrics(IndexingMetric.objects.all())
+        labels = 'task="{}",node="catalog_id",section="dataset"'.format(self.task.id)
+        self.assertIn('# TYPE datajsonar_indexing_duration_seconds gauge', text)
+        self.assertIn('datajsonar_indexing_calls{%s} 3' % labels, text)
+        self.assertIn('datajsonar_indexing_duration_seconds{%s} 1.5' % labels, text)
+        self.assertIn('datajsonar_indexing_queries{%s} 7' % labels, text)
+
+
+class IndexingMetricsTests(TestCase):
+
+    def setUp(self):
+        self.task = ReadDataJsonTask.objects.create()
+        self.node = Node.objects.create(catalog_id='catalog_id',
+                                        catalog_url=os.path.join(SAMPLES_DIR, 'full_ts_data.json'),
+                                        indexable=True)
+
+    def test_index_catalog_stores_metrics_per_node(self):
+        index_catalog(self.node, self.task, read_local=True, whitelist=True)
+
+        metrics = {metric.section: metric
+                   for metric in IndexingMetric.objects.filter(task=self.task, node=self.node)}
+        for section in ('index', 'fetch', 'catalog', 'dataset', 'distribution', 'field',
+                        'generate_files'):
+            self.assertIn(section, metrics)
+        self.assertEqual(metrics['index'].calls, 1)
+        self.assertEqual(metrics['dataset'].calls, 1)
+        self.assertEqual(metrics['distribution'].calls, 1)
+        self.assertGreater(metrics['catalog'].queries, 0)
+        self.assertGreaterEqual(metrics['index'].queries, metrics['catalog'].queries)
+        self.assertGreaterEqual(metrics['index'].duration, metrics['catalog'].duration)
+
+    def test_metrics_view_serves_last_task(self):
+        User.objects.create_superuser('admin', 'admin@test.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        index_catalog(self.node, self.task, read_local=True, whitelist=True)
+        response = self.client.get(reverse('django_datajsonar:indexing_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('section="dataset"', response.content.decode('utf-8'))
+
+    def test_metrics_view_requires_staff(self):
+        response = self.client.get(reverse('django_datajsonar:indexing_metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(DATAJSON_AR_PUBLIC_METRICS=True)
+    def test_public_metrics_view(self):
+        response = self.client.get(reverse('django_datajsonar:indexing_metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_task_admin_shows_metrics(self):
+        User.objects.create_superuser('admin', 'admin@test.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        index_catalog(self.node, self.task, read_local=True, whitelist=True)
+        response = self.client.get(reverse('admin:django_datajsonar_readdatajsontask_change',
+                                           args=(self.task.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'generate_files')
@@ -0,0 +1,151 @@
+#! coding: utf-8
+import django_rq
+from django.test import TestCase, override_settings
+from mock import patch
+
+from django_datajsonar.models import Node, ReadDataJsonTask, IndexingMetric
+from django_datajsonar.indexing.node_scheduler import NodeIndexingScheduler
+from django_datajsonar.tasks import read_datajson
+
+SHARD_QUEUES = ['high', 'low']
+
+
+class NodeIndexingSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.task = ReadDataJsonTask.objects.create()
+        self.scheduler = NodeIndexingScheduler(self.task)
+        self.nodes = [Node.objects.create(catalog_id='catalog_{}'.format(i),
+                                          catalog_url='http://catalog_{}.com/data.json'.format(i),
+                                          indexable=True)
+                      for i in range(3)]
+
+    def tearDown(self):
+        self.scheduler.connection.delete(self.scheduler.pending_key,
+                                         self.scheduler.remaining_key,
+                                         self.scheduler.node_queues_key,
+                                         *[self.scheduler.pending_key + ':' + queue_name
+                                           for queue_name in SHARD_QUEUES + ['high']])
+
+    def test_all_nodes_are_started_without_limit(self):
+        self.assertEqual(self.scheduler.start(self.nodes), self.nodes)
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1)
+    def test_next_node_is_started_when_one_finishes(self):
+        self.assertEqual(self.scheduler.start(self.nodes), self.nodes[:1])
+        self.assertEqual(self.scheduler.node_finished(), self.nodes[1])
+        self.assertEqual(self.scheduler.node_finished(), self.nodes[2])
+
+    def test_task_is_closed_when_last_node_finishes(self):
+        self.scheduler.start(self.nodes)
+        for _ in self.nodes[:-1]:
+            self.assertIsNone(self.scheduler.node_finished())
+            self.task.refresh_from_db()
+            self.assertEqual(self.task.status, ReadDataJsonTask.RUNNING)
+
+        self.scheduler.node_finished()
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.FINISHED)
+        self.assertIsNotNone(self.task.finished)
+
+    @patch('django_datajsonar.indexing.node_scheduler.regenerate_export_files')
+    def test_export_files_are_regenerated_when_task_is_closed(self, regenerate):
+        self.scheduler.start(self.nodes)
+        for _ in self.nodes:
+            self.scheduler.node_finished()
+        self.assertEqual(regenerate.delay.call_count, 1)
+
+    @patch('django_datajsonar.indexing.node_scheduler.regenerate_export_files')
+    def test_export_files_are_not_regenerated_for_closed_task(self, regenerate):
+        self.task.status = ReadDataJsonTask.FINISHED
+        self.task.save()
+        self.scheduler.start([])
+        regenerate.delay.assert_not_called()
+
+    def test_task_without_nodes_is_closed_on_start(self):
+        self.assertEqual(self.scheduler.start([]), [])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.FINISHED)
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1)
+    def test_deleted_nodes_are_skipped(self):
+        self.scheduler.start(self.nodes)
+        self.nodes[1].delete()
+        self.assertEqual(self.scheduler.node_finished(), self.nodes[2])
+
+    def test_finished_node_of_unscheduled_task_does_not_close_it(self):
+        self.assertIsNone(self.scheduler.node_finished())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.RUNNING)
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1)
+    @patch('django_datajsonar.indexing.catalog_reader.CatalogReader')
+    def test_read_datajson_indexes_every_node_and_closes_task(self, reader):
+        read_datajson(self.task)
+        indexed = [call[0][0] for call in reader.return_value.index.call_args_list]
+        self.assertEqual(indexed, self.nodes)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.FINISHED)
+
+    @patch('django_datajsonar.indexing.catalog_reader.CatalogReader')
+    def test_task_is_closed_if_a_node_fails(self, reader):
+        reader.return_value.index.side_effect = Exception('error')
+        read_datajson(self.task)
+        self.assertEqual(reader.return_value.index.call_count, len(self.nodes))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.FINISHED)
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1)
+    def test_each_shard_starts_its_own_nodes(self):
+        started = self.scheduler.start(self.nodes, SHARD_QUEUES)
+        self.assertEqual(len(started), 2)
+        self.assertEqual({self.scheduler.queue_for(node) for node in started}, set(SHARD_QUEUES))
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1)
+    def test_next_node_is_taken_from_the_same_shard(self):
+        started = self.scheduler.start(self.nodes, SHARD_QUEUES)
+        shard_with_pending = [queue_name for queue_name in SHARD_QUEUES
+                              if self.scheduler.connection.llen(
+                                  self.scheduler.pending_key + ':' + queue_name)][0]
+        shard_without_pending = [queue_name for queue_name in SHARD_QUEUES
+                                 if queue_name != shard_with_pending][0]
+        self.assertIsNone(self.scheduler.node_finished(shard_without_pending))
+        next_node = self.scheduler.node_finished(shard_with_pending)
+        self.assertNotIn(next_node, started)
+        self.assertEqual(self.scheduler.queue_for(next_node), shard_with_pending)
+
+    def test_unsharded_nodes_have_no_queue(self):
+        started = self.scheduler.start(self.nodes)
+        self.assertIsNone(self.scheduler.queue_for(started[0]))
+
+    @override_settings(DATAJSON_AR_MAX_CONCURRENT_NODES=1, DATAJSON_AR_INDEXING_SHARD_QUEUES=SHARD_QUEUES)
+    @patch('django_datajsonar.indexing.catalog_reader.CatalogReader')
+    def test_sharded_read_indexes_every_node_in_shard_queues(self, reader):
+        self.task.sharded = True
+        self.task.save()
+        with patch('django_datajsonar.indexing.catalog_reader.get_queue',
+                   side_effect=django_rq.get_queue) as get_queue:
+            read_datajson(self.task)
+        indexed = [call[0][0] for call in reader.return_value.index.call_args_list]
+        self.assertCountEqual(indexed, self.nodes)
+        self.assertEqual({call[0][0] for call in get_queue.call_args_list}, set(SHARD_QUEUES))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, ReadDataJsonTask.FINISHED)
+
+    def test_fastest_nodes_are_started_first(self):
+        old_task = ReadDataJsonTask.objects.create()
+        IndexingMetric.objects.bulk_create([
+            IndexingMetric(task=old_task, node=node, section='index', duration=duration)
+            for node, duration in zip(self.nodes, [30, 10, 20])
+        ])
+        started = self.scheduler.start(self.nodes)
+        self.assertEqual(started, [self.nodes[1], self.nodes[2], self.nodes[0]])
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={ReadDataJsonTask.INTERACTIVE: 'high'})
+    @patch('django_datajsonar.tasks.enqueue_index_catalog')
+    def test_nodes_are_read_in_the_priority_queue_of_the_task(self, enqueue):
+        self.task.priority = ReadDataJsonTask.INTERACTIVE
+        self.task.save()
+        read_datajson(self.task)
+        self.assertEqual({call[0][0] for call in enqueue.call_args_list}, {'high'})
+        self.assertEqual(enqueue.call_count, len(self.nodes))
@@ -36,7 +36,7 @@ class ReaderTests(TestCase):
         self.node.save()
         index_catalog(self.node, self.task, read_local=True, whitelist=True)
 
-        self.assertGreater(len(ReadDataJsonTask.objects.get(id=self.task.id).logs), 10)
+        self.assertGreater(len(ReadDataJsonTask.objects.get(id=self.task.id).get_logs()), 10)
 
     def test_index_only_time_series_if_specified(self):
         settings.DATAJSON_AR_TIME_SERIES_ONLY = True
@@ -0,0 +1,45 @@
+#! coding: utf-8
+from django.test import TestCase, override_settings
+
+from django_datajsonar.models import ReadDataJsonTask, Node, IndexingMetric
+from django_datajsonar.indexing.sharding import partition_nodes, node_indexing_times
+
+
+class ShardingTests(TestCase):
+
+    def setUp(self):
+        self.nodes = [Node.objects.create(catalog_id='catalog_{}'.format(i),
+                                          catalog_url='http://catalog_{}.com/data.json'.format(i),
+                                          indexable=True)
+                      for i in range(4)]
+
+    def record_times(self, *durations):
+        task = ReadDataJsonTask.objects.create()
+        IndexingMetric.objects.bulk_create([
+            IndexingMetric(task=task, node=node, section='index', duration=duration)
+            for node, duration in zip(self.nodes, durations)
+        ])
+
+    def test_shards_are_balanced_by_indexing_time(self):
+        self.record_times(100, 10, 50, 40)
+        shards = partition_nodes(self.nodes, 2)
+        self.assertEqual(shards, [[self.nodes[0]], self.nodes[1:]])
+
+    def test_nodes_without_history_are_spread(self):
+        shards = partition_nodes(self.nodes, 2)
+        self.assertEqual([len(shard) for shard in shards], [2, 2])
+
+    def test_more_shards_than_nodes(self):
+        shards = partition_nodes(self.nodes[:1], 3)
+        self.assertEqual(shards, [self.nodes[:1], [], []])
+
+    def test_times_are_averaged_over_recent_tasks(self):
+        self.record_times(10)
+        self.record_times(30)
+        self.assertEqual(node_indexing_times(self.nodes), {self.nodes[0].id: 20})
+
+    @override_settings(DATAJSON_AR_SHARD_HISTORY_SIZE=1)
+    def test_only_latest_tasks_are_considered(self):
+        self.record_times(10)
+        self.record_times(30)
+        self.assertEqual(node_indexing_times(self.nodes), {self.nodes[0].id: 30})
@@ -1,20 +1,111 @@
 #! coding: utf-8
 import json
-from django_datajsonar.models import ReadDataJsonTask
+import sqlite3
+from collections import defaultdict
 
+from django.db import connections
+from django.db.models import Case, Value, When
 
-def log_exception(task, msg, model, field_kw):
+from django_datajsonar.models import ReadDataJsonTask, IndexingError
+
+
+def log_exception(task, msg, model, field_kw, exception=None):
+    """Registra el error en los logs de la tarea, como IndexingError y en la
+    entidad, si existe, con un UPDATE sin leerla
+    """
     ReadDataJsonTask.info(task, msg)
-    try:
-        error_model = model.objects.get(**field_kw)
-        error_model.error = True
-        error_model.error_msg = msg
-        error_model.save()
-        return error_model
-    except model.DoesNotExist:
-        return None
+    model.objects.filter(**field_kw).update(error=True, error_msg=msg)
+    IndexingError.from_entity(task, msg, model, field_kw, exception).save()
 
 
 def update_model(trimmed_dict, model, updated_children=False, data_change=False):
     model.update_metadata(trimmed_dict, updated_children, data_change)
     model.save()
+
+
+def bulk_update(model, objs, fields, batch_size=None, using='default'):
+    """Actualiza los campos 'fields' de todos los objetos 'objs' con un UPDATE
+    por lote (CASE WHEN id = ... THEN ...), sin llamar a save() en cada uno.
+    Django 1.11 no provee QuerySet.bulk_update. Se llama a pre_save de cada
+    campo, por lo que se commitean los archivos de los FileField pendientes.
+    """
+    objs = [obj for obj in objs if obj.pk is not None]
+    if not objs:
+        return
+    model_fields = [model._meta.get_field(name) for name in fields]
+    max_batch_size = connections[using].ops.bulk_batch_size(['pk', 'pk'] + list(fields), objs)
+    batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        updates = {}
+        for field in model_fields:
+            whens = [When(pk=obj.pk, then=Value(field.pre_save(obj, False), output_field=field))
+                     for obj in batch]
+            updates[field.attname] = Case(*whens, output_field=field)
+        model.objects.using(using).filter(pk__in=[obj.pk for obj in batch]).update(**updates)
+
+
+def supports_upsert(connection):
+    """INSERT ... ON CONFLICT DO UPDATE ... RETURNING: PostgreSQL y SQLite
+    desde la versión 3.35
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35)
+    return False
+
+
+def bulk_upsert(model, objs, conflict_fields, update_fields, batch_size=None, using='default'):
+    """Inserta los objetos nuevos 'objs' con INSERT ... ON CONFLICT: si otro
+    proceso ya creó la fila con la misma clave única 'conflict_fields', le
+    actualiza los campos 'update_fields'. Asigna a cada objeto el pk de su
+    fila. En bases de datos sin soporte hace un bulk_create.
+    """
+    connection = connections[using]
+    if not objs:
+        return
+    if not supports_upsert(connection):
+        model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+        return
+
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    key_fields = [model._meta.get_field(name) for name in conflict_fields]
+    sql = _upsert_sql(model, connection, fields, key_fields, update_fields)
+    row = '({})'.format(', '.join(['%s'] * len(fields)))
+
+    batch_size = min(filter(None, [batch_size, connection.ops.bulk_batch_size(fields, objs)]))
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            params = [field.get_db_prep_save(field.pre_save(obj, True), connection)
+                      for obj in batch for field in fields]
+            cursor.execute(sql.format(values=', '.join([row] * len(batch))), params)
+            _assign_upserted_ids(batch, cursor.fetchall(), key_fields, connection)
+
+
+def _upsert_sql(model, connection, fields, key_fields, update_fields):
+    quote = connection.ops.quote_name
+    return 'INSERT INTO {table} ({columns}) VALUES {{values}} ' \
+           'ON CONFLICT ({conflict}) DO UPDATE SET {updates} RETURNING {returning}'.format(
+               table=quote(model._meta.db_table),
+               columns=', '.join(quote(field.column) for field in fields),
+               conflict=', '.join(quote(field.column) for field in key_fields),
+               updates=', '.join('{0} = EXCLUDED.{0}'.format(
+                   quote(model._meta.get_field(name).column)) for name in update_fields),
+               returning=', '.join(quote(field.column)
+                                   for field in [model._meta.pk] + key_fields))
+
+
+def _assign_upserted_ids(objs, rows, key_fields, connection):
+    """Asigna los pks devueltos por RETURNING (pk y clave única, sin orden
+    garantizado) a los objetos correspondientes
+    """
+    ids = defaultdict(list)
+    for row in rows:
+        ids[tuple(row[1:])].append(row[0])
+    for obj in objs:
+        key = tuple(field.get_db_prep_save(getattr(obj, field.attname), connection)
+                    for field in key_fields)
+        if ids[key]:
+            obj.pk = ids[key].pop(0)
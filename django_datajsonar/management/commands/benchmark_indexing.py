@@ -0,0 +1,62 @@
+#! coding: utf-8
+from django.core.management import BaseCommand
+
+from django_datajsonar.indexing.benchmark import IndexingBenchmark, queries_per_entity, \
+    entities_per_second
+from django_datajsonar.indexing.bulk_database_loader import BulkDatabaseLoader
+from django_datajsonar.indexing.database_loader import DatabaseLoader
+
+
+class Command(BaseCommand):
+    """Mide la carga de un catálogo sintético de datasets x distribuciones x
+    fields, con los archivos de las distribuciones servidos desde un
+    servidor HTTP local. Escribe en la base de datos configurada: por
+    default borra lo creado al terminar."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datasets', type=int, default=100)
+        parser.add_argument('--distributions', type=int, default=2,
+                            help='Distribuciones por dataset')
+        parser.add_argument('--fields', type=int, default=5,
+                            help='Fields por distribución, sin contar el índice de tiempo')
+        parser.add_argument('--rows', type=int, default=100,
+                            help='Filas de cada archivo de distribución')
+        parser.add_argument('--runs', type=int, default=2,
+                            help='Corridas por modo. La primera crea las entidades')
+        parser.add_argument('--mode', choices=[IndexingBenchmark.METADATA,
+                                               IndexingBenchmark.COMPLETE, 'all'],
+                            default='all')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Usar BulkDatabaseLoader')
+        parser.add_argument('--keep', action='store_true',
+                            help='No borrar el catálogo creado')
+        parser.add_argument('--no-memory', action='store_true',
+                            help='No medir la memoria, que hace más lenta la carga')
+
+    def handle(self, *args, **options):
+        benchmark = IndexingBenchmark(datasets=options['datasets'],
+                                      distributions=options['distributions'],
+                                      fields=options['fields'],
+                                      rows=options['rows'],
+                                      trace_memory=not options['no_memory'],
+                                      loader_class=BulkDatabaseLoader if options['bulk']
+                                      else DatabaseLoader)
+        modes = (IndexingBenchmark.METADATA, IndexingBenchmark.COMPLETE) \
+            if options['mode'] == 'all' else (options['mode'],)
+
+        benchmark.clean()
+        try:
+            results = benchmark.run(modes=modes, runs=options['runs'])
+        finally:
+            if not options['keep']:
+                benchmark.clean()
+
+        self.stdout.write('{:<10} {:>4} {:>9} {:>9} {:>12} {:>10} {:>12} {:>14}'.format(
+            'mode', 'run', 'entities', 'queries', 'queries/ent', 'wall (s)', 'entities/s', 'peak mem (MB)'))
+        for result in results:
+            peak_memory = '-' if result.peak_memory is None \
+                else '{:.1f}'.format(result.peak_memory / 1024 / 1024)
+            self.stdout.write('{:<10} {:>4} {:>9} {:>9} {:>12.2f} {:>10.2f} {:>12.1f} {:>14}'.format(
+                result.mode, result.run, result.entities, result.queries,
+                queries_per_entity(result), result.wall_time, entities_per_second(result),
+                peak_memory))
@@ -22,7 +22,7 @@ class Command(BaseCommand):
             logger.info(u'Ya está corriendo una indexación')
             return
 
-        task = ReadDataJsonTask()
+        task = ReadDataJsonTask(priority=ReadDataJsonTask.INTERACTIVE)
         task.save()
 
         read_datajson(task, whitelist=options['whitelist'])
@@ -0,0 +1,34 @@
+#! coding: utf-8
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+from django_datajsonar.utils.duplicates import remove_duplicate_entities
+
+
+class Command(BaseCommand):
+    """Borra los datasets, distribuciones y fields repetidos por su clave
+    única, que impiden aplicar las migraciones 0030_entity_unique_keys y
+    0039_field_keys_not_null. De cada
+    clave deja la entidad leída más recientemente, y le pasa los hijos y la
+    metadata adicional de las que borra. Usa los modelos del estado de las
+    migraciones aplicadas."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Mostrar las entidades a borrar sin borrarlas')
+
+    def handle(self, *args, **options):
+        loader = MigrationExecutor(connection).loader
+        applied = [key for key in loader.applied_migrations if key in loader.graph.nodes]
+        apps = loader.project_state(applied).apps
+
+        with transaction.atomic():
+            removed = remove_duplicate_entities(apps)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        for model_name, entity_id, kept_id in removed:
+            self.stdout.write('{} {} repetido de {}'.format(model_name, entity_id, kept_id))
+        self.stdout.write('{} entidades {}'.format(
+            len(removed), 'a borrar' if options['dry_run'] else 'borradas'))
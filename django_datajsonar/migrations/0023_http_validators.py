@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:35
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0022_auto_20260623_0943'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='distribution',
+            name='data_etag',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='data_last_modified',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='catalog_etag',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='catalog_last_modified',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
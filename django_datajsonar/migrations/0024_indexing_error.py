@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0023_http_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexingError',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('catalog', 'Catálogo'), ('dataset', 'Dataset'), ('distribution', 'Distribución'), ('field', 'Field')], max_length=20)),
+                ('catalog_identifier', models.CharField(max_length=200)),
+                ('entity_identifier', models.CharField(blank=True, default='', max_length=200)),
+                ('exception_class', models.CharField(blank=True, default='', max_length=200)),
+                ('message', models.TextField()),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexing_errors', to='django_datajsonar.ReadDataJsonTask')),
+            ],
+            options={
+                'verbose_name': 'Indexing error',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='indexingerror',
+            index=models.Index(fields=['task', 'entity_type'], name='django_data_task_id_cdb24e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='indexingerror',
+            index=models.Index(fields=['catalog_identifier', 'entity_type', 'entity_identifier'], name='django_data_catalog_059659_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='indexingerror',
+            index=models.Index(fields=['exception_class', 'created'], name='django_data_excepti_ab6f7d_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:47
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0024_indexing_error'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalog',
+            name='run_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='run_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='run_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='field',
+            name='run_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['catalog', 'run_generation'], name='django_data_catalog_55087e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distribution',
+            index=models.Index(fields=['dataset', 'run_generation'], name='django_data_dataset_14d1de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='field',
+            index=models.Index(fields=['distribution', 'run_generation'], name='django_data_distrib_b468cf_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0025_run_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexingMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=50)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(default=0, help_text='En segundos')),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('node', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='django_datajsonar.Node')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='django_datajsonar.ReadDataJsonTask')),
+            ],
+            options={
+                'verbose_name': 'Indexing metric',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='indexingmetric',
+            unique_together=set([('task', 'node', 'section')]),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:05
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+# Columnas y paths en la metadata al momento de esta migración (ver
+# HOT_METADATA_FIELDS), copiados para no depender de los modelos actuales
+HOT_METADATA_FIELDS = {
+    'Catalog': {
+        'publisher_name': 'publisher.name',
+    },
+    'Dataset': {
+        'description': 'description',
+        'publisher_name': 'publisher.name',
+        'publisher_mbox': 'publisher.mbox',
+        'source': 'source',
+        'theme': 'theme',
+        'super_theme': 'superTheme',
+        'license': 'license',
+    },
+    'Distribution': {
+        'description': 'description',
+        'access_url': 'accessURL',
+        'type': 'type',
+        'format': 'format',
+    },
+}
+
+BATCH_SIZE = 200
+
+
+def metadata_value(metadata, path, field):
+    value = metadata
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    if isinstance(value, list):
+        value = ','.join(str(item) for item in value)
+    if value is None and not field.null:
+        value = field.get_default()
+    if isinstance(value, str) and field.max_length:
+        value = value[:field.max_length]
+    return value
+
+
+def update_batch(model, fields, batch):
+    updates = {}
+    for name, field in fields.items():
+        whens = [When(pk=pk, then=Value(values[name], output_field=field)) for pk, values in batch]
+        updates[name] = Case(*whens, output_field=field)
+    model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**updates)
+
+
+def fill_hot_metadata_fields(apps, _schema_editor):
+    for model_name, paths in HOT_METADATA_FIELDS.items():
+        model = apps.get_model('django_datajsonar', model_name)
+        fields = {name: model._meta.get_field(name) for name in paths}
+        batch = []
+        for pk, text in model.objects.values_list('pk', 'metadata').iterator():
+            metadata = json.loads(text or '{}')
+            batch.append((pk, {name: metadata_value(metadata, path, fields[name])
+                               for name, path in paths.items()}))
+            if len(batch) == BATCH_SIZE:
+                update_batch(model, fields, batch)
+                batch = []
+        if batch:
+            update_batch(model, fields, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0026_indexing_metric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalog',
+            name='publisher_name',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='license',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='publisher_mbox',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='publisher_name',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='source',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='super_theme',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='theme',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='access_url',
+            field=models.URLField(blank=True, max_length=1024, null=True),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='format',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='type',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['publisher_name'], name='django_data_publish_16ace8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['license'], name='django_data_license_b48b43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distribution',
+            index=models.Index(fields=['format'], name='django_data_format_db950f_idx'),
+        ),
+        migrations.RunPython(fill_hot_metadata_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0027_hot_metadata_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataset',
+            name='identifier',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='distribution',
+            name='identifier',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='field',
+            name='identifier',
+            field=models.CharField(db_index=True, max_length=200, null=True),
+        ),
+    ]
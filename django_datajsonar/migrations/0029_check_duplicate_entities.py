@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:13
+from __future__ import unicode_literals
+
+from django.core.management.base import CommandError
+from django.db import migrations
+from django.db.models import Count
+
+UNIQUE_KEYS = (
+    ('Dataset', ('catalog', 'identifier')),
+    ('Distribution', ('dataset', 'identifier')),
+    ('Field', ('distribution', 'title', 'identifier')),
+)
+
+
+def check_duplicates(apps, _schema_editor):
+    """Las claves únicas de 0030 no se pueden crear si hay entidades
+    repetidas. No se borran acá: se resuelven antes con el comando
+    remove_duplicate_entities, que muestra qué borra
+    """
+    for model_name, key in UNIQUE_KEYS:
+        model = apps.get_model('django_datajsonar', model_name)
+        duplicates = model.objects\
+            .filter(**{field + '__isnull': False for field in key})\
+            .values(*key)\
+            .annotate(count=Count('id'))\
+            .filter(count__gt=1)\
+            .order_by()
+        if duplicates.exists():
+            raise CommandError('Hay entidades {} repetidas. Correr "manage.py remove_duplicate_entities" '
+                               'antes de migrar'.format(model_name))
+
+
+class Migration(migrations.Migration):
+    # Nombre anterior de esta migración, que ya sólo chequea
+    replaces = [('django_datajsonar', '0029_remove_duplicate_entities')]
+
+    dependencies = [
+        ('django_datajsonar', '0028_identifier_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+    ]
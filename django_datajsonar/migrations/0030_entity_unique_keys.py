@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:13
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0029_check_duplicate_entities'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dataset',
+            unique_together=set([('catalog', 'identifier')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='distribution',
+            unique_together=set([('dataset', 'identifier')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='field',
+            unique_together=set([('distribution', 'title', 'identifier')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:19
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0030_entity_unique_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalog',
+            name='metadata_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='metadata_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='distribution',
+            name='metadata_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='field',
+            name='metadata_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
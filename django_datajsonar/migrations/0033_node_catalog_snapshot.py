@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:29
+from __future__ import unicode_literals
+
+import gzip
+import hashlib
+import os
+
+from django.core.files.base import ContentFile
+from django.db import migrations, models
+import django_datajsonar.models.node
+import django_datajsonar.storage.custom_catalog_storage
+
+
+def catalog_snapshot_name(catalog_hash):
+    """Copia del nombre de los snapshots al momento de esta migración"""
+    return os.path.join('snapshots', '{}.json.gz'.format(catalog_hash))
+
+
+def move_catalogs_to_snapshots(apps, _schema_editor):
+    """Pasa el JSON guardado en Node.catalog a un archivo comprimido"""
+    node_model = apps.get_model('django_datajsonar', 'Node')
+    for node in node_model.objects.exclude(catalog='{}').iterator():
+        content = node.catalog.encode('utf-8')
+        catalog_hash = hashlib.sha256(content).hexdigest()
+        node.catalog_snapshot.save(catalog_snapshot_name(catalog_hash),
+                                   ContentFile(gzip.compress(content)), save=False)
+        node_model.objects.filter(pk=node.pk).update(catalog_snapshot=node.catalog_snapshot.name,
+                                                     catalog_hash=catalog_hash)
+
+
+def restore_catalogs_from_snapshots(apps, _schema_editor):
+    node_model = apps.get_model('django_datajsonar', 'Node')
+    for node in node_model.objects.exclude(catalog_snapshot='').exclude(catalog_snapshot=None):
+        try:
+            with node.catalog_snapshot.storage.open(node.catalog_snapshot.name) as snapshot:
+                catalog = gzip.decompress(snapshot.read()).decode('utf-8')
+        except FileNotFoundError:
+            continue
+        node_model.objects.filter(pk=node.pk).update(catalog=catalog)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0032_catalog_data_json_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='catalog_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='catalog_snapshot',
+            field=models.FileField(blank=True, null=True, storage=django_datajsonar.storage.custom_catalog_storage.CustomCatalogStorage(), upload_to=django_datajsonar.models.node.catalog_file_path),
+        ),
+        migrations.RunPython(move_catalogs_to_snapshots, restore_catalogs_from_snapshots),
+        migrations.RemoveField(
+            model_name='node',
+            name='catalog',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:41
+from __future__ import unicode_literals
+
+import json
+from datetime import datetime
+
+from croniter import croniter
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copias de strings.SYNCHRO_WEEK_DAYS_FREQUENCY y frequency.get_next_run_date
+# al momento de esta migración
+SYNCHRO_WEEK_DAYS_FREQUENCY = 'week days'
+
+
+def get_next_run_date(start_time, scheduled_time, week_days):
+    cron_string = "{} {} * * {}".format(scheduled_time.minute, scheduled_time.hour,
+                                        ','.join(week_days) or '*')
+    return croniter(cron_string, start_time=start_time).get_next(datetime)
+
+
+def compute_next_run_at(apps, _schema_editor):
+    synchronizer_model = apps.get_model('django_datajsonar', 'Synchronizer')
+    for synchro in synchronizer_model.objects.all():
+        start_time = synchro.last_time_ran.astimezone(timezone.get_current_timezone())
+        week_days = json.loads(synchro.week_days) if synchro.frequency == SYNCHRO_WEEK_DAYS_FREQUENCY else []
+        next_run_at = get_next_run_date(start_time, synchro.scheduled_time, week_days)
+        synchronizer_model.objects.filter(pk=synchro.pk).update(next_run_at=next_run_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0033_node_catalog_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synchronizer',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(compute_next_run_at, migrations.RunPython.noop),
+    ]
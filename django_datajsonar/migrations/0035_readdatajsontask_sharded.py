@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:47
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0034_synchronizer_next_run_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readdatajsontask',
+            name='sharded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0035_readdatajsontask_sharded'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readdatajsontask',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactiva'), ('scheduled', 'Programada'), ('bulk', 'Descarga masiva')], default='scheduled', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='synchronizer',
+            name='interactive',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 21:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Títulos y descripciones que busca el admin con DATAJSON_AR_ADMIN_TEXT_SEARCH
+TEXT_SEARCH_FIELDS = (
+    ('Catalog', 'title'),
+    ('Dataset', 'title'),
+    ('Dataset', 'description'),
+    ('Distribution', 'title'),
+    ('Distribution', 'description'),
+    ('Field', 'title'),
+)
+
+# Indexa la misma expresión que genera Django para '__icontains' en PostgreSQL
+TRIGRAM_INDEX = 'CREATE INDEX IF NOT EXISTS {name} ON {table} ' \
+                'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+
+
+def trigram_indexes(apps, connection):
+    """Nombre, tabla y columna de cada índice, ya escapados"""
+    for model_name, field_name in TEXT_SEARCH_FIELDS:
+        model = apps.get_model('django_datajsonar', model_name)
+        table = model._meta.db_table
+        column = model._meta.get_field(field_name).column
+        yield (connection.ops.quote_name('{}_{}_trgm'.format(table, column)),
+               connection.ops.quote_name(table),
+               connection.ops.quote_name(column))
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Sólo en PostgreSQL, con la extensión pg_trgm. En otras bases de datos
+    la búsqueda de texto no usa índices
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in trigram_indexes(apps, schema_editor.connection):
+        schema_editor.execute(TRIGRAM_INDEX.format(name=name, table=table, column=column))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in trigram_indexes(apps, schema_editor.connection):
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0037_task_log_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
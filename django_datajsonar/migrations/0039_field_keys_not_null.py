@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:48
+from __future__ import unicode_literals
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+
+
+def check_duplicates(apps, _schema_editor):
+    """Al pasar los NULL a vacíos, los fields sin título o id que sólo se
+    diferenciaban por el NULL quedan repetidos. Se resuelven antes con el
+    comando remove_duplicate_entities
+    """
+    model = apps.get_model('django_datajsonar', 'Field')
+    duplicates = model.objects\
+        .annotate(title_key=Coalesce('title', Value('')),
+                  identifier_key=Coalesce('identifier', Value('')))\
+        .values('distribution', 'title_key', 'identifier_key')\
+        .annotate(count=Count('id'))\
+        .filter(count__gt=1)\
+        .order_by()
+    if duplicates.exists():
+        raise CommandError('Hay entidades Field repetidas. Correr "manage.py remove_duplicate_entities" '
+                           'antes de migrar')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datajsonar', '0038_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='field',
+            name='identifier',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='field',
+            name='title',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -10,8 +10,16 @@ from .utils import filepath, get_distribution_storage
 
 
 class Catalog(DataJsonEntityMixin):
+    HOT_METADATA_FIELDS = {
+        'publisher_name': 'publisher.name',
+    }
+
     title = models.CharField(max_length=200)
     identifier = models.CharField(max_length=200, unique=True)
+    publisher_name = models.CharField(max_length=200, null=True, blank=True)
+    # Hash del data.json completo de la última lectura sin errores. Si el de
+    # la lectura siguiente es igual, no se recorren sus entidades
+    data_json_hash = models.CharField(max_length=64, default='', blank=True)
     enhanced_meta = GenericRelation(Metadata, null=True)
 
     def __unicode__(self):
@@ -22,6 +30,21 @@ class Catalog(DataJsonEntityMixin):
 
 
 class Dataset(DataJsonEntityMixin):
+    class Meta:
+        unique_together = ('catalog', 'identifier')
+        indexes = [models.Index(fields=['catalog', 'run_generation']),
+                   models.Index(fields=['publisher_name']),
+                   models.Index(fields=['license'])]
+
+    HOT_METADATA_FIELDS = {
+        'description': 'description',
+        'publisher_name': 'publisher.name',
+        'publisher_mbox': 'publisher.mbox',
+        'source': 'source',
+        'theme': 'theme',
+        'super_theme': 'superTheme',
+        'license': 'license',
+    }
 
     REVIEWED = "REVIEWED"
     ON_REVISION = "ON_REVISION"
@@ -34,7 +57,7 @@ class Dataset(DataJsonEntityMixin):
     )
 
     title = models.CharField(max_length=200)
-    identifier = models.CharField(max_length=200)
+    identifier = models.CharField(max_length=200, db_index=True)
     catalog = models.ForeignKey(to=Catalog, on_delete=models.CASCADE)
     landing_page = models.URLField(blank=True, null=True)
     indexable = models.BooleanField(default=False, verbose_name='federable')
@@ -46,6 +69,16 @@ class Dataset(DataJsonEntityMixin):
 
     themes = models.TextField(blank=True, null=True)
 
+    # Copias de la metadata (ver HOT_METADATA_FIELDS). 'theme' y 'super_theme'
+    # son los ids separados por comas; 'themes' tiene los temas completos
+    description = models.TextField(null=True, blank=True)
+    publisher_name = models.CharField(max_length=200, null=True, blank=True)
+    publisher_mbox = models.CharField(max_length=200, null=True, blank=True)
+    source = models.TextField(null=True, blank=True)
+    theme = models.TextField(default='', blank=True)
+    super_theme = models.TextField(default='', blank=True)
+    license = models.CharField(max_length=200, null=True, blank=True)
+
     enhanced_meta = GenericRelation(Metadata)
 
     def __unicode__(self):
@@ -56,12 +89,33 @@ class Dataset(DataJsonEntityMixin):
 
 
 class Distribution(DataJsonEntityMixin):
-    identifier = models.CharField(max_length=200)
+    class Meta:
+        unique_together = ('dataset', 'identifier')
+        indexes = [models.Index(fields=['dataset', 'run_generation']),
+                   models.Index(fields=['format'])]
+
+    HOT_METADATA_FIELDS = {
+        'description': 'description',
+        'access_url': 'accessURL',
+        'type': 'type',
+        'format': 'format',
+    }
+
+    identifier = models.CharField(max_length=200, db_index=True)
     title = models.CharField(max_length=200)
     dataset = models.ForeignKey(to=Dataset, on_delete=models.CASCADE)
     download_url = models.URLField(max_length=1024, null=True)
     data_hash = models.CharField(max_length=128, default='')
     last_updated = models.DateTimeField(blank=True, null=True)
+    # Validadores HTTP de la última descarga, para hacer requests condicionales
+    data_etag = models.CharField(max_length=200, default='', blank=True)
+    data_last_modified = models.CharField(max_length=100, default='', blank=True)
+
+    # Copias de la metadata (ver HOT_METADATA_FIELDS)
+    description = models.TextField(null=True, blank=True)
+    access_url = models.URLField(max_length=1024, null=True, blank=True)
+    type = models.CharField(max_length=50, null=True, blank=True)
+    format = models.CharField(max_length=100, null=True, blank=True)
 
     data_file = models.FileField(
         storage=get_distribution_storage(),
@@ -79,8 +133,14 @@ class Distribution(DataJsonEntityMixin):
 
 
 class Field(DataJsonEntityMixin):
-    title = models.CharField(max_length=200, null=True)
-    identifier = models.CharField(max_length=200, null=True)
+    class Meta:
+        unique_together = ('distribution', 'title', 'identifier')
+        indexes = [models.Index(fields=['distribution', 'run_generation'])]
+
+    # Vacíos en lugar de NULL, para que la clave única valga también para los
+    # fields sin título o id
+    title = models.CharField(max_length=200, default='', blank=True)
+    identifier = models.CharField(max_length=200, default='', blank=True, db_index=True)
     distribution = models.ForeignKey(to=Distribution, on_delete=models.CASCADE)
 
     enhanced_meta = GenericRelation(Metadata)
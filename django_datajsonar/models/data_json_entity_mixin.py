@@ -1,17 +1,48 @@
+import hashlib
 import json
 
 import dateutil.tz
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
 from django.utils import timezone
 from iso8601 import iso8601
 from django_datajsonar.strings import DEFAULT_TIME_ZONE
 
 
+def metadata_value(metadata: dict, path: str):
+    """El valor de la metadata en 'path', con las claves separadas por
+    puntos (ej: 'publisher.name'), o None si no está. Las listas se unen
+    con comas
+    """
+    value = metadata
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    if isinstance(value, list):
+        value = ','.join(str(item) for item in value)
+    return value
+
+
+def metadata_hash(metadata: dict):
+    """Hash de la forma canónica de la metadata (claves ordenadas), que no
+    depende del orden de las claves en el data.json
+    """
+    canonical = json.dumps(metadata, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
 class DataJsonEntityMixin(models.Model):
     class Meta:
         abstract = True
 
+    # Claves de la metadata que se copian a columnas propias al actualizarla,
+    # para filtrar y exportar sin decodificar el JSON: {columna: path}. El
+    # setting DATAJSON_AR_HOT_METADATA_FIELDS puede cambiar, por modelo,
+    # cuáles de estas columnas se llenan y desde qué path
+    HOT_METADATA_FIELDS = {}
+
     metadata = models.TextField()
+    metadata_hash = models.CharField(max_length=64, default='', blank=True)
     present = models.BooleanField(default=True)
     updated = models.BooleanField(default=True)
     error = models.BooleanField(default=False)
@@ -21,19 +52,90 @@ class DataJsonEntityMixin(models.Model):
 
     issued = models.DateTimeField(null=True, blank=True)
 
+    # Número de la última lectura del catálogo en la que se vio la entidad. En
+    # Catalog, es el número de la última lectura iniciada
+    run_generation = models.PositiveIntegerField(default=0)
+
     def update_metadata(self, new_metadata: dict, updated_children=False, data_change=False):
-        previous_meta = self.get_metadata()
-        updated = (new_metadata != previous_meta or data_change or updated_children)
-        self.updated = updated
-        self.metadata = json.dumps(new_metadata)
+        new_hash = metadata_hash(new_metadata)
+        metadata_changed = new_hash != self.get_metadata_hash()
+        self.updated = metadata_changed or data_change or updated_children
+        self.metadata_hash = new_hash
         self.new = self.pk is None
         self.present = True
+        # Aun sin cambios en la metadata, las columnas pueden no reflejar un
+        # cambio de DATAJSON_AR_HOT_METADATA_FIELDS. Si coinciden, has_changes()
+        # evita reescribir la entidad
+        self.update_hot_metadata(new_metadata)
+        if not metadata_changed and self.issued is not None:
+            # Se conserva el texto guardado
+            return
 
+        self.metadata = json.dumps(new_metadata)
         if new_metadata.get('issued'):
             self.issued = iso8601.parse_date(new_metadata.get('issued'),
                                              default_timezone=dateutil.tz.gettz(DEFAULT_TIME_ZONE))
         else:
             self.issued = timezone.now()
 
+    @classmethod
+    def get_hot_metadata_fields(cls):
+        """Columnas a llenar y su path en la metadata: las configuradas
+        para el modelo en DATAJSON_AR_HOT_METADATA_FIELDS, o las default
+        """
+        configured = getattr(settings, 'DATAJSON_AR_HOT_METADATA_FIELDS', {}).get(cls.__name__)
+        if configured is None:
+            return cls.HOT_METADATA_FIELDS
+        unknown = set(configured) - set(cls.HOT_METADATA_FIELDS)
+        if unknown:
+            raise ImproperlyConfigured(
+                'DATAJSON_AR_HOT_METADATA_FIELDS: {} no tiene las columnas {}'.format(
+                    cls.__name__, ', '.join(sorted(unknown))))
+        return configured
+
+    def update_hot_metadata(self, metadata: dict):
+        """Copia la metadata a las columnas configuradas, y vacía las que
+        dejaron de estarlo
+        """
+        hot_fields = self.get_hot_metadata_fields()
+        for name in self.HOT_METADATA_FIELDS:
+            field = self._meta.get_field(name)
+            path = hot_fields.get(name)
+            value = metadata_value(metadata, path) if path is not None else None
+            if value is None and not field.null:
+                value = field.get_default()
+            if isinstance(value, str) and field.max_length:
+                value = value[:field.max_length]
+            setattr(self, name, value)
+
     def get_metadata(self):
         return json.loads(self.metadata or '{}')
+
+    def get_metadata_hash(self):
+        """Hash de la metadata guardada. Las entidades guardadas antes de que
+        existiera metadata_hash lo calculan a partir del JSON
+        """
+        if not self.metadata_hash and self.metadata:
+            return metadata_hash(self.get_metadata())
+        return self.metadata_hash
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(DataJsonEntityMixin, cls).from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changes(self, ignore=('run_generation',)):
+        """True si la entidad es nueva o si alguno de sus campos difiere de
+        lo leído de la base, sin contar los de 'ignore'
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        if self.pk is None or loaded_values is None:
+            return True
+        for field in self._meta.concrete_fields:
+            if field.attname not in loaded_values or field.name in ignore:
+                continue
+            if field.get_prep_value(getattr(self, field.attname)) != \
+                    field.get_prep_value(loaded_values[field.attname]):
+                return True
+        return False
@@ -1,11 +1,16 @@
 #! coding: utf-8
 from __future__ import unicode_literals
 
+import gzip
+import hashlib
+import json
 import os
+from functools import partial
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.files.base import ContentFile
+from django.db import models, transaction
 from django.utils import timezone
 from pydatajson import DataJson
 
@@ -85,6 +90,10 @@ def catalog_file_path(instance, filename=None):
                         f'{filename}')
 
 
+def catalog_snapshot_name(catalog_hash):
+    return os.path.join('snapshots', '{}.json.gz'.format(catalog_hash))
+
+
 class Node(models.Model):
     CKAN = "ckan"
     XLSX = "xlsx"
@@ -94,11 +103,23 @@ class Node(models.Model):
         (XLSX, "Catálogo XLSX"),
         (JSON, "Catálogo JSON"),
     )
+    # Copias del catálogo reemplazadas por save_catalog, a borrar al guardar el nodo
+    _replaced_snapshots = ()
+    # Campos que guarda la lectura del catálogo; no cambian las exportaciones de nodos
+    CATALOG_READ_FIELDS = ('catalog_snapshot', 'catalog_hash', 'catalog_etag',
+                           'catalog_last_modified', 'json_catalog_file', 'xlsx_catalog_file')
 
     catalog_id = models.CharField(max_length=100, unique=True)
     catalog_url = models.URLField()
     indexable = models.BooleanField(verbose_name='federable')
-    catalog = models.TextField(default='{}')
+    # Copia comprimida del último catálogo leído, nombrada por su hash
+    catalog_snapshot = models.FileField(upload_to=catalog_file_path,
+                                        storage=CustomCatalogStorage(),
+                                        null=True, blank=True)
+    catalog_hash = models.CharField(max_length=64, default='', blank=True)
+    # Validadores HTTP de la última lectura del catálogo
+    catalog_etag = models.CharField(max_length=200, default='', blank=True)
+    catalog_last_modified = models.CharField(max_length=100, default='', blank=True)
     admins = models.ManyToManyField(User, blank=True)
     catalog_format = models.CharField(max_length=20, choices=FORMATS,
                                       null=True, blank=True)
@@ -127,10 +148,52 @@ class Node(models.Model):
         if self.release_date is None and self.indexable is True:
             self.release_date = timezone.now().date()
         super(Node, self).save(force_insert, force_update, using, update_fields)
+        if update_fields is None or 'catalog_snapshot' in update_fields:
+            self._delete_replaced_snapshots()
+
+    def _delete_replaced_snapshots(self):
+        """Borra las copias reemplazadas por save_catalog una vez que se
+        confirma el save() con el nombre de la copia nueva: si la transacción
+        falla, el nodo sigue apuntando a una copia existente
+        """
+        replaced = [name for name in self._replaced_snapshots
+                    if name != self.catalog_snapshot.name]
+        self._replaced_snapshots = ()
+        storage = self.catalog_snapshot.storage
+        for name in replaced:
+            transaction.on_commit(partial(storage.delete, name))
 
     def read_catalog(self):
         return DataJson(self.catalog_url, catalog_format=self.catalog_format)
 
+    def save_catalog(self, catalog):
+        """Guarda una copia del catálogo comprimida con gzip, reemplazando a
+        la anterior. No hace save() del nodo: la copia anterior se borra al
+        guardarlo
+        """
+        content = json.dumps(catalog).encode('utf-8')
+        catalog_hash = hashlib.sha256(content).hexdigest()
+        if catalog_hash == self.catalog_hash and self.catalog_snapshot:
+            return
+
+        if self.catalog_snapshot:
+            self._replaced_snapshots += (self.catalog_snapshot.name,)
+        self.catalog_snapshot.save(catalog_snapshot_name(catalog_hash),
+                                   ContentFile(gzip.compress(content)), save=False)
+        self.catalog_hash = catalog_hash
+
+    def load_catalog(self):
+        """Devuelve el catálogo guardado con save_catalog, o None si no hay
+        una copia guardada
+        """
+        if not self.catalog_snapshot:
+            return None
+        try:
+            with self.catalog_snapshot.storage.open(self.catalog_snapshot.name) as snapshot:
+                return json.loads(gzip.decompress(snapshot.read()).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+
     def __unicode__(self):
         return self.catalog_id
 
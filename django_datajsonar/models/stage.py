@@ -4,8 +4,11 @@ from __future__ import unicode_literals
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
+from django_rq import get_queue
 
 from django_datajsonar.models import AbstractTask
+from django_datajsonar.queues import tracks_stage_jobs, pending_stage_run_jobs, \
+    priority_queue, stage_job_queues, PRIORITY_META
 from django_datajsonar.utils.utils import import_string, pending_or_running_jobs
 
 
@@ -38,9 +41,17 @@ class Stage(models.Model):
         except task_model.DoesNotExist:
             return None
 
-    def open_stage(self, node=None):
+    def open_stage(self, node=None, priority=None):
+        """Encola el callable de la etapa. Con una clase de prioridad, lo
+        encola en la cola de esa clase (o en la de la etapa, si no tiene una)
+        marcado con la prioridad, que heredan las tareas que crea
+        """
         job = import_string(self.callable_str)
-        job.delay(node)
+        if priority is None:
+            job.delay(node)
+        else:
+            get_queue(priority_queue(priority, self.queue))\
+                .enqueue(job, node, meta={PRIORITY_META: priority})
         self.status = Stage.ACTIVE
         self.save()
 
@@ -53,8 +64,15 @@ class Stage(models.Model):
         self.status = self.INACTIVE
         self.save()
 
-    def check_completion(self):
-        return not pending_or_running_jobs(self.queue)
+    def check_completion(self, run_id=None):
+        """Si la cola registra los jobs de cada corrida (SynchronizerQueue),
+        la etapa termina cuando terminaron los jobs de la corrida run_id. Si
+        no, cuando se vaciaron todas las colas en las que pueden quedar jobs
+        de la etapa (ver stage_job_queues)
+        """
+        if run_id is not None and tracks_stage_jobs(self.queue):
+            return not pending_stage_run_jobs(self.queue, run_id)
+        return not any(pending_or_running_jobs(queue) for queue in stage_job_queues(self.queue))
 
     def clean(self):
         errors = {}
@@ -8,8 +8,9 @@ from django.utils import timezone
 
 from django_datajsonar.frequency import get_next_run_date
 from django_datajsonar.models.node import Node
+from django_datajsonar.queues import opening_stage_run, stage_run_id
 from django_datajsonar.strings import SYNCHRO_DAILY_FREQUENCY,\
-    SYNCHRO_WEEK_DAYS_FREQUENCY
+    SYNCHRO_WEEK_DAYS_FREQUENCY, INTERACTIVE_PRIORITY
 from .stage import Stage
 
 
@@ -34,6 +35,8 @@ class Synchronizer(models.Model):
                                      on_delete=models.PROTECT)
 
     node = models.ForeignKey(to=Node, blank=True, null=True)
+    # Corrida iniciada a mano: sus etapas se encolan con prioridad interactiva
+    interactive = models.BooleanField(default=False)
 
     WEEK_DAYS = SYNCHRO_WEEK_DAYS_FREQUENCY
     DAILY = SYNCHRO_DAILY_FREQUENCY
@@ -49,6 +52,18 @@ class Synchronizer(models.Model):
 
     week_days = models.TextField(blank=True)
 
+    # Próximo inicio, calculado al guardar, para buscar los synchronizers
+    # vencidos sin evaluar la expresión cron de cada uno
+    next_run_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        self.next_run_at = self.compute_next_start_date()
+        if update_fields is not None and 'next_run_at' not in update_fields:
+            update_fields = list(update_fields) + ['next_run_at']
+        super(Synchronizer, self).save(force_insert=force_insert, force_update=force_update,
+                                       using=using, update_fields=update_fields)
+
     def begin_stage(self, stage=None):
         if self.status == self.RUNNING and stage is None:
             raise Exception('El synchronizer ya está corriendo,'
@@ -58,12 +73,22 @@ class Synchronizer(models.Model):
         self.actual_stage = stage
         self.last_time_ran = timezone.now()
         self.save()
-        stage.open_stage(self.node)
+        with opening_stage_run(self.stage_run_id()):
+            if self.interactive:
+                stage.open_stage(self.node, priority=INTERACTIVE_PRIORITY)
+            else:
+                stage.open_stage(self.node)
 
     def check_completion(self):
         if self.status != self.RUNNING:
             raise Exception('El synchronizer no está corriendo')
-        return self.actual_stage.check_completion()
+        return self.actual_stage.check_completion(self.stage_run_id())
+
+    def stage_run_id(self):
+        """Identificador de la corrida de la etapa actual, con el que se
+        marcan los jobs que encola
+        """
+        return stage_run_id(self.pk, self.actual_stage_id, self.last_time_ran)
 
     def next_stage(self):
         if self.status != self.RUNNING:
@@ -73,13 +98,19 @@ class Synchronizer(models.Model):
             self.status = self.STAND_BY
             self.actual_stage = None
             self.node = None
+            self.interactive = False
             self.save()
         else:
             self.begin_stage(self.actual_stage.next_stage)
 
     def next_start_date(self):
-        start_time = self.last_time_ran\
-            .astimezone(timezone.get_current_timezone())
+        if self.next_run_at is None:
+            return self.compute_next_start_date()
+        return self.next_run_at
+
+    def compute_next_start_date(self):
+        last_time_ran = self.last_time_ran or timezone.now()
+        start_time = last_time_ran.astimezone(timezone.get_current_timezone())
         week_days = self.get_days_of_week()
         return get_next_run_date(start_time, self.scheduled_time,
                                  week_days=week_days)
@@ -1,11 +1,69 @@
 #! coding: utf-8
 from __future__ import unicode_literals
 
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.db import models, transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat
 from django.utils import timezone
 
 from django_datajsonar.models.node import Node
+from django_datajsonar.strings import INTERACTIVE_PRIORITY, SCHEDULED_PRIORITY, \
+    BULK_PRIORITY
+
+
+_log_buffers = threading.local()
+
+
+class TaskLogEntry(models.Model):
+    """Lote de mensajes de log de una tarea. Los logs se agregan como filas
+    nuevas, sin reescribir los anteriores
+    """
+    class Meta:
+        verbose_name = 'Task log entry'
+        verbose_name_plural = 'Task log entries'
+        index_together = (('content_type', 'object_id'),)
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    task = GenericForeignKey()
+    created = models.DateTimeField(auto_now_add=True)
+    text = models.TextField()
+
+
+class TaskLogBuffer:
+    """Acumula los mensajes de log de una tarea y los agrega a sus logs
+    de a lotes, cuando se juntan DATAJSON_AR_TASK_LOG_BUFFER_SIZE mensajes o
+    pasan DATAJSON_AR_TASK_LOG_FLUSH_INTERVAL segundos desde la última
+    escritura, y al cerrarse el buffer
+    """
+
+    def __init__(self, task_model, task_id):
+        self.task_model = task_model
+        self.task_id = task_id
+        self.max_size = getattr(settings, 'DATAJSON_AR_TASK_LOG_BUFFER_SIZE', 100)
+        self.flush_interval = getattr(settings, 'DATAJSON_AR_TASK_LOG_FLUSH_INTERVAL', 10)
+        self.messages = []
+        self.last_flush = time.time()
+
+    def append(self, msg):
+        self.messages.append(msg)
+        if len(self.messages) >= self.max_size or \
+                time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.messages:
+            self.task_model.append_logs(self.task_id, self.messages)
+        self.messages = []
+        self.last_flush = time.time()
 
 
 class AbstractTask(models.Model):
@@ -22,7 +80,10 @@ class AbstractTask(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     created = models.DateTimeField(auto_now_add=True)
     finished = models.DateTimeField(null=True)
+    # Mientras corre la tarea los logs se guardan en log_entries; al
+    # terminar se pasan a este campo (ver consolidate_logs)
     logs = models.TextField()
+    log_entries = GenericRelation(TaskLogEntry)
 
     node = models.ForeignKey(to=Node, default=None, null=True, blank=True)
 
@@ -33,6 +94,8 @@ class AbstractTask(models.Model):
 
         super(AbstractTask, self).save(force_insert, force_update,
                                        using, update_fields)
+        if self.status == self.FINISHED and type(self).consolidate_logs([self.pk]):
+            self.refresh_from_db(fields=['logs'])
 
     def __unicode__(self):
         return "Task at %s" % self._format_date(self.created)
@@ -45,10 +108,71 @@ class AbstractTask(models.Model):
 
     @classmethod
     def info(cls, task, msg):
+        buffers = getattr(_log_buffers, 'buffers', {})
+        log_buffer = buffers.get((cls, task.id))
+        if log_buffer is not None:
+            log_buffer.append(msg)
+        else:
+            cls.append_logs(task.id, [msg])
+
+    def get_logs(self):
+        """Texto completo de los logs de la tarea, en orden, incluidos los
+        que todavía no se pasaron a 'logs'
+        """
+        entries = self.log_entries.order_by('id').values_list('text', flat=True)
+        return self.logs + ''.join(entries)
+
+    @classmethod
+    def append_logs(cls, task_id, messages):
+        """Agrega los mensajes a los logs de la tarea con un único INSERT,
+        sin leer ni reescribir los logs anteriores
+        """
+        TaskLogEntry.objects.create(content_type=ContentType.objects.get_for_model(cls),
+                                    object_id=task_id,
+                                    text=''.join(msg + '\n' for msg in messages))
+
+    @classmethod
+    def consolidate_logs(cls, task_ids):
+        """Agrega al campo 'logs' de cada tarea el texto de sus log_entries,
+        con un UPDATE por tarea, y los borra. Se llama al terminar las tareas,
+        por lo que 'logs' tiene todos los logs de las tareas terminadas.
+        Devuelve True si había logs para pasar
+        """
+        entries = TaskLogEntry.objects.filter(content_type=ContentType.objects.get_for_model(cls),
+                                              object_id__in=task_ids)
+        texts = defaultdict(list)
+        last_id = None
+        for entry_id, task_id, text in entries.order_by('id').values_list('id', 'object_id', 'text'):
+            texts[task_id].append(text)
+            last_id = entry_id
+        if last_id is None:
+            return False
+
         with transaction.atomic():
-            task = cls.objects.select_for_update().get(id=task.id)
-            task.logs += msg + '\n'
-            task.save()
+            for task_id, task_texts in texts.items():
+                cls.objects.filter(pk=task_id).update(
+                    logs=Concat('logs', Value(''.join(task_texts)), output_field=TextField()))
+            entries.filter(id__lte=last_id).delete()
+        return True
+
+    @classmethod
+    @contextmanager
+    def buffered_logs(cls, task):
+        """Dentro del bloque, los mensajes pasados a info() para la tarea
+        desde el thread actual se escriben de a lotes
+        """
+        if not hasattr(_log_buffers, 'buffers'):
+            _log_buffers.buffers = {}
+        key = (cls, task.id)
+        if key in _log_buffers.buffers:  # Bloque anidado, uso el buffer existente
+            yield
+            return
+
+        _log_buffers.buffers[key] = TaskLogBuffer(cls, task.id)
+        try:
+            yield
+        finally:
+            _log_buffers.buffers.pop(key).flush()
 
     class Meta:
         abstract = True
@@ -67,3 +191,111 @@ class ReadDataJsonTask(AbstractTask):
     default_mode = getattr(settings, 'DATAJSON_AR_DOWNLOAD_RESOURCES', True)
     indexing_mode = models.BooleanField(choices=INDEXING_CHOICES,
                                         default=default_mode)
+    # Reparte los nodos entre las colas de DATAJSON_AR_INDEXING_SHARD_QUEUES
+    sharded = models.BooleanField(default=False)
+
+    INTERACTIVE = INTERACTIVE_PRIORITY
+    SCHEDULED = SCHEDULED_PRIORITY
+    BULK = BULK_PRIORITY
+    PRIORITY_CHOICES = (
+        (INTERACTIVE, 'Interactiva'),
+        (SCHEDULED, 'Programada'),
+        (BULK, 'Descarga masiva'),
+    )
+    # Los nodos se leen en la cola de su prioridad en DATAJSON_AR_PRIORITY_QUEUES
+    priority = models.CharField(max_length=16, choices=PRIORITY_CHOICES, default=SCHEDULED)
+
+
+class IndexingError(models.Model):
+    """Error ocurrido al leer una entidad del catálogo durante una
+    ReadDataJsonTask. Los errores de cada catálogo se escriben todos juntos
+    al final de su lectura
+    """
+    class Meta:
+        verbose_name = 'Indexing error'
+        indexes = [
+            models.Index(fields=['task', 'entity_type']),
+            models.Index(fields=['catalog_identifier', 'entity_type', 'entity_identifier']),
+            models.Index(fields=['exception_class', 'created']),
+        ]
+
+    CATALOG = 'catalog'
+    DATASET = 'dataset'
+    DISTRIBUTION = 'distribution'
+    FIELD = 'field'
+    ENTITY_TYPE_CHOICES = (
+        (CATALOG, 'Catálogo'),
+        (DATASET, 'Dataset'),
+        (DISTRIBUTION, 'Distribución'),
+        (FIELD, 'Field'),
+    )
+
+    task = models.ForeignKey(ReadDataJsonTask, on_delete=models.CASCADE,
+                             related_name='indexing_errors')
+    entity_type = models.CharField(max_length=20, choices=ENTITY_TYPE_CHOICES)
+    catalog_identifier = models.CharField(max_length=200)
+    entity_identifier = models.CharField(max_length=200, blank=True, default='')
+    exception_class = models.CharField(max_length=200, blank=True, default='')
+    message = models.TextField()
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __unicode__(self):
+        return "%s %s: %s" % (self.entity_type, self.entity_identifier, self.exception_class)
+
+    def __str__(self):
+        return self.__unicode__()
+
+    @classmethod
+    def from_entity(cls, task, msg, model, field_kw, exception=None):
+        """Arma (sin guardar) el error de la entidad de tipo 'model' buscada
+        con 'field_kw', como los recibe log_exception. Los modelos padre de
+        'field_kw' ya están en memoria, no se hacen queries
+        """
+        catalog_identifier = field_kw.get('identifier')
+        for parent in ('distribution', 'dataset', 'catalog'):
+            if parent in field_kw:
+                catalog_identifier = cls._catalog_identifier(field_kw[parent])
+                break
+
+        return cls(task_id=task.id,
+                   entity_type=model._meta.model_name,
+                   catalog_identifier=catalog_identifier or '',
+                   entity_identifier=field_kw.get('identifier') or '',
+                   exception_class=type(exception).__name__ if exception is not None else '',
+                   message=str(exception) if exception is not None else msg)
+
+    @staticmethod
+    def _catalog_identifier(entity):
+        if hasattr(entity, 'distribution'):
+            entity = entity.distribution
+        if hasattr(entity, 'dataset'):
+            entity = entity.dataset
+        if hasattr(entity, 'catalog'):
+            entity = entity.catalog
+        return entity.identifier
+
+
+class IndexingMetric(models.Model):
+    """Mediciones acumuladas de una sección de la lectura de un nodo en una
+    ReadDataJsonTask: cantidad de llamadas (entidades, para las secciones de
+    cada tipo de entidad), duración total, queries SQL y bytes descargados.
+    Las secciones anidadas incluyen las mediciones de las internas
+    """
+    class Meta:
+        verbose_name = 'Indexing metric'
+        unique_together = (('task', 'node', 'section'),)
+
+    task = models.ForeignKey(ReadDataJsonTask, on_delete=models.CASCADE,
+                             related_name='metrics')
+    node = models.ForeignKey(Node, on_delete=models.SET_NULL, null=True, blank=True)
+    section = models.CharField(max_length=50)
+    calls = models.PositiveIntegerField(default=0)
+    duration = models.FloatField(default=0, help_text='En segundos')
+    queries = models.PositiveIntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)
+
+    def __unicode__(self):
+        return "%s: %s" % (self.node, self.section)
+
+    def __str__(self):
+        return self.__unicode__()
@@ -0,0 +1,120 @@
+#! coding: utf-8
+"""Seguimiento de los jobs de cada corrida de una etapa de un Synchronizer.
+Los jobs encolados en una SynchronizerQueue mientras se abre la etapa, o
+desde otro job de la corrida, quedan marcados con su identificador y
+registrados en un set de Redis. La etapa termina cuando terminaron todos
+esos jobs, sin importar el resto de los jobs de la cola
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django_rq import get_queue
+from django_rq.queues import DjangoRQ
+from rq import get_current_job
+from rq.job import Job, JobStatus
+
+from django_datajsonar.indexing.constants import SCHEDULER_KEYS_TTL
+
+STAGE_RUN_META = 'django_datajsonar_stage_run'
+PRIORITY_META = 'django_datajsonar_priority'
+STAGE_RUN_JOBS_KEY = 'django_datajsonar:stage_run:{}:jobs'
+DONE_STATUSES = (JobStatus.FINISHED, JobStatus.FAILED)
+
+_opening = threading.local()
+
+
+def stage_run_id(synchro_id, stage_id, started):
+    return '{}:{}:{}'.format(synchro_id, stage_id, started.timestamp())
+
+
+def stage_run_synchro_id(run_id):
+    return int(run_id.split(':')[0])
+
+
+@contextmanager
+def opening_stage_run(run_id):
+    """Los jobs encolados dentro del bloque pertenecen a la corrida run_id"""
+    _opening.run_id = run_id
+    try:
+        yield
+    finally:
+        _opening.run_id = None
+
+
+def current_stage_run():
+    run_id = getattr(_opening, 'run_id', None)
+    if run_id is not None:
+        return run_id
+    job = get_current_job()
+    return job.meta.get(STAGE_RUN_META) if job is not None else None
+
+
+def priority_queue(priority, default=None):
+    """Cola de la clase de prioridad 'priority' según el setting
+    DATAJSON_AR_PRIORITY_QUEUES, o 'default' si no tiene una
+    """
+    return getattr(settings, 'DATAJSON_AR_PRIORITY_QUEUES', {}).get(priority, default)
+
+
+def stage_job_queues(queue_name):
+    """Colas en las que pueden quedar jobs de una etapa de la cola
+    'queue_name': la propia, las de DATAJSON_AR_INDEXING_SHARD_QUEUES, en las
+    que la lectura por shards encola la lectura de cada nodo, y las de
+    DATAJSON_AR_PRIORITY_QUEUES, en las que se encolan las corridas y
+    lecturas con prioridad
+    """
+    queues = [queue_name]
+    for queue in list(getattr(settings, 'DATAJSON_AR_INDEXING_SHARD_QUEUES', [])) + \
+            list(getattr(settings, 'DATAJSON_AR_PRIORITY_QUEUES', {}).values()):
+        if queue not in queues:
+            queues.append(queue)
+    return queues
+
+
+def current_priority():
+    """Clase de prioridad con la que se encoló el job actual, si tiene"""
+    job = get_current_job()
+    return job.meta.get(PRIORITY_META) if job is not None else None
+
+
+def tracks_stage_jobs(queue_name):
+    return isinstance(get_queue(queue_name), SynchronizerQueue)
+
+
+def pending_stage_run_jobs(queue_name, run_id):
+    """True si queda algún job de la corrida sin terminar. Quita del set a
+    los terminados y a los que ya no existen
+    """
+    connection = get_queue(queue_name).connection
+    key = STAGE_RUN_JOBS_KEY.format(run_id)
+    job_ids = [job_id.decode('utf-8') for job_id in connection.smembers(key)]
+    pipe = connection.pipeline()
+    for job_id in job_ids:
+        pipe.hget(Job.key_for(job_id), 'status')
+    statuses = pipe.execute()
+
+    done = [job_id for job_id, status in zip(job_ids, statuses)
+            if status is None or status.decode('utf-8') in DONE_STATUSES]
+    if done:
+        connection.srem(key, *done)
+    return len(done) < len(job_ids)
+
+
+class SynchronizerQueue(DjangoRQ):
+    """Cola que registra los jobs encolados por las etapas de los
+    synchronizers. Se configura para todas las colas con el setting
+    RQ = {'QUEUE_CLASS': 'django_datajsonar.queues.SynchronizerQueue'}
+    """
+
+    def enqueue_job(self, job, pipeline=None, at_front=False):
+        run_id = job.meta.get(STAGE_RUN_META) or current_stage_run()
+        if run_id is not None:
+            job.meta[STAGE_RUN_META] = run_id
+            key = STAGE_RUN_JOBS_KEY.format(run_id)
+            pipe = self.connection.pipeline()
+            pipe.sadd(key, job.id)
+            pipe.expire(key, SCHEDULER_KEYS_TTL)
+            pipe.execute()
+        return super(SynchronizerQueue, self).enqueue_job(job, pipeline=pipeline,
+                                                          at_front=at_front)
@@ -0,0 +1,52 @@
+#! coding: utf-8
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from django_datajsonar.models import Node, NodeMetadata, Jurisdiction, ProjectMetadata, \
+    Publisher, Language, Spatial, Synchronizer
+from django_datajsonar.indexing.tasks import schedule_export_files
+from django_datajsonar.synchronizer import schedule_synchro_start
+from django_datajsonar.utils.export_files import NODE_EXPORTS
+from django_datajsonar.utils.metadata_generator import PROJECT_METADATA_MODELS, \
+    invalidate_project_metadata
+
+NODE_EXPORTS_SENDERS = (Node, NodeMetadata, Jurisdiction, ProjectMetadata, Publisher,
+                        Language, Spatial)
+
+
+def schedule_node_exports(sender, update_fields=None, **_):
+    """Los cambios en la metadata de nodos, jurisdicciones o del proyecto
+    encolan la regeneración de las exportaciones de nodos (nodes.json,
+    nodos.csv, etc.) al confirmarse la transacción. Los saves de la lectura
+    del catálogo, que no cambian las exportaciones, no la encolan
+    """
+    if sender is Node and update_fields and set(update_fields) <= set(Node.CATALOG_READ_FIELDS):
+        return
+    transaction.on_commit(lambda: schedule_export_files(NODE_EXPORTS))
+
+
+def invalidate_project_metadata_cache(**_):
+    invalidate_project_metadata()
+
+
+def schedule_stand_by_synchro(instance, **_):
+    """Programa el próximo inicio de los synchronizers creados, editados
+    o que terminaron de correr
+    """
+    if instance.status == Synchronizer.STAND_BY:
+        schedule_synchro_start(instance)
+
+
+def _connect(receiver, senders):
+    for sender in senders:
+        for signal in (post_save, post_delete):
+            signal.connect(receiver, sender=sender,
+                           dispatch_uid='{}_{}'.format(receiver.__name__, sender.__name__))
+
+
+def connect_signals():
+    # La metadata del proyecto se invalida antes que las exportaciones, que la usan
+    _connect(invalidate_project_metadata_cache, PROJECT_METADATA_MODELS)
+    _connect(schedule_node_exports, NODE_EXPORTS_SENDERS)
+    post_save.connect(schedule_stand_by_synchro, sender=Synchronizer,
+                      dispatch_uid='schedule_stand_by_synchro')
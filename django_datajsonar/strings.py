@@ -6,6 +6,11 @@ FILE_READ_ERROR = u"Error en la lectura del archivo de entrada"
 SYNCHRO_DAILY_FREQUENCY = 'every day'
 SYNCHRO_WEEK_DAYS_FREQUENCY = 'week days'
 
+# Clases de prioridad de los jobs de lectura, según qué los inició
+INTERACTIVE_PRIORITY = 'interactive'
+SCHEDULED_PRIORITY = 'scheduled'
+BULK_PRIORITY = 'bulk'
+
 
 # Valores de días de la semana leídos por librerías de crontab, según el estándar.
 MON = 'MON'
@@ -1,44 +1,128 @@
 #!coding=utf8
 from __future__ import unicode_literals
 
+import logging
+
+import django_rq
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from redis.exceptions import RedisError
 
+from django_datajsonar.queues import stage_run_synchro_id, stage_job_queues
 from django_datajsonar.task_closer import TaskCloser
 from django_datajsonar.utils.utils import import_string
 from .models import Synchronizer, Stage
 
+logger = logging.getLogger(__name__)
+
+SYNCHRO_START_QUEUE = 'default'
+SYNCHRO_START_JOB_ID = 'django_datajsonar-synchronizer-start-{}'
+
 
 def upkeep():
     """"
     Función periódica que chequea la finzalización de cada etapa. En caso de
     que finalice,arranca la siguiente etapa o termina el proceso general.
+    Las etapas avanzan apenas se vacía su cola si los workers corren con
+    SynchronizerWorker, y los synchronizers arrancan con los jobs programados
+    por schedule_synchro_start: upkeep queda como respaldo de ambos
     """
     start_synchros()
 
     synchronizers = Synchronizer.objects.filter(status=Synchronizer.RUNNING)
     for synchro in synchronizers:
-        if synchro.check_completion():
-            synchro.next_stage()
+        advance_synchro(synchro.pk)
 
     close_opened_tasks()
 
 
-def close_opened_tasks():
+def queue_job_finished(queue_name, run_id=None):
+    """Evento de fin de un job de la cola 'queue_name'. Avanza de etapa a los
+    synchronizers cuya etapa en curso puede tener jobs en esa cola (ver
+    stage_job_queues), o al de la corrida 'run_id' del job, si terminó, y
+    cierra las tareas abiertas de esas etapas
+    """
+    stage_queues = _stage_queues(queue_name)
+    synchronizers = Synchronizer.objects.filter(status=Synchronizer.RUNNING)
+    if run_id is not None:
+        synchronizers = synchronizers.filter(Q(actual_stage__queue__in=stage_queues) |
+                                             Q(pk=stage_run_synchro_id(run_id)))
+    else:
+        synchronizers = synchronizers.filter(actual_stage__queue__in=stage_queues)
+    for synchro_id in synchronizers.values_list('pk', flat=True):
+        advance_synchro(synchro_id)
+
+    close_opened_tasks(queue_name)
+
+
+def _stage_queues(queue_name):
+    """Colas de las etapas que pueden tener jobs en la cola 'queue_name'"""
+    queues = Stage.objects.values_list('queue', flat=True).distinct()
+    return [queue for queue in queues if queue_name in stage_job_queues(queue)]
+
+
+def advance_synchro(synchro_id):
+    """Pasa el synchronizer a su siguiente etapa si terminó la actual. Toma
+    un lock sobre la fila, para que varios workers que terminan a la vez no
+    lo avancen más de una vez
+    """
+    with transaction.atomic():
+        synchro = Synchronizer.objects.select_for_update()\
+            .filter(pk=synchro_id, status=Synchronizer.RUNNING).first()
+        if synchro is not None and synchro.check_completion():
+            synchro.next_stage()
+
+
+def close_opened_tasks(queue_name=None):
     task_closer = TaskCloser()
     for stage_settings in settings.DATAJSONAR_STAGES.values():
         task_name = stage_settings.get('task')
+        if queue_name is not None and \
+                queue_name not in stage_job_queues(stage_settings.get('queue')):
+            continue
         if task_name:
             task = import_string(task_name)
             task_closer.close_all_opened(task)
 
 
 def start_synchros():
-    synchronizers = Synchronizer.objects.filter(status=Synchronizer.STAND_BY)
-    now = timezone.now()
-    for synchro in synchronizers:
-        if now > synchro.next_start_date():
+    synchronizers = Synchronizer.objects\
+        .filter(status=Synchronizer.STAND_BY, next_run_at__lte=timezone.now())\
+        .values_list('pk', flat=True)
+    for synchro_id in synchronizers:
+        start_synchro(synchro_id)
+
+
+def start_synchro(synchro_id):
+    """Job programado por schedule_synchro_start: comienza el synchronizer
+    si está en espera y ya pasó su próxima fecha de inicio. Si se editó
+    después de programarse, lo vuelve a programar
+    """
+    with transaction.atomic():
+        synchro = Synchronizer.objects.select_for_update()\
+            .filter(pk=synchro_id, status=Synchronizer.STAND_BY).first()
+        if synchro is None:
+            return
+        if synchro.next_start_date() <= timezone.now():
             synchro.begin_stage()
+            return
+    schedule_synchro_start(synchro)
+
+
+def schedule_synchro_start(synchro):
+    """Programa en rq-scheduler (un sorted set de Redis ordenado por fecha)
+    el inicio del synchronizer en su próxima fecha. Cada synchronizer tiene
+    un único job programado, que se reemplaza al volver a programarlo. Si
+    Redis no está disponible, el synchronizer lo inicia upkeep
+    """
+    try:
+        scheduler = django_rq.get_scheduler(SYNCHRO_START_QUEUE)
+        scheduler.enqueue_at(synchro.next_start_date(), start_synchro, synchro.pk,
+                             job_id=SYNCHRO_START_JOB_ID.format(synchro.pk))
+    except RedisError as e:
+        logger.warning('No se pudo programar el synchronizer %s: %s', synchro, e)
 
 
 def create_or_update_synchro(synchro_id, stages, data=None):
@@ -60,4 +144,6 @@ def create_or_update_synchro(synchro_id, stages, data=None):
         .delete()
 
     synchro.refresh_from_db()
+    # Recalcula el próximo inicio, y lo programa si está en espera
+    synchro.save()
     return synchro
@@ -8,8 +8,14 @@ class TaskCloser:
         self.task_jobs = task_jobs
 
     def close_all_opened(self, task_model):
+        # Sin tareas abiertas no hace falta revisar la cola
+        running = list(task_model.objects.filter(status=AbstractTask.RUNNING)
+                       .values_list('id', flat=True))
+        if not running:
+            return
         if not self.has_jobs_in_queue(task_model):
-            task_model.objects.update(status=AbstractTask.FINISHED)
+            task_model.objects.filter(id__in=running).update(status=AbstractTask.FINISHED)
+            task_model.consolidate_logs(running)
 
     def has_jobs_in_queue(self, task_model):
         return self.task_jobs(task_model)
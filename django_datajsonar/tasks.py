@@ -5,14 +5,16 @@ import yaml
 
 from django.conf import settings
 
-from django_rq import job
+from django_rq import job, get_queue
 
 from django_datajsonar.actions import DatasetIndexableToggler
-from django_datajsonar.indexing.tasks import close_read_datajson_task
 from django_datajsonar.models import Node, DatasetIndexingFile, NodeRegisterFile, \
     ReadDataJsonTask
+from django_datajsonar.queues import priority_queue, current_priority
 from django_datajsonar.strings import FILE_READ_ERROR
-from .indexing.catalog_reader import index_catalog
+from .indexing.catalog_reader import index_catalog, enqueue_index_catalog
+from .indexing.node_scheduler import NodeIndexingScheduler
+from .indexing.sharding import shard_queues
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +22,31 @@ logger = logging.getLogger(__name__)
 @job('indexing')
 def read_datajson(task, whitelist=False, read_local=False):
     """Tarea raíz de indexación. Itera sobre todos los nodos indexables (federados) e
-    inicia la tarea de indexación sobre cada uno de ellos
+    inicia la tarea de indexación sobre cada uno de ellos. La cantidad de nodos
+    leídos a la vez y el cierre de la tarea al terminar el último nodo quedan a
+    cargo de NodeIndexingScheduler. En las tareas por shards, los nodos se
+    reparten entre las colas de DATAJSON_AR_INDEXING_SHARD_QUEUES; si no, se
+    leen en la cola de la prioridad de la tarea, si tiene una
     """
     nodes = [task.node] if task.node else Node.objects.filter(indexable=True)
+    if task.sharded and not task.node:
+        queues = shard_queues()
+    else:
+        queue_name = priority_queue(task.priority)
+        queues = [queue_name] if queue_name else None
 
-    for node in nodes:
-        index_one_catalog(task, node, read_local, whitelist)
+    scheduler = NodeIndexingScheduler(task)
+    for node in scheduler.start(nodes, queues):
+        queue_name = scheduler.queue_for(node) if queues else None
+        index_one_catalog(task, node, read_local, whitelist, queue_name)
 
-    close_read_datajson_task.delay()
 
-
-def index_one_catalog(task, node, read_local, whitelist):
+def index_one_catalog(task, node, read_local, whitelist, queue_name=None):
     try:
-        index_catalog.delay(node, task, read_local, whitelist)
+        if queue_name is None:
+            index_catalog.delay(node, task, read_local, whitelist)
+        else:
+            enqueue_index_catalog(queue_name, node, task, read_local, whitelist)
     except Exception as e:
         logger.error(u"Excepción leyendo nodo %s: %s", node.id, e)
 
@@ -84,7 +98,30 @@ def process_node_register_file(register_file_id):
     register_file.save()
 
 
-def schedule_new_read_datajson_task(mode=None, node=None):
+def start_read_task(task):
+    """Encola la lectura de la tarea en la cola de su prioridad, o en la
+    cola de read_datajson si no tiene una
+    """
+    queue_name = priority_queue(task.priority)
+    if queue_name is None:
+        read_datajson.delay(task)
+    else:
+        get_queue(queue_name).enqueue(read_datajson, task)
+
+
+def read_task_priority(mode):
+    """Prioridad de una tarea nueva: la del job que la crea (por ejemplo,
+    interactiva si la etapa se corrió a mano). Las lecturas programadas que
+    descargan distribuciones son descargas masivas
+    """
+    priority = current_priority()
+    if priority is None or priority == ReadDataJsonTask.SCHEDULED:
+        return ReadDataJsonTask.BULK if mode == ReadDataJsonTask.COMPLETE_RUN \
+            else ReadDataJsonTask.SCHEDULED
+    return priority
+
+
+def schedule_new_read_datajson_task(mode=None, node=None, sharded=False):
     try:
         task = ReadDataJsonTask.objects.last()
         if task and task.status == ReadDataJsonTask.RUNNING:
@@ -94,8 +131,9 @@ def schedule_new_read_datajson_task(mode=None, node=None):
 
     if mode is None:
         mode = getattr(settings, 'DATAJSON_AR_DOWNLOAD_RESOURCES', True)
-    new_task = ReadDataJsonTask.objects.create(indexing_mode=mode, node=node)
-    read_datajson.delay(new_task)
+    new_task = ReadDataJsonTask.objects.create(indexing_mode=mode, node=node, sharded=sharded,
+                                               priority=read_task_priority(mode))
+    start_read_task(new_task)
 
     if not settings.RQ_QUEUES['indexing'].get('ASYNC'):
         new_task = ReadDataJsonTask.objects.get(id=new_task.id)
@@ -113,3 +151,9 @@ def schedule_full_read_task(node=None):
 @job("indexing")
 def schedule_metadata_read_task(node=None):
     return schedule_new_read_datajson_task(mode=ReadDataJsonTask.METADATA_ONLY, node=node)
+
+
+@job("indexing")
+def schedule_sharded_read_task(node=None):
+    return schedule_new_read_datajson_task(mode=ReadDataJsonTask.COMPLETE_RUN, node=node,
+                                           sharded=True)
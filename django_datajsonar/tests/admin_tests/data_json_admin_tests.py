@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from django_datajsonar.models import Catalog, Dataset, Distribution, Field
+
+
+class DataJsonAdminSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        catalog = Catalog.objects.create(identifier='catalog', title='Catalog', metadata='{}')
+        cls.dataset = Dataset.objects.create(identifier='1', title='Actividad económica',
+                                             description='Series de actividad',
+                                             catalog=catalog, metadata='{}')
+        cls.other_dataset = Dataset.objects.create(identifier='11', title='Precios',
+                                                   catalog=catalog, metadata='{}')
+        cls.distribution = Distribution.objects.create(identifier='1.1', title='Distribution',
+                                                       dataset=cls.dataset, metadata='{}')
+        cls.other_distribution = Distribution.objects.create(identifier='11.1', title='Other',
+                                                             dataset=cls.other_dataset,
+                                                             metadata='{}')
+        cls.field = Field.objects.create(identifier='1.1_serie', title='serie',
+                                         distribution=cls.distribution, metadata='{}')
+        Field.objects.create(identifier='11.1_serie', title='serie',
+                             distribution=cls.other_distribution, metadata='{}')
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='test_user', is_staff=True,
+                                                    is_superuser=True))
+
+    def search(self, model, term):
+        url = reverse('admin:django_datajsonar_{}_changelist'.format(model._meta.model_name))
+        response = self.client.get(url, {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].queryset)
+
+    def test_dataset_search_matches_exact_identifier(self):
+        self.assertEqual(self.search(Dataset, '1'), [self.dataset])
+
+    def test_distribution_search_matches_dataset_identifier(self):
+        self.assertEqual(self.search(Distribution, '1'), [self.distribution])
+
+    def test_dataset_search_matches_catalog_identifier(self):
+        self.assertEqual(set(self.search(Dataset, 'catalog')), {self.dataset, self.other_dataset})
+
+    def test_distribution_search_matches_catalog_identifier(self):
+        self.assertEqual(set(self.search(Distribution, 'catalog')),
+                         {self.distribution, self.other_distribution})
+
+    def test_field_search_matches_distribution_identifier(self):
+        self.assertEqual(self.search(Field, '1.1'), [self.field])
+
+    def test_search_does_not_match_titles_by_default(self):
+        self.assertEqual(self.search(Dataset, 'actividad'), [])
+
+    @override_settings(DATAJSON_AR_ADMIN_TEXT_SEARCH=True)
+    def test_text_search_matches_titles_and_descriptions(self):
+        self.assertEqual(self.search(Dataset, 'ACTIVIDAD'), [self.dataset])
+        self.assertEqual(self.search(Dataset, 'series'), [self.dataset])
+
+    def test_search_query_count_does_not_depend_on_matches(self):
+        url = reverse('admin:django_datajsonar_field_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as no_matches:
+            self.client.get(url, {'q': 'missing'})
+        with CaptureQueriesContext(connection) as matches:
+            self.client.get(url, {'q': '1.1'})
+        self.assertEqual(len(no_matches), len(matches))
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from django_datajsonar.models import ReadDataJsonTask
+
+
+class ReadDataJsonTaskAdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='test_user', is_staff=True,
+                                                    is_superuser=True))
+
+    def test_change_view_shows_logs_of_all_entries(self):
+        task = ReadDataJsonTask.objects.create(logs='legacy\n')
+        ReadDataJsonTask.info(task, 'first')
+        ReadDataJsonTask.info(task, 'second')
+
+        response = self.client.get(reverse('admin:django_datajsonar_readdatajsontask_change',
+                                           args=(task.id,)))
+        self.assertContains(response, 'legacy<br />first<br />second')
+
+    def test_add_view_does_not_show_logs_field(self):
+        response = self.client.get(reverse('admin:django_datajsonar_readdatajsontask_add'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="logs"')
@@ -91,3 +91,16 @@ class CatalogReaderTests(TestCase):
             self.assertEqual(2, len(m.request_history))
             for request in m.request_history:
                 self.assertTrue(request.verify)
+
+    def test_catalog_is_downloaded_once_per_run(self, _database_loader):
+        node = Node.objects.create(catalog_id='test_catalog',
+                                   catalog_format='json',
+                                   catalog_url='https://fakeurl.com/data.json',
+                                   indexable=True)
+        with open_catalog('sample_data.json') as sample:
+            text = sample.read()
+        with requests_mock.Mocker() as m:
+            m.get('https://fakeurl.com/data.json', status_code=200, content=text)
+            CatalogReader().index(node, ReadDataJsonTask.objects.create())
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(node.json_catalog_file.read(), text)
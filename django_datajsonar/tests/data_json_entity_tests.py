@@ -2,9 +2,12 @@ import datetime
 
 import dateutil.tz
 import pytz
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
 from freezegun import freeze_time
 
-from django_datajsonar.models.data_json_entity_mixin import DataJsonEntityMixin
+from django_datajsonar.models import Dataset, Distribution
+from django_datajsonar.models.data_json_entity_mixin import DataJsonEntityMixin, metadata_hash
 from django_datajsonar.strings import DEFAULT_TIME_ZONE
 
 from django_datajsonar.tests.mixin_test_case import ModelMixinTestCase
@@ -51,6 +54,38 @@ class DataJsonEntityTests(ModelMixinTestCase):
         self.entity.update_metadata({'test_field': 'test_value'}, updated_children=True)
         self.assertTrue(self.entity.updated)
 
+    def test_metadata_key_order_does_not_set_entity_as_updated(self):
+        self.entity.update_metadata({'a': 1, 'b': {'c': 2, 'd': 3}})
+        self.entity.update_metadata({'b': {'d': 3, 'c': 2}, 'a': 1})
+        self.assertFalse(self.entity.updated)
+
+    def test_metadata_hash_is_computed_for_entities_saved_without_it(self):
+        self.entity.metadata = '{"test_field": "test_value"}'
+        self.entity.save()
+        self.entity.update_metadata({'test_field': 'test_value'})
+        self.assertFalse(self.entity.updated)
+        self.assertEqual(self.entity.metadata_hash, metadata_hash({'test_field': 'test_value'}))
+
+    def test_unchanged_entity_has_no_changes_to_save(self):
+        self.entity.update_metadata({'test_field': 'test_value'})
+        self.entity.save()
+        # La segunda lectura marca a la entidad como no nueva ni actualizada
+        entity = self.model.objects.get(pk=self.entity.pk)
+        entity.update_metadata({'test_field': 'test_value'})
+        entity.save()
+
+        entity = self.model.objects.get(pk=self.entity.pk)
+        entity.update_metadata({'test_field': 'test_value'})
+        entity.run_generation += 1
+        self.assertFalse(entity.has_changes())
+
+    def test_changed_entity_has_changes_to_save(self):
+        self.entity.update_metadata({'test_field': 'test_value'})
+        self.entity.save()
+        entity = self.model.objects.get(pk=self.entity.pk)
+        entity.update_metadata({'test_field': 'other_value'})
+        self.assertTrue(entity.has_changes())
+
     @freeze_time("2019-01-01 00:00:00")
     def test_default_issued_is_current_timezone(self):
         self.entity.update_metadata({'test_field': 'test_value'})
@@ -71,3 +106,63 @@ class DataJsonEntityTests(ModelMixinTestCase):
         self.assertEqual(self.entity.issued,
                          datetime.datetime(2016, 4, 14, 0, 0, 0,
                                            tzinfo=dateutil.tz.gettz(DEFAULT_TIME_ZONE)))
+
+
+class HotMetadataFieldsTests(SimpleTestCase):
+
+    def test_distribution_columns_are_copied_from_metadata(self):
+        distribution = Distribution()
+        distribution.update_metadata({'description': 'desc', 'format': 'CSV',
+                                      'accessURL': 'http://example.com'})
+        self.assertEqual(distribution.description, 'desc')
+        self.assertEqual(distribution.format, 'CSV')
+        self.assertEqual(distribution.access_url, 'http://example.com')
+        self.assertIsNone(distribution.type)
+
+    def test_dataset_nested_and_list_values(self):
+        dataset = Dataset()
+        dataset.update_metadata({'publisher': {'name': 'Name', 'mbox': 'mail@example.com'},
+                                 'theme': ['a', 'b'], 'superTheme': ['ECON']})
+        self.assertEqual(dataset.publisher_name, 'Name')
+        self.assertEqual(dataset.publisher_mbox, 'mail@example.com')
+        self.assertEqual(dataset.theme, 'a,b')
+        self.assertEqual(dataset.super_theme, 'ECON')
+        self.assertIsNone(dataset.license)
+
+    def test_columns_are_cleared_when_key_is_removed(self):
+        dataset = Dataset()
+        dataset.update_metadata({'license': 'Open Database License (ODbL) v1.0'})
+        dataset.update_metadata({})
+        self.assertIsNone(dataset.license)
+        self.assertEqual(dataset.theme, '')
+
+    def test_values_are_truncated_to_column_length(self):
+        distribution = Distribution()
+        distribution.update_metadata({'format': 'x' * 500})
+        self.assertEqual(len(distribution.format), Distribution._meta.get_field('format').max_length)
+
+    def test_invalid_nested_values_are_ignored(self):
+        dataset = Dataset()
+        dataset.update_metadata({'publisher': 'Name'})
+        self.assertIsNone(dataset.publisher_name)
+
+    @override_settings(DATAJSON_AR_HOT_METADATA_FIELDS={'Distribution': {'format': 'mediaType'}})
+    def test_configured_columns_and_paths(self):
+        distribution = Distribution()
+        distribution.update_metadata({'description': 'desc', 'format': 'CSV', 'mediaType': 'text/csv'})
+        self.assertEqual(distribution.format, 'text/csv')
+        self.assertIsNone(distribution.description)
+
+    @override_settings(DATAJSON_AR_HOT_METADATA_FIELDS={'Distribution': {'title': 'title'}})
+    def test_only_hot_columns_can_be_configured(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Distribution().update_metadata({'title': 'Title'})
+
+    def test_columns_follow_config_change_with_unchanged_metadata(self):
+        distribution = Distribution(issued=datetime.datetime(2019, 1, 1, tzinfo=pytz.utc))
+        metadata = {'description': 'desc', 'format': 'CSV', 'mediaType': 'text/csv'}
+        distribution.update_metadata(metadata)
+        with self.settings(DATAJSON_AR_HOT_METADATA_FIELDS={'Distribution': {'format': 'mediaType'}}):
+            distribution.update_metadata(metadata)
+        self.assertEqual(distribution.format, 'text/csv')
+        self.assertIsNone(distribution.description)
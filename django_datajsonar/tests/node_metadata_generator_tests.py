@@ -5,7 +5,9 @@ import os
 from collections import OrderedDict
 from datetime import date, datetime, timedelta
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from freezegun import freeze_time
 
@@ -18,7 +20,7 @@ from django_datajsonar.models.metadata import ProjectMetadata, Publisher, \
     Language, Spatial
 from django_datajsonar.models.node import Jurisdiction, NodeMetadata, Node
 from django_datajsonar.utils.metadata_generator import get_project_metadata, \
-    get_jurisdiction_list_metadata, last_modified_date
+    get_jurisdiction_list_metadata, last_modified_date, invalidate_project_metadata
 from django_datajsonar.utils.download_response_writer import \
     flatten_jurisdiction_list_metadata, translate_fields
 dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'samples')
@@ -81,6 +83,10 @@ class MetadataGeneratorTests(TestCase):
                 node=nodes[i])
             nodes_meta.append(node_meta)
 
+    def setUp(self):
+        # El cache no se restaura con el rollback de cada test
+        invalidate_project_metadata()
+
     def test_project_metadata_values(self):
         expected = {
             'title': 'Test project',
@@ -204,6 +210,36 @@ class MetadataGeneratorTests(TestCase):
         self.assertEqual(2, len(jurisdictions[0]['catalogs']))
         self.assertEqual(1, len(jurisdictions[1]['catalogs']))
 
+    def test_jurisdiction_list_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            get_jurisdiction_list_metadata()
+        Jurisdiction.objects.create(jurisdiction_id='id_3', jurisdiction_title='title_3')
+        with self.assertNumQueries(2):
+            get_jurisdiction_list_metadata()
+
+    def test_project_metadata_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as queries:
+            get_project_metadata()
+        Jurisdiction.objects.create(jurisdiction_id='id_3', jurisdiction_title='title_3')
+        Language.objects.create(language='eng', project_metadata=ProjectMetadata.get_solo())
+        with self.assertNumQueries(len(queries)):
+            get_project_metadata()
+
+    def test_project_metadata_is_cached(self):
+        get_project_metadata()
+        with self.assertNumQueries(0):
+            get_project_metadata()
+
+    def test_project_metadata_cache_is_invalidated_on_save(self):
+        get_project_metadata()
+        Language.objects.create(language='eng', project_metadata=ProjectMetadata.get_solo())
+        self.assertEqual(['spa', 'swa', 'eng'], get_project_metadata()['language'])
+
+    def test_project_metadata_cache_is_invalidated_on_delete(self):
+        get_project_metadata()
+        NodeMetadata.objects.get(label='metadata_0').delete()
+        self.assertEqual(2, get_project_metadata()['catalog_count'])
+
     def test_jurisdiction_metadata_flatten(self):
         expected = [
             {'id': 'catalog_id_0',
@@ -50,6 +50,44 @@ class NodeRegisterFileTests(TestCase):
             nrf.save()
             process_node_register_file_action(register_file=nrf)
 
+    def test_saved_catalog_is_loaded_from_compressed_snapshot(self):
+        test_node = Node.objects.create(catalog_id='sspm', catalog_url='url', indexable=True)
+        test_node.save_catalog({'identifier': 'sspm', 'dataset': []})
+        test_node.save()
+
+        test_node = Node.objects.get(pk=test_node.pk)
+        self.assertEqual(test_node.load_catalog(), {'identifier': 'sspm', 'dataset': []})
+        self.assertTrue(test_node.catalog_snapshot.name.endswith(
+            '{}.json.gz'.format(test_node.catalog_hash)))
+
+    @patch('django_datajsonar.models.node.transaction.on_commit', lambda func: func())
+    def test_saving_another_catalog_replaces_the_snapshot(self):
+        test_node = Node.objects.create(catalog_id='sspm', catalog_url='url', indexable=True)
+        test_node.save_catalog({'identifier': 'sspm'})
+        test_node.save()
+        previous = test_node.catalog_snapshot.name
+        test_node.save_catalog({'identifier': 'sspm', 'title': 'Nuevo'})
+        # La copia anterior se borra recién al guardar el nodo
+        self.assertTrue(test_node.catalog_snapshot.storage.exists(previous))
+        test_node.save()
+
+        self.assertNotEqual(test_node.catalog_snapshot.name, previous)
+        self.assertFalse(test_node.catalog_snapshot.storage.exists(previous))
+        self.assertEqual(test_node.load_catalog()['title'], 'Nuevo')
+
+    def test_replaced_snapshot_is_kept_until_transaction_commits(self):
+        test_node = Node.objects.create(catalog_id='sspm', catalog_url='url', indexable=True)
+        test_node.save_catalog({'identifier': 'sspm'})
+        test_node.save()
+        previous = test_node.catalog_snapshot.name
+        test_node.save_catalog({'identifier': 'sspm', 'title': 'Nuevo'})
+        test_node.save()
+        self.assertTrue(test_node.catalog_snapshot.storage.exists(previous))
+
+    def test_node_without_saved_catalog(self):
+        test_node = Node.objects.create(catalog_id='sspm', catalog_url='url', indexable=True)
+        self.assertIsNone(test_node.load_catalog())
+
     def tearDown(self):
         self.user.delete()
 
@@ -1,7 +1,9 @@
-from django.test import TestCase
-from mock import Mock
+from django.test import TestCase, override_settings
+from mock import Mock, patch
 
 from django_datajsonar.models import Stage, Node
+from django_datajsonar.queues import PRIORITY_META
+from django_datajsonar.strings import INTERACTIVE_PRIORITY
 
 test_job = Mock()
 
@@ -28,3 +30,25 @@ class StageTests(TestCase):
         stage.open_stage(node)
         test_job.delay.assert_called_once()
         test_job.delay.assert_called_with(node)
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={INTERACTIVE_PRIORITY: 'high'})
+    @patch('django_datajsonar.models.stage.get_queue')
+    def test_start_stage_with_priority_uses_its_queue(self, get_queue):
+        stage = Stage.objects.create(name='test_stage',
+                                     queue='default',
+                                     callable_str='django_datajsonar.tests.stage_tests.test_job')
+
+        stage.open_stage(priority=INTERACTIVE_PRIORITY)
+        test_job.delay.assert_not_called()
+        get_queue.assert_called_once_with('high')
+        get_queue.return_value.enqueue.assert_called_once_with(
+            test_job, None, meta={PRIORITY_META: INTERACTIVE_PRIORITY})
+
+    @patch('django_datajsonar.models.stage.get_queue')
+    def test_start_stage_with_priority_without_queue_uses_stage_queue(self, get_queue):
+        stage = Stage.objects.create(name='test_stage',
+                                     queue='default',
+                                     callable_str='django_datajsonar.tests.stage_tests.test_job')
+
+        stage.open_stage(priority=INTERACTIVE_PRIORITY)
+        get_queue.assert_called_once_with('default')
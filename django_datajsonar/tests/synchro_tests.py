@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import datetime
+
+import django_rq
 from django.utils import timezone
 from django_rq import job
 from freezegun import freeze_time
+from rq import Queue, SimpleWorker
 
 
 try:
@@ -9,13 +13,18 @@ try:
 except ImportError:
     from unittest.mock import patch, MagicMock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
 from django.conf import settings
 
 from django_datajsonar.models import Synchronizer, Stage, ReadDataJsonTask
-from django_datajsonar.synchronizer import start_synchros, upkeep, create_or_update_synchro
+from django_datajsonar.queues import SynchronizerQueue, opening_stage_run, \
+    pending_stage_run_jobs, STAGE_RUN_META
+from django_datajsonar.strings import INTERACTIVE_PRIORITY
+from django_datajsonar.synchronizer import start_synchros, upkeep, create_or_update_synchro, \
+    queue_job_finished, start_synchro, schedule_synchro_start, SYNCHRO_START_JOB_ID
+from django_datajsonar.worker import SynchronizerWorkerMixin
 
 
 @job("default")
@@ -23,6 +32,14 @@ def callable_method(*_):
     ReadDataJsonTask.objects.create()
 
 
+def noop_job():
+    pass
+
+
+class TestSynchronizerWorker(SynchronizerWorkerMixin, SimpleWorker):
+    pass
+
+
 @freeze_time("2019-01-02 00:01:00")
 class SynchronizationTests(TestCase):
 
@@ -149,6 +166,197 @@ class SynchronizationTests(TestCase):
 
         self.assertEqual(synchro.status, Synchronizer.STAND_BY)
 
+    def test_next_run_is_stored_on_save(self):
+        synchro = Synchronizer.objects.get(name='test_synchro')
+        self.assertEqual(synchro.next_run_at, synchro.compute_next_start_date())
+
+        synchro.scheduled_time = datetime.time(hour=3)
+        synchro.save()
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.next_run_at.astimezone(timezone.get_current_timezone()).hour, 3)
+
+    @patch('django_datajsonar.models.synchronizer.get_next_run_date')
+    def test_start_synchros_does_not_compute_next_runs(self, next_run_date):
+        Synchronizer.objects.update(next_run_at=timezone.now() + datetime.timedelta(days=1))
+        with self.assertNumQueries(1):
+            start_synchros()
+        next_run_date.assert_not_called()
+
+
+@freeze_time("2019-01-02 00:01:00")
+class SynchronizerEventsTests(TestCase):
+
+    @classmethod
+    @freeze_time("2019-01-01 00:00:00")
+    def setUpTestData(cls):
+        next_stage = Stage.objects.create(callable_str='django_datajsonar.tests.synchro_tests.callable_method',
+                                          queue='default', name='second stage')
+        first_stage = Stage.objects.create(callable_str='django_datajsonar.tests.synchro_tests.callable_method',
+                                           queue='indexing', name='first stage', next_stage=next_stage)
+        cls.synchro = Synchronizer.objects.create(start_stage=first_stage, name='test_synchro',
+                                                  frequency=Synchronizer.DAILY,
+                                                  scheduled_time=timezone.now())
+
+    def running_synchro(self):
+        synchro = Synchronizer.objects.get(pk=self.synchro.pk)
+        synchro.begin_stage()
+        return synchro
+
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs', return_value=False)
+    def test_finished_job_advances_stage_of_its_queue(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('indexing')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage.next_stage)
+
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs', return_value=False)
+    def test_finished_job_of_other_queue_does_not_advance_stage(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('default')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage)
+
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs', return_value=True)
+    def test_finished_job_does_not_advance_stage_with_pending_jobs(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('indexing')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage)
+
+    @override_settings(DATAJSON_AR_INDEXING_SHARD_QUEUES=['low'])
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs',
+           side_effect=lambda queue: queue == 'low')
+    def test_stage_waits_for_jobs_in_shard_queues(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('indexing')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage)
+
+    @override_settings(DATAJSON_AR_INDEXING_SHARD_QUEUES=['low'])
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs', return_value=False)
+    def test_finished_job_of_shard_queue_advances_stage(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('low')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage.next_stage)
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={INTERACTIVE_PRIORITY: 'high'})
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs',
+           side_effect=lambda queue: queue == 'high')
+    def test_stage_waits_for_jobs_in_priority_queues(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('indexing')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage)
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={INTERACTIVE_PRIORITY: 'high'})
+    @patch('django_datajsonar.models.stage.pending_or_running_jobs', return_value=False)
+    def test_finished_job_of_priority_queue_advances_stage(self, _):
+        synchro = self.running_synchro()
+        queue_job_finished('high')
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage.next_stage)
+
+    def test_worker_advances_stage_when_queue_is_emptied(self):
+        synchro = self.running_synchro()
+        queue = Queue('indexing', connection=django_rq.get_connection('indexing'))
+        queue.enqueue(noop_job)
+        TestSynchronizerWorker([queue], connection=queue.connection).work(burst=True)
+
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage.next_stage)
+
+    def test_scheduled_start_begins_synchro(self):
+        start_synchro(self.synchro.pk)
+        self.synchro.refresh_from_db()
+        self.assertEqual(self.synchro.status, Synchronizer.RUNNING)
+
+    @patch('django_datajsonar.synchronizer.schedule_synchro_start')
+    def test_early_scheduled_start_is_scheduled_again(self, schedule):
+        # Corrió recién: el próximo inicio es mañana
+        synchro = Synchronizer.objects.get(pk=self.synchro.pk)
+        synchro.last_time_ran = timezone.now()
+        synchro.save()
+        start_synchro(self.synchro.pk)
+        self.synchro.refresh_from_db()
+        self.assertEqual(self.synchro.status, Synchronizer.STAND_BY)
+        schedule.assert_called_once_with(self.synchro)
+
+    @patch('django_datajsonar.synchronizer.django_rq.get_scheduler')
+    def test_synchro_start_is_scheduled_at_next_start_date(self, get_scheduler):
+        schedule_synchro_start(self.synchro)
+        get_scheduler.return_value.enqueue_at.assert_called_once_with(
+            self.synchro.next_start_date(), start_synchro, self.synchro.pk,
+            job_id=SYNCHRO_START_JOB_ID.format(self.synchro.pk))
+
+    @patch('django_datajsonar.signals.schedule_synchro_start')
+    def test_finished_synchro_is_scheduled(self, schedule):
+        synchro = self.running_synchro()
+        schedule.assert_not_called()
+        synchro.next_stage()
+        synchro.next_stage()
+        schedule.assert_called_once_with(synchro)
+
+
+@freeze_time("2019-01-02 00:01:00")
+@patch('django_datajsonar.models.stage.tracks_stage_jobs', return_value=True)
+class StageRunJobsTests(TestCase):
+
+    @classmethod
+    @freeze_time("2019-01-01 00:00:00")
+    def setUpTestData(cls):
+        next_stage = Stage.objects.create(callable_str='django_datajsonar.tests.synchro_tests.callable_method',
+                                          queue='default', name='second stage')
+        first_stage = Stage.objects.create(callable_str='django_datajsonar.tests.synchro_tests.callable_method',
+                                           queue='indexing', name='first stage', next_stage=next_stage)
+        cls.synchro = Synchronizer.objects.create(start_stage=first_stage, name='test_synchro',
+                                                  frequency=Synchronizer.DAILY,
+                                                  scheduled_time=timezone.now())
+
+    def setUp(self):
+        self.queue = SynchronizerQueue('indexing', connection=django_rq.get_connection('indexing'),
+                                       is_async=True)
+        self.queue.empty()
+
+    def tearDown(self):
+        self.queue.empty()
+
+    def running_synchro(self):
+        synchro = Synchronizer.objects.get(pk=self.synchro.pk)
+        synchro.begin_stage()
+        return synchro
+
+    def test_jobs_enqueued_while_opening_stage_are_tracked(self, _):
+        with opening_stage_run('run'):
+            job = self.queue.enqueue(noop_job)
+        self.assertEqual(job.meta[STAGE_RUN_META], 'run')
+        self.assertTrue(pending_stage_run_jobs('indexing', 'run'))
+
+        job.set_status('finished')
+        self.assertFalse(pending_stage_run_jobs('indexing', 'run'))
+
+    def test_jobs_enqueued_by_a_run_job_are_tracked(self, _):
+        parent = MagicMock(meta={STAGE_RUN_META: 'run'})
+        with patch('django_datajsonar.queues.get_current_job', return_value=parent):
+            child = self.queue.enqueue(noop_job)
+        self.assertEqual(child.meta[STAGE_RUN_META], 'run')
+        self.assertTrue(pending_stage_run_jobs('indexing', 'run'))
+
+    def test_stage_completes_with_other_jobs_in_queue(self, _):
+        self.queue.enqueue(noop_job)
+        synchro = self.running_synchro()
+        queue_job_finished('indexing', synchro.stage_run_id())
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage.next_stage)
+
+    def test_stage_waits_for_its_own_jobs(self, _):
+        synchro = self.running_synchro()
+        with opening_stage_run(synchro.stage_run_id()):
+            self.queue.enqueue(noop_job)
+        queue_job_finished('indexing', synchro.stage_run_id())
+        synchro.refresh_from_db()
+        self.assertEqual(synchro.actual_stage, synchro.start_stage)
+
 
 class DefaultTaskSchedulingTest(TestCase):
 
@@ -2,6 +2,7 @@ from django.test import TestCase
 from mock import Mock, patch
 
 from django_datajsonar.models import Synchronizer, Stage, Node
+from django_datajsonar.strings import INTERACTIVE_PRIORITY
 
 
 @patch('django_datajsonar.models.synchronizer.Synchronizer.save')
@@ -36,3 +37,19 @@ class SynchronizerTests(TestCase):
         synchro.next_stage()
 
         self.assertIsNone(synchro.node)
+
+    def test_interactive_synchro_opens_stages_with_priority(self, *_):
+        stage = Stage()
+        stage.open_stage = Mock()
+        Synchronizer(start_stage=stage, interactive=True).begin_stage()
+        stage.open_stage.assert_called_with(None, priority=INTERACTIVE_PRIORITY)
+
+    def test_after_synchro_is_finished_it_is_not_interactive(self, *_):
+        stage = Stage()
+        stage.open_stage = Mock()
+        stage.save = Mock()
+        synchro = Synchronizer(start_stage=stage, interactive=True)
+        synchro.begin_stage()
+        synchro.next_stage()
+
+        self.assertFalse(synchro.interactive)
@@ -1,20 +1,31 @@
-from mock import Mock, MagicMock
+from mock import Mock
 
 from django.test import TestCase
 
-from django_datajsonar.models import AbstractTask
+from django_datajsonar.models import AbstractTask, ReadDataJsonTask
 from django_datajsonar.task_closer import TaskCloser
 
 
 class TaskCloserTests(TestCase):
 
-    def test_close_all_updates_all_models(self):
-        mock_task = MagicMock()
-        TaskCloser(task_jobs=lambda task: []).close_all_opened(mock_task)
-
-        mock_task.objects.update.assert_called_with(status=AbstractTask.FINISHED)
+    def test_close_all_closes_running_tasks(self):
+        task = ReadDataJsonTask.objects.create()
+        TaskCloser(task_jobs=lambda task: []).close_all_opened(ReadDataJsonTask)
+        self.assertEqual(ReadDataJsonTask.objects.get(id=task.id).status, AbstractTask.FINISHED)
 
     def test_close_all_does_not_close_if_tasks_are_running(self):
-        mock_task = Mock()
-        TaskCloser(task_jobs=lambda task: ['one_job']).close_all_opened(mock_task)
-        mock_task.objects.update.assert_not_called()
+        task = ReadDataJsonTask.objects.create()
+        TaskCloser(task_jobs=lambda task: ['one_job']).close_all_opened(ReadDataJsonTask)
+        self.assertEqual(ReadDataJsonTask.objects.get(id=task.id).status, AbstractTask.RUNNING)
+
+    def test_closed_tasks_logs_are_consolidated(self):
+        task = ReadDataJsonTask.objects.create()
+        ReadDataJsonTask.info(task, 'first')
+        TaskCloser(task_jobs=lambda task: []).close_all_opened(ReadDataJsonTask)
+        self.assertEqual(ReadDataJsonTask.objects.get(id=task.id).logs, 'first\n')
+        self.assertFalse(task.log_entries.exists())
+
+    def test_close_all_does_not_check_queue_without_opened_tasks(self):
+        task_jobs = Mock()
+        TaskCloser(task_jobs=task_jobs).close_all_opened(ReadDataJsonTask)
+        task_jobs.assert_not_called()
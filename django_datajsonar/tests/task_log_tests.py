@@ -0,0 +1,91 @@
+#!coding=utf8
+from django.test import TestCase, override_settings
+
+from django_datajsonar.models import ReadDataJsonTask, TaskLogEntry
+
+
+class TaskLogTests(TestCase):
+
+    def setUp(self):
+        self.task = ReadDataJsonTask.objects.create()
+
+    def logs(self):
+        return ReadDataJsonTask.objects.get(id=self.task.id).get_logs()
+
+    def test_info_appends_message(self):
+        ReadDataJsonTask.info(self.task, 'first')
+        ReadDataJsonTask.info(self.task, 'second')
+        self.assertEqual(self.logs(), 'first\nsecond\n')
+
+    def test_info_does_not_overwrite_logs_of_stale_instance(self):
+        stale_task = ReadDataJsonTask.objects.get(id=self.task.id)
+        ReadDataJsonTask.info(self.task, 'first')
+        ReadDataJsonTask.info(stale_task, 'second')
+        self.assertEqual(self.logs(), 'first\nsecond\n')
+
+    def test_buffered_logs_are_written_on_exit(self):
+        with ReadDataJsonTask.buffered_logs(self.task):
+            ReadDataJsonTask.info(self.task, 'first')
+            ReadDataJsonTask.info(self.task, 'second')
+            self.assertEqual(self.logs(), '')
+        self.assertEqual(self.logs(), 'first\nsecond\n')
+
+    @override_settings(DATAJSON_AR_TASK_LOG_BUFFER_SIZE=2)
+    def test_buffered_logs_are_flushed_when_buffer_is_full(self):
+        with ReadDataJsonTask.buffered_logs(self.task):
+            for msg in ['first', 'second', 'third']:
+                ReadDataJsonTask.info(self.task, msg)
+            self.assertEqual(self.logs(), 'first\nsecond\n')
+        self.assertEqual(self.logs(), 'first\nsecond\nthird\n')
+
+    def test_buffered_logs_are_written_on_error(self):
+        with self.assertRaises(ValueError):
+            with ReadDataJsonTask.buffered_logs(self.task):
+                ReadDataJsonTask.info(self.task, 'first')
+                raise ValueError
+        self.assertEqual(self.logs(), 'first\n')
+
+    def test_nested_buffered_logs_share_buffer(self):
+        with ReadDataJsonTask.buffered_logs(self.task):
+            with ReadDataJsonTask.buffered_logs(self.task):
+                ReadDataJsonTask.info(self.task, 'first')
+            self.assertEqual(self.logs(), '')
+        self.assertEqual(self.logs(), 'first\n')
+
+    def test_other_tasks_are_not_buffered(self):
+        other_task = ReadDataJsonTask.objects.create()
+        with ReadDataJsonTask.buffered_logs(self.task):
+            ReadDataJsonTask.info(other_task, 'first')
+            self.assertEqual(ReadDataJsonTask.objects.get(id=other_task.id).get_logs(), 'first\n')
+
+    def test_appending_logs_does_not_rewrite_previous_ones(self):
+        ReadDataJsonTask.objects.filter(id=self.task.id).update(logs='legacy\n')
+        ReadDataJsonTask.info(self.task, 'first')
+        ReadDataJsonTask.info(self.task, 'second')
+        self.assertEqual(ReadDataJsonTask.objects.get(id=self.task.id).logs, 'legacy\n')
+        self.assertEqual(self.task.log_entries.count(), 2)
+        self.assertEqual(self.logs(), 'legacy\nfirst\nsecond\n')
+
+    def test_logs_are_consolidated_when_task_finishes(self):
+        ReadDataJsonTask.objects.filter(id=self.task.id).update(logs='legacy\n')
+        self.task.refresh_from_db()
+        ReadDataJsonTask.info(self.task, 'first')
+        ReadDataJsonTask.info(self.task, 'second')
+        self.task.status = ReadDataJsonTask.FINISHED
+        self.task.save()
+
+        self.assertEqual(self.task.logs, 'legacy\nfirst\nsecond\n')
+        self.assertEqual(ReadDataJsonTask.objects.get(id=self.task.id).logs, 'legacy\nfirst\nsecond\n')
+        self.assertFalse(self.task.log_entries.exists())
+        self.assertEqual(self.logs(), 'legacy\nfirst\nsecond\n')
+
+    def test_logs_written_after_finishing_are_kept(self):
+        self.task.status = ReadDataJsonTask.FINISHED
+        self.task.save()
+        ReadDataJsonTask.info(self.task, 'late')
+        self.assertEqual(self.logs(), 'late\n')
+
+    def test_log_entries_are_deleted_with_task(self):
+        ReadDataJsonTask.info(self.task, 'first')
+        self.task.delete()
+        self.assertFalse(TaskLogEntry.objects.exists())
@@ -4,7 +4,7 @@ import os
 import requests
 from django.contrib.auth.models import User
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest import skipIf
 
 from mock import patch
@@ -132,3 +132,23 @@ class SchedulingMethodsTest(TestCase):
         self.assertEqual(1, ReadDataJsonTask.objects.all().count())
         task = ReadDataJsonTask.objects.all().first()
         self.assertEqual(ReadDataJsonTask.METADATA_ONLY, task.indexing_mode)
+
+    def test_scheduled_metadata_run_has_scheduled_priority(self):
+        task = schedule_metadata_read_task()
+        self.assertEqual(ReadDataJsonTask.SCHEDULED, task.priority)
+
+    def test_scheduled_full_run_has_bulk_priority(self):
+        task = schedule_full_read_task()
+        self.assertEqual(ReadDataJsonTask.BULK, task.priority)
+
+    @patch('django_datajsonar.tasks.current_priority', return_value=ReadDataJsonTask.INTERACTIVE)
+    def test_task_inherits_priority_of_its_job(self, _):
+        task = schedule_full_read_task()
+        self.assertEqual(ReadDataJsonTask.INTERACTIVE, task.priority)
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={ReadDataJsonTask.BULK: 'low'})
+    @patch('django_datajsonar.tasks.get_queue')
+    def test_task_is_read_in_its_priority_queue(self, get_queue):
+        task = schedule_full_read_task()
+        get_queue.assert_called_once_with('low')
+        get_queue.return_value.enqueue.assert_called_once_with(read_datajson, task)
@@ -4,10 +4,11 @@ from unittest.mock import patch
 import requests_mock
 from django.conf import settings
 from django.test import TestCase
+from pydatajson import DataJson
 
 from django_datajsonar.indexing.constants import CATALOG_ROOT
 from django_datajsonar.models import Node
-from django_datajsonar.tests.helpers import create_node, open_catalog
+from django_datajsonar.tests.helpers import create_node, open_catalog, catalog_path
 from django_datajsonar.utils.catalog_file_generator import CatalogFileGenerator
 
 
@@ -96,3 +97,18 @@ class CatalogFileGeneratorTests(TestCase):
             CatalogFileGenerator(node).generate_files()
         datajson_mock.assert_called_once_with(node.catalog_url, catalog_format='json',
                                               verify_ssl=True)
+
+    @patch('django_datajsonar.utils.catalog_file_generator.DataJson')
+    def test_uses_catalog_and_content_already_read(self, datajson_mock):
+        node = Node.objects.create(catalog_id='test_catalog',
+                                   catalog_format='json',
+                                   catalog_url='https://fakeurl.com/data.json',
+                                   indexable=True)
+        with open_catalog('sample_data.json') as sample:
+            text = sample.read()
+        catalog = DataJson(catalog_path('sample_data.json'))
+        with requests_mock.Mocker() as m:
+            CatalogFileGenerator(node, catalog=catalog, content=text).generate_files()
+        self.assertEqual(m.call_count, 0)
+        datajson_mock.assert_not_called()
+        self.assertEqual(node.json_catalog_file.read(), text)
@@ -3,7 +3,7 @@
 from __future__ import unicode_literals
 from mock import patch
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from django_datajsonar.synchronizer import close_opened_tasks
 from django_datajsonar.utils.utils import import_string
@@ -45,3 +45,16 @@ class CloseAllTasksTests(TestCase):
         close_opened_tasks()
         model = import_string('django_datajsonar.models.ReadDataJsonTask')
         task_closer().close_all_opened.assert_called_with(model)
+
+    @override_settings(DATAJSON_AR_INDEXING_SHARD_QUEUES=['indexing_shard'])
+    def test_close_all_of_shard_queue_closes_indexing_tasks(self, task_closer):
+        setattr(settings, 'DATAJSONAR_STAGES', {
+            'Read Datajson (sharded)': {
+                'callable_str': 'django_datajsonar.tasks.schedule_sharded_read_task',
+                'queue': 'indexing',
+                'task': 'django_datajsonar.models.ReadDataJsonTask',
+            }
+        })
+        close_opened_tasks('indexing_shard')
+        close_opened_tasks('default')
+        self.assertEqual(task_closer().close_all_opened.call_count, 1)
@@ -0,0 +1,66 @@
+#! coding: utf-8
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+
+from django_datajsonar.models import Catalog, Dataset, Distribution, Field, Metadata
+from django_datajsonar.utils.duplicates import remove_duplicate_entities
+
+
+class RemoveDuplicateEntitiesTests(TestCase):
+
+    def setUp(self):
+        # Las claves únicas no existían cuando se podían crear repetidos
+        with connection.schema_editor() as editor:
+            for model in (Dataset, Distribution, Field):
+                editor.alter_unique_together(model, model._meta.unique_together, [])
+        self.catalog = Catalog.objects.create(identifier='catalog', title='catalog', metadata='{}')
+
+    def create_dataset(self, run_generation):
+        return Dataset.objects.create(catalog=self.catalog, identifier='dataset', title='dataset',
+                                      metadata='{}', run_generation=run_generation)
+
+    def create_distribution(self, dataset, identifier, run_generation=1):
+        return Distribution.objects.create(dataset=dataset, identifier=identifier, title=identifier,
+                                           metadata='{}', run_generation=run_generation)
+
+    def test_most_recently_read_entity_is_kept(self):
+        latest = self.create_dataset(run_generation=2)
+        old = self.create_dataset(run_generation=1)
+        removed = remove_duplicate_entities(apps)
+        self.assertEqual(removed, [('Dataset', old.id, latest.id)])
+        self.assertEqual(list(Dataset.objects.values_list('id', flat=True)), [latest.id])
+
+    def test_children_are_moved_to_kept_entity(self):
+        latest = self.create_dataset(run_generation=2)
+        old = self.create_dataset(run_generation=1)
+        kept_distribution = self.create_distribution(latest, 'distribution', run_generation=2)
+        self.create_distribution(old, 'distribution')
+        moved = self.create_distribution(old, 'other_distribution')
+        Field.objects.create(distribution=moved, identifier='field', title='field', metadata='{}')
+
+        removed = remove_duplicate_entities(apps)
+        self.assertEqual([entity[0] for entity in removed], ['Dataset', 'Distribution'])
+        self.assertEqual(
+            set(Distribution.objects.values_list('id', 'dataset')),
+            {(kept_distribution.id, latest.id), (moved.id, latest.id)})
+        self.assertEqual(Field.objects.get().distribution, moved)
+
+    def test_enhanced_meta_is_moved_to_kept_entity(self):
+        latest = self.create_dataset(run_generation=2)
+        old = self.create_dataset(run_generation=1)
+        latest.enhanced_meta.create(key='key', value='latest')
+        old.enhanced_meta.create(key='key', value='old')
+        old.enhanced_meta.create(key='other', value='old')
+
+        remove_duplicate_entities(apps)
+        self.assertEqual(set(Metadata.objects.values_list('object_id', 'key', 'value')),
+                         {(latest.id, 'key', 'latest'), (latest.id, 'other', 'old')})
+
+    def test_fields_without_identifier_are_duplicates(self):
+        dataset = self.create_dataset(run_generation=1)
+        distribution = self.create_distribution(dataset, 'distribution')
+        old, kept = [Field.objects.create(distribution=distribution, title='field', metadata='{}')
+                     for _ in range(2)]
+        self.assertEqual(remove_duplicate_entities(apps), [('Field', old.id, kept.id)])
+        self.assertEqual(list(Field.objects.values_list('id', flat=True)), [kept.id])
@@ -4,9 +4,10 @@ from __future__ import unicode_literals
 
 from mock import patch
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from django_datajsonar.models import ReadDataJsonTask
+from django_datajsonar.strings import INTERACTIVE_PRIORITY
 from django_datajsonar.utils.get_jobs_in_task_queue import pending_or_running_jobs_in_task_queue
 from django_datajsonar.utils.utils import get_qualified_name
 
@@ -28,6 +29,34 @@ class GetJobsInTaskQueueTests(TestCase):
         jobs = pending_or_running_jobs_in_task_queue(task)
         self.assertTrue(jobs)
 
+    @override_settings(DATAJSON_AR_INDEXING_SHARD_QUEUES=['indexing_shard'])
+    def test_get_jobs_in_shard_queues(self, pending_or_running_jobs):
+        task = ReadDataJsonTask
+        setattr(settings, 'DATAJSONAR_STAGES', {
+            'stage_name': {
+                'task': get_qualified_name(task),
+                'queue': 'indexing',
+            }
+        })
+
+        pending_or_running_jobs.side_effect = lambda queue: queue == 'indexing_shard'
+
+        self.assertTrue(pending_or_running_jobs_in_task_queue(task))
+
+    @override_settings(DATAJSON_AR_PRIORITY_QUEUES={INTERACTIVE_PRIORITY: 'high'})
+    def test_get_jobs_in_priority_queues(self, pending_or_running_jobs):
+        task = ReadDataJsonTask
+        setattr(settings, 'DATAJSONAR_STAGES', {
+            'stage_name': {
+                'task': get_qualified_name(task),
+                'queue': 'indexing',
+            }
+        })
+
+        pending_or_running_jobs.side_effect = lambda queue: queue == 'high'
+
+        self.assertTrue(pending_or_running_jobs_in_task_queue(task))
+
     def test_get_jobs_no_associated_queue(self, *_):
         task = ReadDataJsonTask
         setattr(settings, 'DATAJSONAR_STAGES', {})
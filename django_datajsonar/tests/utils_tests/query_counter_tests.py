@@ -0,0 +1,48 @@
+#!coding=utf8
+from django.db import connection
+from django.db.backends.utils import CursorDebugWrapper
+from django.test import TestCase, override_settings
+
+from django_datajsonar.models import Node
+from django_datajsonar.utils.query_counter import QueryCounter
+
+
+class QueryCounterTests(TestCase):
+
+    def test_counts_queries(self):
+        with QueryCounter() as counter:
+            Node.objects.count()
+            Node.objects.exists()
+        self.assertEqual(counter.count, 2)
+
+    def test_nested_counters(self):
+        with QueryCounter() as outer:
+            Node.objects.count()
+            with QueryCounter() as inner:
+                Node.objects.count()
+        self.assertEqual(inner.count, 1)
+        self.assertEqual(outer.count, 2)
+
+    def test_restores_connection(self):
+        queries_log = connection.queries_log
+        logged = len(queries_log)
+        with QueryCounter():
+            Node.objects.count()
+        self.assertIs(connection.queries_log, queries_log)
+        self.assertFalse(connection.force_debug_cursor)
+        self.assertEqual(len(queries_log), logged)
+
+    def test_queries_are_not_formatted(self):
+        with QueryCounter() as counter:
+            with connection.cursor() as cursor:
+                self.assertNotIsInstance(cursor, CursorDebugWrapper)
+                cursor.execute('SELECT 1')
+        self.assertEqual(counter.count, 1)
+        self.assertNotIn('make_debug_cursor', connection.__dict__)
+
+    @override_settings(DEBUG=True)
+    def test_queries_are_still_logged_in_debug(self):
+        connection.queries_log.clear()
+        with QueryCounter():
+            Node.objects.count()
+        self.assertEqual(len(connection.queries), 1)
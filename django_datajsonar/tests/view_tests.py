@@ -1,9 +1,21 @@
+import csv
 import json
+from io import BytesIO
+
+from mock import patch
 
 from django.test import TestCase, Client
 from django.urls import reverse
+from openpyxl import load_workbook
 
+from django_datajsonar.indexing.catalog_reader import index_catalog
+from django_datajsonar.models import ReadDataJsonTask, Distribution, Jurisdiction
 from django_datajsonar.utils.catalog_file_generator import CatalogFileGenerator
+from django_datajsonar.indexing.tasks import regenerate_export_files
+from django_datajsonar.utils.export_files import generate_export_files, DISTRIBUTION_EXPORTS, \
+    NODE_EXPORTS, export_storage, export_file_name
+from django_datajsonar.utils.metadata_generator import get_distributions_metadata
+from django_datajsonar.utils.translations import DISTRIBUTIONS_SPANISH_FIELDS
 from .helpers import create_node, open_catalog
 
 
@@ -36,3 +48,134 @@ class ViewTests(TestCase):
         with open_catalog('another_catalog.json') as file:
             file_json = json.loads(file.read().decode('utf-8'))
             self.assertEquals(response_json, file_json)
+
+
+class DistributionsMetadataViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        task = ReadDataJsonTask.objects.create(indexing_mode=ReadDataJsonTask.METADATA_ONLY)
+        index_catalog(create_node('sample_data.json'), task, read_local=True, whitelist=True)
+
+    def setUp(self):
+        generate_export_files(DISTRIBUTION_EXPORTS)
+
+    def test_csv_is_served_with_length(self):
+        response = self.client.get(reverse('django_datajsonar:distribuciones_csv'))
+        content = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.reader(content.decode('utf-8').splitlines()))
+        self.assertEqual(rows[0], list(DISTRIBUTIONS_SPANISH_FIELDS.values()))
+        self.assertEqual(len(rows) - 1, Distribution.objects.count())
+
+    def test_csv_rows_match_generated_metadata(self):
+        response = self.client.get(reverse('django_datajsonar:distribuciones_csv'))
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(content.splitlines()))
+        expected = get_distributions_metadata()
+        for row, distribution in zip(rows, expected):
+            for key, header in DISTRIBUTIONS_SPANISH_FIELDS.items():
+                self.assertEqual(row[header], str(distribution[key] or ''))
+
+    def test_xlsx_is_served_with_length(self):
+        response = self.client.get(reverse('django_datajsonar:distribuciones_xlsx'))
+        content = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        worksheet = load_workbook(BytesIO(content)).active
+        self.assertEqual([cell.value for cell in worksheet[1]],
+                         list(DISTRIBUTIONS_SPANISH_FIELDS.values()))
+        self.assertEqual(worksheet.max_row - 1, Distribution.objects.count())
+
+    def test_export_is_not_recomputed_per_request(self):
+        Distribution.objects.all().delete()
+        response = self.client.get(reverse('django_datajsonar:distribuciones_csv'))
+        rows = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertGreater(len(rows), 1)
+
+    def test_matching_etag_returns_not_modified(self):
+        url = reverse('django_datajsonar:distribuciones_csv')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_export_is_regenerated(self):
+        url = reverse('django_datajsonar:distribuciones_csv')
+        etag = self.client.get(url)['ETag']
+        Distribution.objects.all().delete()
+        generate_export_files(['distribuciones.csv'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+def run_on_commit(func):
+    func()
+
+
+class NodesMetadataViewTests(TestCase):
+
+    def setUp(self):
+        self.jurisdiction = Jurisdiction.objects.create(jurisdiction_title='Nacional',
+                                                        jurisdiction_id='nacional')
+        generate_export_files(NODE_EXPORTS)
+
+    def get_json(self):
+        response = self.client.get(reverse('django_datajsonar:nodes_json'))
+        content = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        return json.loads(content.decode('utf-8'))
+
+    def test_json_lists_jurisdictions(self):
+        titles = [jurisdiction['title'] for jurisdiction in self.get_json()['jurisdictions']]
+        self.assertEqual(titles, ['Nacional'])
+
+    def test_json_is_not_served_as_attachment(self):
+        response = self.client.get(reverse('django_datajsonar:nodes_json'))
+        self.assertFalse(response.has_header('Content-Disposition'))
+
+    @patch('django_datajsonar.signals.transaction.on_commit', run_on_commit)
+    def test_metadata_change_regenerates_export(self):
+        self.get_json()
+        self.jurisdiction.jurisdiction_title = 'Provincial'
+        self.jurisdiction.save()
+        titles = [jurisdiction['title'] for jurisdiction in self.get_json()['jurisdictions']]
+        self.assertEqual(titles, ['Provincial'])
+
+    @patch('django_datajsonar.signals.transaction.on_commit', run_on_commit)
+    def test_metadata_deletion_regenerates_export(self):
+        self.get_json()
+        self.jurisdiction.delete()
+        self.assertEqual(self.get_json()['jurisdictions'], [])
+
+    def test_export_is_kept_until_transaction_commits(self):
+        self.jurisdiction.delete()
+        self.assertEqual(len(self.get_json()['jurisdictions']), 1)
+
+    @patch('django_datajsonar.signals.schedule_export_files')
+    @patch('django_datajsonar.signals.transaction.on_commit', run_on_commit)
+    def test_catalog_read_saves_do_not_regenerate_export(self, schedule):
+        node = create_node('sample_data.json')
+        schedule.reset_mock()
+        node.catalog_hash = 'hash'
+        node.save(update_fields=['catalog_hash'])
+        schedule.assert_not_called()
+
+    def test_missing_export_is_scheduled_and_not_generated_in_request(self):
+        export_storage().delete(export_file_name('nodes.json'))
+        # Regenera el archivo y libera la marca de regeneración encolada
+        self.addCleanup(regenerate_export_files, ['nodes.json'])
+        with patch('django_datajsonar.indexing.tasks.regenerate_export_files') as regenerate:
+            response = self.client.get(reverse('django_datajsonar:nodes_json'))
+            self.client.get(reverse('django_datajsonar:nodes_json'))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.has_header('Retry-After'))
+        self.assertFalse(export_storage().exists(export_file_name('nodes.json')))
+        # Los requests concurrentes no encolan otra regeneración
+        regenerate.delay.assert_called_once_with(['nodes.json'])
+
+    def test_missing_export_is_served_once_generated(self):
+        export_storage().delete(export_file_name('nodes.json'))
+        # Las colas de los tests corren los jobs al encolarlos
+        self.assertEqual(self.client.get(reverse('django_datajsonar:nodes_json')).status_code, 503)
+        self.assertEqual(self.get_json()['jurisdictions'][0]['title'], 'Nacional')
@@ -4,7 +4,7 @@ from django_datajsonar.views import nodes_metadata_json, \
     nodes_english_metadata_csv, nodes_spanish_metadata_csv, \
     nodes_english_metadata_xlsx, nodes_spanish_metadata_xlsx, \
     distributions_spanish_metadata_csv, distributions_spanish_metadata_xlsx, json_catalog, \
-    xlsx_catalog
+    xlsx_catalog, indexing_metrics
 
 urlpatterns = [
     url(r'^nodes.json/$', nodes_metadata_json, name='nodes_json'),
@@ -16,6 +16,7 @@ urlpatterns = [
         name='distribuciones_csv'),
     url(r'^distribuciones.xlsx/$', distributions_spanish_metadata_xlsx,
         name='distribuciones_xlsx'),
+    url(r'^metrics/$', indexing_metrics, name='indexing_metrics'),
     url(r'^catalog/(?P<catalog_id>[\w]+)/data.json', json_catalog, name="json_catalog"),
     url(r'^catalog/(?P<catalog_id>[\w]+)/catalog.xlsx', xlsx_catalog, name="xlsx_catalog"),
 ]
@@ -12,8 +12,15 @@ from django_datajsonar.models import Node
 
 
 class CatalogFileGenerator:
-    def __init__(self, node):
+    """Genera los archivos data.json y catalog.xlsx de un nodo. Se le puede
+    pasar el catálogo ya leído y su contenido crudo, para no volver a
+    descargarlo
+    """
+
+    def __init__(self, node, catalog=None, content=None):
         self.node = node
+        self.catalog = catalog
+        self.content = content
         self.verify_ssl = node.verify_ssl
         self.xlsx_catalog_dir = os.path.join(settings.MEDIA_ROOT, 'catalog', self.node.catalog_id, 'catalog.xlsx')
         self.json_catalog_dir = os.path.join(settings.MEDIA_ROOT, 'catalog', self.node.catalog_id, 'data.json')
@@ -22,8 +29,10 @@ class CatalogFileGenerator:
         catalog_format = self.node.catalog_format
         catalog_url = self.node.catalog_url
 
-        catalog = DataJson(catalog_url, catalog_format=catalog_format,
-                           verify_ssl=self.verify_ssl)
+        catalog = self.catalog
+        if catalog is None:
+            catalog = DataJson(catalog_url, catalog_format=catalog_format,
+                               verify_ssl=self.verify_ssl)
 
         if catalog_format == Node.JSON:
             self._save_json_file_from_url(catalog_url)
@@ -37,13 +46,15 @@ class CatalogFileGenerator:
 
     def _save_json_file_from_url(self, url):
         file_content = self._get_catalog_content_from_url(url).decode('utf-8')
-        self.node.json_catalog_file.save('data.json', ContentFile(file_content))
+        self._save_file(self.node.json_catalog_file, 'data.json', ContentFile(file_content))
 
     def _save_xlsx_file_from_url(self, url):
         file_content = self._get_catalog_content_from_url(url)
-        self.node.xlsx_catalog_file.save('catalog.xlsx', ContentFile(file_content))
+        self._save_file(self.node.xlsx_catalog_file, 'catalog.xlsx', ContentFile(file_content))
 
     def _get_catalog_content_from_url(self, url):
+        if self.content is not None:
+            return self.content
         response = requests.get(url, verify=self.verify_ssl)
         response.raise_for_status()
         return response.content
@@ -60,4 +71,9 @@ class CatalogFileGenerator:
         file_field = self.node.json_catalog_file if new_file_name == 'data.json' \
             else self.node.xlsx_catalog_file
         with open(file_dir, 'rb') as file:
-            file_field.save(new_file_name, File(file))
+            self._save_file(file_field, new_file_name, File(file))
+
+    def _save_file(self, file_field, name, content):
+        # Guarda sólo el campo del archivo, sin pisar el resto del nodo
+        file_field.save(name, content, save=False)
+        self.node.save(update_fields=[file_field.field.name])
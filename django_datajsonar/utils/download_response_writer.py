@@ -2,7 +2,7 @@
 from collections import OrderedDict
 
 from django_datajsonar.utils.metadata_generator import \
-    get_jurisdiction_list_metadata, get_distributions_metadata
+    get_jurisdiction_list_metadata, iter_distributions_metadata
 
 
 def write_node_metadata(output, fields, writer):
@@ -16,8 +16,7 @@ def write_node_metadata(output, fields, writer):
 
 
 def write_distributions_metadata(output, fields, writer):
-    metadata_list = get_distributions_metadata()
-    metadata_list = translate_fields(metadata_list, fields)
+    metadata_list = iter_translated_fields(iter_distributions_metadata(), fields)
     headers = fields.values()
     metadata_writer = writer(output, headers)
     metadata_writer.write_metadata(metadata_list)
@@ -34,6 +33,11 @@ def flatten_jurisdiction_list_metadata(jurisdictions):
     return result
 
 
+def iter_translated_fields(metadata_list, fields_translation):
+    for catalog in metadata_list:
+        yield OrderedDict((fields_translation[key], catalog[key]) for key in fields_translation)
+
+
 def translate_fields(metadata_list, fields_translation):
     return [OrderedDict(
         {fields_translation[key]: catalog[key]for key in fields_translation})
@@ -0,0 +1,78 @@
+#! coding: utf-8
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
+
+# Clave única, y modelo y campo de sus hijos, de cada entidad. Los datasets
+# se resuelven antes que sus distribuciones y éstas antes que sus fields
+DUPLICATE_KEYS = (
+    ('Dataset', ('catalog', 'identifier'), ('Distribution', 'dataset')),
+    ('Distribution', ('dataset', 'identifier'), ('Field', 'distribution')),
+    ('Field', ('distribution', 'title', 'identifier'), None),
+)
+
+
+def remove_duplicate_entities(apps):
+    """Resuelve las entidades repetidas por su clave única: deja la leída más
+    recientemente (mayor run_generation y después mayor id), le pasa los hijos
+    y la metadata adicional de las repetidas y las borra. Los hijos que quedan
+    repetidos al pasarlos se resuelven al llegar a su modelo. Recibe el
+    registro de modelos ('apps') para poder usar los del estado de las
+    migraciones aplicadas, en el que el título y el id de los fields pueden
+    ser NULL: se comparan como vacíos. Devuelve las entidades borradas, como tuplas
+    (modelo, id, id conservado)
+    """
+    removed = []
+    metadata_model = apps.get_model('django_datajsonar', 'Metadata')
+    content_types = apps.get_model('contenttypes', 'ContentType').objects
+    for model_name, key, children in DUPLICATE_KEYS:
+        model = apps.get_model('django_datajsonar', model_name)
+        content_type = content_types.filter(app_label=model._meta.app_label,
+                                            model=model._meta.model_name).first()
+        keys = _key_expressions(model, key)
+        duplicates = model.objects\
+            .annotate(**keys)\
+            .values(*keys)\
+            .annotate(count=Count('id'))\
+            .filter(count__gt=1)\
+            .order_by()
+        for duplicate in duplicates:
+            kept, *repeated = model.objects\
+                .annotate(**keys)\
+                .filter(**{name: duplicate[name] for name in keys})\
+                .order_by('-run_generation', '-id')\
+                .values_list('id', flat=True)
+            if children:
+                child_model, parent_field = children
+                apps.get_model('django_datajsonar', child_model).objects\
+                    .filter(**{parent_field + '__in': repeated})\
+                    .update(**{parent_field: kept})
+            if content_type is not None:
+                _move_metadata(metadata_model, content_type, repeated, kept)
+            model.objects.filter(id__in=repeated).delete()
+            removed.extend((model_name, entity_id, kept) for entity_id in repeated)
+    return removed
+
+
+def _key_expressions(model, key):
+    """Expresiones a comparar de cada campo de la clave, con los NULL como
+    vacíos
+    """
+    keys = {}
+    for field in key:
+        expression = F(field)
+        if model._meta.get_field(field).null:
+            expression = Coalesce(expression, Value(''))
+        keys[field + '_key'] = expression
+    return keys
+
+
+def _move_metadata(metadata_model, content_type, repeated, kept):
+    """Pasa a 'kept' la metadata adicional de las entidades repetidas, salvo
+    las claves que ya tiene, que se borran
+    """
+    kept_keys = list(metadata_model.objects
+                     .filter(content_type=content_type, object_id=kept)
+                     .values_list('key', flat=True))
+    metadata = metadata_model.objects.filter(content_type=content_type, object_id__in=repeated)
+    metadata.exclude(key__in=kept_keys).update(object_id=kept)
+    metadata.delete()
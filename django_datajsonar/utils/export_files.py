@@ -0,0 +1,138 @@
+#! coding: utf-8
+"""Exportaciones de nodos y distribuciones (nodes.json, nodos.csv,
+distribuciones.xlsx, etc.) precalculadas en archivos. Se regeneran en la cola
+'indexing' al cerrar una ReadDataJsonTask, y las de nodos al cambiar la
+metadata de nodos o jurisdicciones; mientras tanto se sirve la versión
+anterior. Los archivos se leen y escriben con la API del storage
+"""
+import json
+import os
+from collections import OrderedDict
+from functools import partial
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django_datajsonar.indexing.constants import EXPORTS_ROOT
+from django_datajsonar.storage.custom_catalog_storage import CustomCatalogStorage
+from django_datajsonar.utils.download_response_writer import write_node_metadata, \
+    write_distributions_metadata
+from django_datajsonar.utils.metadata_generator import get_project_metadata, \
+    get_jurisdiction_list_metadata
+from django_datajsonar.utils.metadata_writer import CSVMetadataWriter, XLSXMetadataWriter
+from django_datajsonar.utils.translations import NODES_ENGLISH_FIELDS, NODES_SPANISH_FIELDS, \
+    DISTRIBUTIONS_SPANISH_FIELDS
+
+JSON_CONTENT_TYPE = 'application/json'
+CSV_CONTENT_TYPE = 'text/csv'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _write_nodes_json(path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump({'meta': get_project_metadata(),
+                   'jurisdictions': get_jurisdiction_list_metadata()},
+                  output, cls=DjangoJSONEncoder)
+
+
+def _write_csv(path, write, fields):
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        write(output, fields, CSVMetadataWriter)
+
+
+def _write_xlsx(path, write, fields, writer=XLSXMetadataWriter):
+    write(path, fields, writer)
+
+
+# nombre: (función que escribe el archivo en el path recibido, content type)
+NODE_EXPORTS = OrderedDict([
+    ('nodes.json', (_write_nodes_json, JSON_CONTENT_TYPE)),
+    ('nodes.csv', (partial(_write_csv, write=write_node_metadata,
+                           fields=NODES_ENGLISH_FIELDS), CSV_CONTENT_TYPE)),
+    ('nodos.csv', (partial(_write_csv, write=write_node_metadata,
+                           fields=NODES_SPANISH_FIELDS), CSV_CONTENT_TYPE)),
+    ('nodes.xlsx', (partial(_write_xlsx, write=write_node_metadata,
+                            fields=NODES_ENGLISH_FIELDS), XLSX_CONTENT_TYPE)),
+    ('nodos.xlsx', (partial(_write_xlsx, write=write_node_metadata,
+                            fields=NODES_SPANISH_FIELDS), XLSX_CONTENT_TYPE)),
+])
+
+DISTRIBUTION_EXPORTS = OrderedDict([
+    ('distribuciones.csv', (partial(_write_csv, write=write_distributions_metadata,
+                                    fields=DISTRIBUTIONS_SPANISH_FIELDS), CSV_CONTENT_TYPE)),
+    ('distribuciones.xlsx', (partial(_write_xlsx, write=write_distributions_metadata,
+                                     fields=DISTRIBUTIONS_SPANISH_FIELDS,
+                                     writer=partial(XLSXMetadataWriter,
+                                                    options={'constant_memory': True})),
+                             XLSX_CONTENT_TYPE)),
+])
+
+EXPORTS = OrderedDict(list(NODE_EXPORTS.items()) + list(DISTRIBUTION_EXPORTS.items()))
+
+
+def export_storage():
+    return CustomCatalogStorage()
+
+
+def export_file_name(name):
+    """Nombre en el storage de la exportación 'name'"""
+    return '{}/{}'.format(EXPORTS_ROOT, name)
+
+
+class _WrittenFile(File):
+    """Archivo local ya escrito: FileSystemStorage lo mueve en lugar de copiarlo"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def generate_export_file(name):
+    """Escribe la exportación 'name' en un archivo temporal local, bajo
+    FILE_UPLOAD_TEMP_DIR, y lo guarda en el storage en lugar del anterior.
+    Con FileSystemStorage y FILE_UPLOAD_TEMP_DIR en el mismo disco que
+    MEDIA_ROOT el archivo se mueve con un rename, y los requests en curso
+    siguen leyendo el archivo anterior completo. Devuelve el nombre del
+    archivo en el storage
+    """
+    write, _ = EXPORTS[name]
+    storage = export_storage()
+    file_name = export_file_name(name)
+    with NamedTemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR, prefix='.{}.'.format(name),
+                            delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        storage.delete(file_name)
+        with open(tmp_path, 'rb') as written:
+            return storage.save(file_name, _WrittenFile(written, name=name))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_export_files(names=None):
+    for name in names or EXPORTS:
+        generate_export_file(name)
+
+
+def open_export_file(name):
+    """Devuelve la exportación 'name' abierta en modo binario, junto con su
+    fecha de modificación, o None si todavía no se generó
+    """
+    storage = export_storage()
+    file_name = export_file_name(name)
+    if not storage.exists(file_name):
+        return None
+    try:
+        modified_time = storage.get_modified_time(file_name)
+        return storage.open(file_name, 'rb'), modified_time
+    except FileNotFoundError:
+        # Se borró al reemplazarlo una regeneración en curso
+        return None
+
+
+def export_file_etag(size, modified_time):
+    return '"{:x}-{:x}"'.format(int(modified_time.timestamp() * 10 ** 6), size)
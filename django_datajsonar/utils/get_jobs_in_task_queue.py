@@ -3,13 +3,18 @@
 from __future__ import unicode_literals
 from django.conf import settings
 
+from django_datajsonar.queues import stage_job_queues
 from django_datajsonar.utils.utils import import_string, pending_or_running_jobs
 
 
 def pending_or_running_jobs_in_task_queue(task_model):
+    """True si quedan jobs en alguna de las colas de la etapa que usa
+    'task_model', incluidas las de shards (ver stage_job_queues)
+    """
     for name, stage_settings in settings.DATAJSONAR_STAGES.items():
         stage_task_model = import_string(stage_settings['task'])
         if stage_task_model == task_model:
-            return pending_or_running_jobs(stage_settings['queue'])
+            return any(pending_or_running_jobs(queue)
+                       for queue in stage_job_queues(stage_settings['queue']))
 
     raise ValueError('No hay stage que use el modelo {task_model}'.format(task_model=task_model))
@@ -1,10 +1,10 @@
 #!coding=utf8
 from __future__ import unicode_literals
 
-import json
-
+from django.conf import settings
+from django.core.cache import caches, DEFAULT_CACHE_ALIAS
 from django.forms.models import model_to_dict
-from django.db.models import Max
+from django.db.models import Count, DateField, Prefetch, Subquery
 
 from django_datajsonar.models import Distribution
 from django_datajsonar.models.metadata import ProjectMetadata, Language,\
@@ -12,7 +12,37 @@ from django_datajsonar.models.metadata import ProjectMetadata, Language,\
 from django_datajsonar.models.node import Jurisdiction, NodeMetadata
 
 
+PROJECT_METADATA_CACHE_KEY = 'django_datajsonar:project_metadata'
+PROJECT_METADATA_CACHE_TIMEOUT = 60 * 60  # en segundos
+
+# Modelos cuyas modificaciones cambian la metadata del proyecto
+PROJECT_METADATA_MODELS = [ProjectMetadata, Jurisdiction, NodeMetadata, Spatial, Publisher,
+                           Language]
+
+
+def _metadata_cache():
+    return caches[getattr(settings, 'DATAJSON_AR_METADATA_CACHE', DEFAULT_CACHE_ALIAS)]
+
+
 def get_project_metadata():
+    """Devuelve la metadata del proyecto, cacheada hasta que se modifique
+    alguno de los PROJECT_METADATA_MODELS (ver invalidate_project_metadata)
+    """
+    cache = _metadata_cache()
+    result = cache.get(PROJECT_METADATA_CACHE_KEY)
+    if result is None:
+        result = generate_project_metadata()
+        cache.set(PROJECT_METADATA_CACHE_KEY, result,
+                  getattr(settings, 'DATAJSON_AR_METADATA_CACHE_TIMEOUT',
+                          PROJECT_METADATA_CACHE_TIMEOUT))
+    return result
+
+
+def invalidate_project_metadata():
+    _metadata_cache().delete(PROJECT_METADATA_CACHE_KEY)
+
+
+def generate_project_metadata():
     metadata = ProjectMetadata.get_solo()
     result = model_to_dict(metadata, fields=[
         'title', 'description', 'version', 'homepage', 'issued'
@@ -27,49 +57,55 @@ def get_project_metadata():
     publisher = model_to_dict(Publisher.get_solo(), fields=['name', 'mbox'])
     result['publisher'] = publisher
 
-    result['modified'] = last_modified_date()
-    result['jurisdiction_count'] = Jurisdiction.objects.all().count()
-    result['catalog_count'] = \
-        NodeMetadata.objects.all().exclude(jurisdiction__isnull=True).count()
+    result['modified'] = last_modified_date(metadata)
+    result.update(Jurisdiction.objects.aggregate(
+        jurisdiction_count=Count('id', distinct=True),
+        catalog_count=Count('nodemetadata', distinct=True)))
 
     return result
 
 
-def last_modified_date():
-    result = ProjectMetadata.get_solo().modified_date
-    models = [Jurisdiction, NodeMetadata, Spatial, Publisher, Language]
-    for model in models:
-        model_last_modified = model.objects.all().aggregate(
-            Max('modified_date'))['modified_date__max']
-        if model_last_modified:
-            result = max(result, model_last_modified)
-    return result
+def last_modified_date(metadata=None):
+    """Última fecha de modificación de la metadata del proyecto, calculada
+    en una sola query con un subquery por modelo
+    """
+    metadata = metadata or ProjectMetadata.get_solo()
+    dates = {
+        model.__name__: Subquery(model.objects.order_by('-modified_date')
+                                 .values('modified_date')[:1],
+                                 output_field=DateField())
+        for model in PROJECT_METADATA_MODELS[1:]
+    }
+    values = ProjectMetadata.objects.filter(pk=metadata.pk)\
+        .annotate(**dates).values('modified_date', *dates).get()
+    return max(date for date in values.values() if date)
 
 
 def get_jurisdiction_list_metadata():
-    jurisdictions = []
-    jurisdictions_models = Jurisdiction.objects.all()
-    for jurisdiction_model in jurisdictions_models:
-        jurisdictions.append(jurisdiction_metadata(jurisdiction_model))
-    return jurisdictions
+    """Metadata de cada jurisdicción con sus nodos, en dos queries"""
+    node_metadata = NodeMetadata.objects.select_related('node').only(
+        'jurisdiction_id', 'label', 'category', 'type', 'url_json', 'url_xlsx',
+        'url_datosgobar', 'url_homepage', 'node__catalog_id', 'node__indexable')
+    jurisdictions = Jurisdiction.objects\
+        .prefetch_related(Prefetch('nodemetadata_set', queryset=node_metadata))
+    return [jurisdiction_metadata(jurisdiction) for jurisdiction in jurisdictions]
 
 
 def jurisdiction_metadata(jurisdiction):
-    nodes_metadata = list(jurisdiction.nodemetadata_set.values(
-        'node__catalog_id',
-        'label',
-        'category',
-        'type',
-        'node__indexable',
-        'url_json',
-        'url_xlsx',
-        'url_datosgobar',
-        'url_homepage'
-    ))
-    for metadata in nodes_metadata:
-        # Traducción de campos
-        metadata['id'] = metadata.pop('node__catalog_id')
-        metadata['published'] = metadata.pop('node__indexable')
+    nodes_metadata = []
+    for metadata in jurisdiction.nodemetadata_set.all():
+        nodes_metadata.append({
+            # Traducción de campos
+            'id': metadata.node.catalog_id,
+            'published': metadata.node.indexable,
+            'label': metadata.label,
+            'category': metadata.category,
+            'type': metadata.type,
+            'url_json': metadata.url_json,
+            'url_xlsx': metadata.url_xlsx,
+            'url_datosgobar': metadata.url_datosgobar,
+            'url_homepage': metadata.url_homepage,
+        })
 
     result = {
         "argentinagobar_id": jurisdiction.argentinagobar_id,
@@ -79,50 +115,52 @@ def jurisdiction_metadata(jurisdiction):
     return result
 
 
+# Columnas de Distribution.objects.values() renombradas en los metadatos
+DISTRIBUTION_COLUMNS = {
+    'access_url': 'accessURL',
+    'dataset__description': 'dataset_description',
+    'dataset__publisher_name': 'dataset_publisher',
+    'dataset__publisher_mbox': 'dataset_publisher_mail',
+    'dataset__source': 'dataset_source',
+    'dataset__theme': 'dataset_theme',
+    'dataset__super_theme': 'dataset_superTheme',
+    'dataset__license': 'dataset_license',
+    'dataset__catalog__publisher_name': 'catalog_publisher',
+}
+
+
 def get_distributions_metadata():
-    metadata_list = list(Distribution.objects.all().select_related('dataset__catalog').order_by(
-        'dataset__catalog__identifier', 'dataset__identifier', 'identifier').values(
-        'identifier',
-        'title',
-        'download_url',
-        'metadata',
-        'dataset__identifier',
-        'dataset__title',
-        'dataset__metadata',
-        'dataset__catalog__title',
-        'dataset__catalog__identifier',
-        'dataset__catalog__metadata'
-    ))
-
-    for distribution in metadata_list:
-        distribution_metadata = json.loads(distribution.pop('metadata')) \
-            if distribution.get('metadata') else {}
-        distribution['description'] = distribution_metadata.get('description')
-        distribution['accessURL'] = distribution_metadata.get('accessURL')
-        distribution['type'] = distribution_metadata.get('type')
-        distribution['format'] = distribution_metadata.get('format')
-
-        dataset_metadata = json.loads(distribution.pop('dataset__metadata')) \
-            if distribution.get('dataset__metadata') else {}
-        distribution['dataset_description'] = \
-            dataset_metadata.get('description')
-        distribution['dataset_publisher'] = \
-            dataset_metadata.get('publisher', {}).get('name')
-        distribution['dataset_publisher_mail'] = \
-            dataset_metadata.get('publisher', {}).get('mbox')
-        distribution['dataset_source'] = \
-            dataset_metadata.get('source')
-        distribution['dataset_theme'] = \
-            ','.join(dataset_metadata.get('theme', []))
-        distribution['dataset_superTheme'] = \
-            ','.join(dataset_metadata.get('superTheme', []))
-        distribution['dataset_license'] = \
-            dataset_metadata.get('license')
-
-        catalog_metadata = \
-            json.loads(distribution.pop('dataset__catalog__metadata')) \
-            if distribution.get('dataset__catalog__metadata') else {}
-        distribution['catalog_publisher'] = \
-            catalog_metadata.get('publisher', {}).get('name')
-
-    return metadata_list
+    return list(iter_distributions_metadata())
+
+
+def iter_distributions_metadata():
+    """Genera los metadatos de cada distribución a medida que se leen de la
+    base con un cursor del lado del servidor (en PostgreSQL), sin cargarlas
+    todas en memoria. Los metadatos salen de las columnas copiadas de la
+    metadata al cargarla (ver HOT_METADATA_FIELDS), sin decodificar el JSON
+    """
+    distributions = Distribution.objects\
+        .order_by('dataset__catalog__identifier', 'dataset__identifier', 'identifier')\
+        .values('identifier',
+                'title',
+                'download_url',
+                'description',
+                'access_url',
+                'type',
+                'format',
+                'dataset__identifier',
+                'dataset__title',
+                'dataset__description',
+                'dataset__publisher_name',
+                'dataset__publisher_mbox',
+                'dataset__source',
+                'dataset__theme',
+                'dataset__super_theme',
+                'dataset__license',
+                'dataset__catalog__title',
+                'dataset__catalog__identifier',
+                'dataset__catalog__publisher_name')
+
+    for distribution in distributions.iterator():
+        yield {DISTRIBUTION_COLUMNS.get(key, key): value
+               for key, value in distribution.items()}
@@ -6,7 +6,8 @@ from xlsxwriter import Workbook
 
 class CSVMetadataWriter:
     def __init__(self, output, headers):
-        self.writer = csv.DictWriter(output, headers, extrasaction='ignore')
+        self.headers = list(headers)
+        self.writer = csv.DictWriter(output, self.headers, extrasaction='ignore')
 
     def write_metadata(self, metadata_list):
         self.writer.writeheader()
@@ -15,9 +16,9 @@ class CSVMetadataWriter:
 
 
 class XLSXMetadataWriter:
-    def __init__(self, output, headers):
+    def __init__(self, output, headers, options=None):
         self.headers = headers
-        self.workbook = Workbook(output, {'in_memory': True})
+        self.workbook = Workbook(output, options or {'in_memory': True})
 
     def write_metadata(self, metadata_list):
         worksheet = self.workbook.add_worksheet()
@@ -0,0 +1,59 @@
+#! coding: utf-8
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.utils import CursorWrapper
+
+
+class CountingCursorWrapper(CursorWrapper):
+    """Cursor que suma al QueryCounter cada query que ejecuta, sin
+    formatearla ni guardarla
+    """
+
+    def __init__(self, cursor, db, counter):
+        super(CountingCursorWrapper, self).__init__(cursor, db)
+        self.counter = counter
+
+    def execute(self, sql, params=None):
+        self.counter.count += 1
+        return super(CountingCursorWrapper, self).execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.counter.count += 1
+        return super(CountingCursorWrapper, self).executemany(sql, param_list)
+
+
+class QueryCounter:
+    """Context manager que cuenta las queries ejecutadas en una conexión
+    dentro del bloque, sin guardarlas: los cursores de la conexión se
+    envuelven en un CountingCursorWrapper. Si ya se estaban registrando
+    queries (DEBUG, o un QueryCounter externo), se envuelve el cursor que se
+    usaba hasta ahora, por lo que se siguen registrando
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+        self.previous_force_debug_cursor = None
+        self.previous_make_debug_cursor = None
+
+    def __enter__(self):
+        connection = self.connection
+        self.previous_force_debug_cursor = connection.force_debug_cursor
+        # Sólo si un QueryCounter externo lo reemplazó en la conexión
+        self.previous_make_debug_cursor = connection.__dict__.get('make_debug_cursor')
+
+        if connection.queries_logged:
+            make_cursor = connection.make_debug_cursor
+            connection.make_debug_cursor = \
+                lambda cursor: CountingCursorWrapper(make_cursor(cursor), connection, self)
+        else:
+            connection.make_debug_cursor = \
+                lambda cursor: CountingCursorWrapper(cursor, connection, self)
+        connection.force_debug_cursor = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.force_debug_cursor = self.previous_force_debug_cursor
+        if self.previous_make_debug_cursor is None:
+            del self.connection.make_debug_cursor
+        else:
+            self.connection.make_debug_cursor = self.previous_make_debug_cursor
@@ -1,22 +1,18 @@
 #!coding=utf8
 import os
 
-from django.http import JsonResponse, HttpResponseBadRequest, FileResponse
-
 from django.conf import settings
-
-from django_datajsonar.models import Node
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from django_datajsonar.indexing.metrics import prometheus_metrics
+from django_datajsonar.indexing.tasks import schedule_export_files
+from django_datajsonar.models import Node, IndexingMetric
 from django_datajsonar.models.data_json import Dataset
-from django_datajsonar.utils.download_response_writer import \
-    write_node_metadata, write_distributions_metadata
-from django_datajsonar.utils.metadata_generator import get_project_metadata, \
-    get_jurisdiction_list_metadata
-from django_datajsonar.utils.metadata_writer import CSVMetadataWriter, \
-    XLSXMetadataWriter
-from django_datajsonar.utils.utils import download_config_csv, \
-    generate_csv_download_response, generate_xlsx_download_response
-from django_datajsonar.utils.translations import NODES_ENGLISH_FIELDS, NODES_SPANISH_FIELDS, \
-    DISTRIBUTIONS_SPANISH_FIELDS
+from django_datajsonar.utils.export_files import EXPORTS, open_export_file, export_file_etag
+from django_datajsonar.utils.utils import download_config_csv
 
 
 def config_csv(_):
@@ -24,46 +20,79 @@ def config_csv(_):
     return download_config_csv(datasets)
 
 
-def nodes_metadata_json(_):
-    response = {'meta': get_project_metadata(),
-                'jurisdictions': get_jurisdiction_list_metadata()}
-    return JsonResponse(response)
+def nodes_metadata_json(request):
+    return export_file_response(request, 'nodes.json', with_attachment=False)
+
+
+def nodes_english_metadata_csv(request):
+    return export_file_response(request, 'nodes.csv')
+
 
+def nodes_spanish_metadata_csv(request):
+    return export_file_response(request, 'nodos.csv')
 
-def nodes_english_metadata_csv(_):
-    response = generate_csv_download_response('nodes.csv')
-    return write_node_metadata(response, NODES_ENGLISH_FIELDS,
-                               CSVMetadataWriter)
 
+def nodes_english_metadata_xlsx(request):
+    return export_file_response(request, 'nodes.xlsx')
 
-def nodes_spanish_metadata_csv(_):
-    response = generate_csv_download_response('nodos.csv')
-    return write_node_metadata(response, NODES_SPANISH_FIELDS,
-                               CSVMetadataWriter)
 
+def nodes_spanish_metadata_xlsx(request):
+    return export_file_response(request, 'nodos.xlsx')
 
-def nodes_english_metadata_xlsx(_):
-    response = generate_xlsx_download_response('nodes.xlsx')
-    return write_node_metadata(response, NODES_ENGLISH_FIELDS,
-                               XLSXMetadataWriter)
 
+def distributions_spanish_metadata_csv(request):
+    return export_file_response(request, 'distribuciones.csv')
 
-def nodes_spanish_metadata_xlsx(_):
-    response = generate_xlsx_download_response('nodos.xlsx')
-    return write_node_metadata(response, NODES_SPANISH_FIELDS,
-                               XLSXMetadataWriter)
 
+def distributions_spanish_metadata_xlsx(request):
+    return export_file_response(request, 'distribuciones.xlsx')
 
-def distributions_spanish_metadata_csv(_):
-    response = generate_csv_download_response('distribuciones.csv')
-    return write_distributions_metadata(response, DISTRIBUTIONS_SPANISH_FIELDS,
-                                        CSVMetadataWriter)
+
+def export_file_response(request, name, with_attachment=True):
+    """Sirve la exportación precalculada 'name' con ETag, Last-Modified y
+    Content-Length. Responde 304 si el cliente ya tiene la versión actual.
+    Si todavía no se generó, encola su generación y responde 503 con
+    Retry-After: generarla en el request puede tardar minutos
+    """
+    opened = open_export_file(name)
+    if opened is None:
+        schedule_export_files([name])
+        response = HttpResponse('La exportación {} se está generando'.format(name),
+                                status=503, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = getattr(settings, 'DATAJSON_AR_EXPORT_RETRY_AFTER', 60)
+        return response
+
+    export_file, modified_time = opened
+    size = export_file.seek(0, os.SEEK_END)
+    export_file.seek(0)
+    etag = export_file_etag(size, modified_time)
+    last_modified = int(modified_time.timestamp())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        export_file.close()
+        return not_modified
+
+    response = FileResponse(export_file, content_type=EXPORTS[name][1])
+    response['Content-Length'] = size
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if with_attachment:
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(name)
+    return response
 
 
-def distributions_spanish_metadata_xlsx(_):
-    response = generate_xlsx_download_response('distribuciones.xlsx')
-    return write_distributions_metadata(response, DISTRIBUTIONS_SPANISH_FIELDS,
-                                        XLSXMetadataWriter)
+def indexing_metrics(request):
+    """Métricas de la última ReadDataJsonTask, en formato de Prometheus.
+    Sólo para usuarios staff, salvo con DATAJSON_AR_PUBLIC_METRICS
+    """
+    if not getattr(settings, 'DATAJSON_AR_PUBLIC_METRICS', False) and not request.user.is_staff:
+        raise PermissionDenied
+    last_task_id = IndexingMetric.objects.order_by('-task_id')\
+        .values_list('task_id', flat=True).first()
+    metrics = IndexingMetric.objects.filter(task_id=last_task_id)\
+        .select_related('node').order_by('node', 'id')
+    return HttpResponse(prometheus_metrics(metrics),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def json_catalog(_request, catalog_id):
@@ -0,0 +1,28 @@
+#! coding: utf-8
+from rq import Worker
+
+from django_datajsonar.queues import STAGE_RUN_META
+from django_datajsonar.synchronizer import queue_job_finished
+
+
+class SynchronizerWorkerMixin:
+    """Avisa el fin de cada job al synchronizer, para que las etapas avancen
+    apenas se vacía su cola en lugar de esperar al próximo upkeep
+    """
+
+    def perform_job(self, job, queue, heartbeat_ttl=None):
+        try:
+            return super(SynchronizerWorkerMixin, self).perform_job(job, queue, heartbeat_ttl)
+        finally:
+            try:
+                queue_job_finished(job.origin, job.meta.get(STAGE_RUN_META))
+            except Exception:
+                # upkeep avanza la etapa si falla el aviso
+                self.log.exception('Error al avisar el fin del job %s', job.id)
+
+
+class SynchronizerWorker(SynchronizerWorkerMixin, Worker):
+    """Usar con `manage.py rqworker --worker-class
+    django_datajsonar.worker.SynchronizerWorker`, o con el setting
+    RQ = {'WORKER_CLASS': 'django_datajsonar.worker.SynchronizerWorker'}
+    """